@@ -10,17 +10,43 @@ This script demonstrates a Local File Wrangler pattern:
 """
 
 import os
+import sys
 import json
+import time
+import argparse
+import threading
 import logging
 from pathlib import Path
-from typing import Dict, List, Any
-from datetime import datetime
+from typing import Dict, List, Any, Callable, Optional, Tuple
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+if __name__ == "__main__" and sys.argv[1:2] == ["doctor"]:
+    # Dispatch before the SDK and numeric imports below, so setup checks start
+    # instantly and still run when those packages are missing or broken
+    from doctor import main as doctor_main
+    sys.exit(doctor_main(sys.argv[2:]))
 
 import google.generativeai as genai
 from dotenv import load_dotenv
 from rich.console import Console
 from rich.logging import RichHandler
 
+from routing import MIN_CACHED_TOKENS, ModelRouter, estimate_tokens
+from cassette import Cassette, DEFAULT_CASSETTE, recording_factory, replay_factory
+from hedging import HedgedCaller, benchmark as hedge_benchmark
+from corpus import CorpusReducer, REDUCE_INSTRUCTIONS
+from extractors import ExtractorRegistry
+from credentials import Credential, CredentialPool, client_factory, is_rate_limited
+from output_writer import OutputWriter
+from reporting import SummaryAccumulator, build_summary_report
+from preview import DEFAULT_SAMPLE_SIZE as DEFAULT_PREVIEW_SIZE
+from streaming import EXPECTED_FIELDS, consume_stream
+import compact
+from topics import DEFAULT_THRESHOLD as DEFAULT_TOPIC_THRESHOLD, TopicClusterer
+from structured_logging import LOG_FORMATS, RUN_ID, configure_logging, log_context
+from scheduler import CostEstimator, POLICIES, load_hints, schedule
+
 # Load environment variables
 load_dotenv()
 
@@ -36,24 +62,189 @@ logging.basicConfig(
 )
 logger = logging.getLogger("gemini-demo")
 
+# File types picked up from the data directory
+SUPPORTED_EXTENSIONS = ['.md', '.txt', '.json', '.csv']
+
+# Fixed instruction prefix shared by every extraction request. It must stay
+# byte-for-byte identical across calls so it can be cached server-side;
+# per-document details belong in build_document_prompt().
+EXTRACTION_INSTRUCTIONS = """Analyze the document provided by the user and extract key facts in a structured format.
+
+Please provide a JSON response with the following structure:
+{
+    "summary": "Brief 2-3 sentence summary of the document",
+    "key_facts": [
+        "Fact 1",
+        "Fact 2",
+        "Fact 3"
+    ],
+    "topics": ["topic1", "topic2", "topic3"],
+    "entities": {
+        "people": ["person1", "person2"],
+        "organizations": ["org1", "org2"],
+        "locations": ["location1", "location2"]
+    },
+    "sentiment": "positive/negative/neutral"
+}
+
+Be concise but comprehensive. Focus on the most important information."""
+
+
+def env_flag(name: str) -> bool:
+    """Read a boolean flag from the environment."""
+    return os.getenv(name, "").lower() in ("1", "true", "yes")
+
+
+def build_document_prompt(content: str, file_name: str) -> str:
+    """Build the per-document part of an extraction request."""
+    return f"Document: {file_name}\nContent:\n{content}"
+
 
 class GeminiFileWrangler:
     """Local File Wrangler using Gemini for document processing."""
     
-    def __init__(self):
-        """Initialize the Gemini client."""
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY environment variable is required")
+    def __init__(self, model_factory: Optional[Callable[..., Any]] = None,
+                 pretty: Optional[bool] = None, context_cache: Optional[bool] = None,
+                 cassette_mode: Optional[str] = None, cassette_path: Optional[Path] = None,
+                 replay_latency: Optional[bool] = None, stream: Optional[bool] = None,
+                 corpus_summary: Optional[bool] = None, local_extractors: Optional[bool] = None,
+                 compact_response: Optional[bool] = None):
+        """Initialize the Gemini client.
         
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
+        Args:
+            model_factory: Optional callable taking a model name and a
+                `system_instruction` keyword and returning a model object (e.g. a
+                stand-in model). Defaults to `genai.GenerativeModel`.
+            pretty: Indent JSON outputs for debugging. Defaults to the
+                `WRANGLER_PRETTY_JSON` environment variable, otherwise compact.
+            context_cache: Upload the shared instructions once per run as cached
+                content. Defaults to the `GEMINI_CONTEXT_CACHE` environment variable.
+            cassette_mode: `record` to append every model call to a JSONL cassette,
+                `replay` to answer from it offline. Defaults to `GEMINI_CASSETTE_MODE`.
+            cassette_path: Cassette file. Defaults to `GEMINI_CASSETTE`, otherwise
+                `demo/cassette.jsonl`.
+            replay_latency: Sleep for the recorded latency when replaying.
+                Defaults to `GEMINI_REPLAY_LATENCY`.
+            stream: Stream responses, report fields as they complete and stop
+                generating once the schema is received. Defaults to `GEMINI_STREAM`.
+            corpus_summary: Add a model-written corpus summary, built by tree
+                reduction, to the summary report. Defaults to `WRANGLER_CORPUS_SUMMARY`.
+            local_extractors: Read structured files (JSON, CSV, markdown front
+                matter) locally and send only their free text to the model. On
+                unless `WRANGLER_LOCAL_EXTRACTORS` is `0`.
+            compact_response: Ask for the compact schema (short keys, capped
+                lists, bounded `max_output_tokens`) and expand it locally.
+                Defaults to `GEMINI_COMPACT_RESPONSE`.
+        """
+        cassette_mode = cassette_mode or os.getenv("GEMINI_CASSETTE_MODE") or None
+        if cassette_mode not in (None, "record", "replay"):
+            raise ValueError(f"Unknown cassette mode {cassette_mode!r}, expected 'record' or 'replay'")
+        cassette = Cassette(cassette_path or os.getenv("GEMINI_CASSETTE") or DEFAULT_CASSETTE)
+        
+        if cassette_mode == "replay" and model_factory is None:
+            if replay_latency is None:
+                replay_latency = env_flag("GEMINI_REPLAY_LATENCY")
+            model_factory = replay_factory(cassette, simulate_latency=replay_latency)
+            logger.info(f"📼 Replaying model responses from {cassette.path}")
+        
+        if model_factory is None:
+            credentials = CredentialPool.from_env()
+            if not credentials:
+                raise ValueError("GEMINI_API_KEY environment variable is required "
+                                 "(or GEMINI_API_KEYS / GEMINI_CREDENTIALS_FILE for a key pool)")
+            
+            if len(credentials) == 1:
+                genai.configure(api_key=credentials.credentials[0].api_key)
+                credentials.credentials[0].model_factory = genai.GenerativeModel
+            else:
+                for credential in credentials.credentials:
+                    credential.model_factory = client_factory(credential)
+                logger.info(f"🔑 Pooling {len(credentials)} API keys: "
+                            f"{', '.join(c.name for c in credentials.credentials)}")
+        else:
+            credentials = CredentialPool([Credential(name="local")])
+            credentials.credentials[0].model_factory = model_factory
+        
+        if cassette_mode == "record":
+            for credential in credentials.credentials:
+                credential.model_factory = recording_factory(credential.model_factory, cassette)
+            logger.info(f"📼 Recording model calls to {cassette.path}")
+        
+        # Spreads calls over API keys, each with its own rate limit and 429 cooldown
+        self.credentials = credentials
+        self.model_factory = credentials.credentials[0].model_factory
+        self._models = {}
+        self._models_lock = threading.Lock()
+        
+        if context_cache is None:
+            context_cache = env_flag("GEMINI_CONTEXT_CACHE")
+        if context_cache and len(credentials) > 1:
+            logger.warning("Context caching is tied to the process-wide API key, "
+                           "sending instructions inline for the key pool")
+            context_cache = False
+        self.context_cache = context_cache
+        self._cached_contents = []
+        
+        self.stream = env_flag("GEMINI_STREAM") if stream is None else stream
+        
+        # Short keys and capped lists cut output tokens, which dominate generation time
+        if compact_response is None:
+            compact_response = env_flag("GEMINI_COMPACT_RESPONSE")
+        self.compact_response = compact_response
+        self.instructions = compact.COMPACT_INSTRUCTIONS if compact_response else EXTRACTION_INSTRUCTIONS
+        self.generation_config = compact.generation_config() if compact_response else None
+        
+        # The API rejects cached content below its minimum size, so don't attempt it
+        instruction_tokens = estimate_tokens(self.instructions)
+        if self.context_cache and instruction_tokens < MIN_CACHED_TOKENS:
+            logger.warning(f"Context caching skipped: the instructions are about {instruction_tokens} tokens, "
+                           f"below the {MIN_CACHED_TOKENS}-token minimum for cached content")
+            self.context_cache = False
+        
+        # Picks a model per document and tracks per-model latency and tokens
+        self.router = ModelRouter.from_env()
+        # Enforces per-call deadlines and hedges slow calls when enabled
+        self.hedger = HedgedCaller.from_env()
+        self.model = self.get_model(self.router.default_model)
         
         # Set up directories
         self.data_dir = Path("data")
         self.demo_dir = Path("demo")
         self.demo_dir.mkdir(exist_ok=True)
         
+        # Learns per-file processing cost to order work before dispatch
+        self.cost_estimator = CostEstimator(self.demo_dir / "cost_model.json")
+        # Replayed calls without their recorded latency say nothing about real cost
+        self.learn_costs = cassette_mode != "replay" or bool(replay_latency)
+        
+        # Writes outputs on a background thread, off the model-call path
+        if pretty is None:
+            pretty = env_flag("WRANGLER_PRETTY_JSON")
+        self.writer = OutputWriter(pretty=pretty)
+        
+        # Deterministic extractors that answer structured files without a model call
+        if local_extractors is None:
+            local_extractors = os.getenv("WRANGLER_LOCAL_EXTRACTORS", "1").lower() not in ("0", "false", "no")
+        self.extractors = ExtractorRegistry.from_env() if local_extractors else None
+        
+        # Folds near-synonym topics into canonical topics, keeping labels stable across runs
+        self.topic_clusterer = TopicClusterer(
+            threshold=float(os.getenv("WRANGLER_TOPIC_THRESHOLD", DEFAULT_TOPIC_THRESHOLD)),
+            state_path=self.demo_dir / "topic_clusters.npz"
+        )
+        
+        # Tree-reduces per-file summaries into one corpus summary, reusing unchanged nodes
+        if corpus_summary is None:
+            corpus_summary = env_flag("WRANGLER_CORPUS_SUMMARY")
+        self.corpus_reducer = None
+        if corpus_summary:
+            reduce_model = self.router.default_model
+            self.corpus_reducer = CorpusReducer(
+                lambda prompt: self.generate_text(reduce_model, prompt, REDUCE_INSTRUCTIONS),
+                self.demo_dir / "corpus_cache.json", reduce_model,
+                concurrency=int(os.getenv("WRANGLER_CONCURRENCY", "4"))
+            )
+        
         logger.info("✅ Gemini File Wrangler initialized")
     
     def read_file(self, file_path: Path) -> str:
@@ -66,179 +257,470 @@ class GeminiFileWrangler:
             # For other file types, read as text
             return file_path.read_text(encoding='utf-8', errors='ignore')
     
-    def extract_key_facts(self, content: str, file_name: str) -> Dict[str, Any]:
-        """Extract key facts from document content using Gemini."""
-        
-        prompt = f"""
-        Analyze the following document and extract key facts in a structured format.
-        
-        Document: {file_name}
-        Content:
-        {content}
-        
-        Please provide a JSON response with the following structure:
-        {{
-            "summary": "Brief 2-3 sentence summary of the document",
-            "key_facts": [
-                "Fact 1",
-                "Fact 2",
-                "Fact 3"
-            ],
-            "topics": ["topic1", "topic2", "topic3"],
-            "entities": {{
-                "people": ["person1", "person2"],
-                "organizations": ["org1", "org2"],
-                "locations": ["location1", "location2"]
-            }},
-            "sentiment": "positive/negative/neutral",
-            "provenance": {{
-                "source_file": "{file_name}",
-                "processed_at": "{datetime.now().isoformat()}",
-                "model_used": "gemini-1.5-flash"
-            }}
-        }}
-        
-        Be concise but comprehensive. Focus on the most important information.
+    def get_model(self, model_name: str, credential: Optional[Credential] = None,
+                  system_instruction: Optional[str] = None):
+        """Return a (cached) model object carrying the given (by default extraction) instructions."""
+        credential = credential or self.credentials.credentials[0]
+        system_instruction = system_instruction or self.instructions
+        with self._models_lock:
+            key = (model_name, credential.name, system_instruction)
+            if key not in self._models:
+                self._models[key] = self._create_model(model_name, credential, system_instruction)
+            return self._models[key]
+    
+    def _create_model(self, model_name: str, credential: Credential, system_instruction: str):
+        """Create a model, referencing a server-side cached prefix when enabled."""
+        if (self.context_cache and self.model_factory is genai.GenerativeModel
+                and system_instruction == self.instructions):
+            try:
+                from google.generativeai import caching
+                
+                cached_content = caching.CachedContent.create(
+                    model=f"models/{model_name}",
+                    display_name="wrangler-extraction-instructions",
+                    system_instruction=self.instructions,
+                    ttl=timedelta(hours=1)
+                )
+                self._cached_contents.append(cached_content)
+                logger.info(f"🗄️  Cached extraction instructions for {model_name}: {cached_content.name}")
+                return genai.GenerativeModel.from_cached_content(cached_content=cached_content)
+            except Exception as e:
+                logger.warning(f"Context caching unavailable for {model_name} ({e}), "
+                               f"sending instructions with each request")
+        
+        return credential.model_factory(model_name, system_instruction=system_instruction)
+    
+    def build_prompt(self, content: str, file_name: str) -> str:
+        """Build the per-document request sent after the shared instructions."""
+        return build_document_prompt(content, file_name)
+    
+    def call_model(self, model_name: str, prompt: str,
+                   on_field: Optional[Callable[[str, Any], None]] = None):
+        """Send one extraction request to a model, within the per-call deadline.
+        
+        Each attempt, hedged duplicates included, leases the least-loaded pooled
+        key; a 429 is retried on another key.
+        """
+        return self._with_retries(model_name, lambda: self._call_with(model_name, prompt, on_field))
+    
+    def generate_text(self, model_name: str, prompt: str, system_instruction: str) -> str:
+        """Send a free-form request with its own instructions and return the reply text."""
+        send = self._leased(
+            model_name,
+            lambda model, timeout: model.generate_content(prompt, request_options={"timeout": timeout}),
+            system_instruction
+        )
+        return self._with_retries(model_name, lambda: self.hedger.call(send, size=len(prompt))).text
+    
+    def _leased(self, model_name: str, send: Callable[[Any, float], Any],
+                system_instruction: Optional[str] = None) -> Callable[[float], Any]:
+        """Wrap `send(model, timeout)` so every attempt takes its own slot from the key pool."""
+        def attempt(timeout: float):
+            deadline = time.monotonic() + timeout
+            with self.credentials.lease() as credential:
+                model = self.get_model(model_name, credential, system_instruction)
+                # Waiting for quota counts against the attempt's deadline
+                return send(model, max(0.001, deadline - time.monotonic()))
+        return attempt
+    
+    def _with_retries(self, model_name: str, fn: Callable[[], Any]) -> Any:
+        attempts = len(self.credentials)
+        for attempt in range(attempts):
+            with log_context(attempt=attempt + 1):
+                try:
+                    return fn()
+                except Exception as e:
+                    if attempt + 1 == attempts or not is_rate_limited(e):
+                        raise
+                    logger.info(f"Retrying {model_name} call on another key after: {e}")
+    
+    def _call_with(self, model_name: str, prompt: str, on_field: Optional[Callable[[str, Any], None]]):
+        config = self.generation_config
+        if self.stream:
+            expected_fields = EXPECTED_FIELDS
+            if self.compact_response:
+                # Fields arrive under their short keys; report them under the full ones
+                expected_fields = compact.COMPACT_FIELDS
+                if on_field is not None:
+                    report_field = on_field
+                    
+                    def on_field(key, value):
+                        report_field(*compact.expand_field(key, value))
+            # A duplicate attempt would report every field twice, so streams are not hedged
+            return self.hedger.call(
+                self._leased(model_name, lambda model, timeout: consume_stream(
+                    model.generate_content(prompt, stream=True, generation_config=config,
+                                           request_options={"timeout": timeout}),
+                    on_field, expected_fields
+                )),
+                size=len(prompt), hedge=False
+            )
+        return self.hedger.call(
+            self._leased(model_name, lambda model, timeout: model.generate_content(
+                prompt, generation_config=config, request_options={"timeout": timeout})),
+            size=len(prompt)
+        )
+    
+    def parse_response(self, text: str) -> Tuple[Dict[str, Any], bool]:
+        """Parse a model response, returning the result and whether it was valid JSON."""
+        # Try to parse as JSON, fallback to text if needed
+        try:
+            data = json.loads(text)
+            # Compact replies may also come from a cassette recorded in compact mode
+            if isinstance(data, dict) and (self.compact_response or compact.is_compact(data)):
+                data = compact.expand(data)
+            return data, True
+        except json.JSONDecodeError:
+            # If JSON parsing fails, create a structured response
+            return {
+                "summary": text[:200] + "..." if len(text) > 200 else text,
+                "key_facts": ["Unable to parse structured response"],
+                "topics": ["unknown"],
+                "entities": {"people": [], "organizations": [], "locations": []},
+                "sentiment": "neutral",
+                "provenance": {"raw_response": text}
+            }, False
+    
+    def extract_key_facts(self, content: str, file_name: str,
+                          on_field: Optional[Callable[[str, Any], None]] = None) -> Dict[str, Any]:
+        """Extract key facts from document content using Gemini.
+        
+        In streaming mode `on_field(name, value)` is called for each top-level
+        field as soon as it has been received.
         """
         
+        # Structured files may be read locally, completely or all but their free text
+        local = self.extract_locally(content, file_name)
+        if local is not None:
+            extractor_name, extraction = local
+            if extraction.complete:
+                result = self.local_result(file_name, extractor_name, extraction)
+                if on_field is not None:
+                    for name in ("summary", "key_facts", "topics", "entities", "sentiment"):
+                        on_field(name, result[name])
+                return result
+            # Without a summary or free text to send, the model still reads the whole document
+            content = extraction.remainder or content
+        
+        routing = self.router.route(content, file_name)
+        model_name = routing["model"]
+        
+        prompt = self.build_prompt(content, file_name)
+        
+        started = time.perf_counter()
         try:
-            response = self.model.generate_content(prompt)
-            # Try to parse as JSON, fallback to text if needed
-            try:
-                result = json.loads(response.text)
-            except json.JSONDecodeError:
-                # If JSON parsing fails, create a structured response
-                result = {
-                    "summary": response.text[:200] + "..." if len(response.text) > 200 else response.text,
-                    "key_facts": ["Unable to parse structured response"],
-                    "topics": ["unknown"],
-                    "entities": {"people": [], "organizations": [], "locations": []},
-                    "sentiment": "neutral",
-                    "provenance": {
-                        "source_file": file_name,
-                        "processed_at": datetime.now().isoformat(),
-                        "model_used": "gemini-1.5-flash",
-                        "raw_response": response.text
-                    }
-                }
+            response = self.call_model(model_name, prompt, on_field)
+            latency = time.perf_counter() - started
+            usage = getattr(response, "usage_metadata", None)
+            prompt_tokens = getattr(usage, "prompt_token_count", 0) or 0
+            output_tokens = getattr(usage, "candidates_token_count", 0) or 0
+            cached_tokens = getattr(usage, "cached_content_token_count", 0) or 0
+            
+            result, parsed = self.parse_response(response.text)
+            if local is not None:
+                result = extraction.merge(result)
             
+            self.router.record(model_name, file_name, latency, prompt_tokens, output_tokens, parsed)
+            result.setdefault("provenance", {}).update({
+                "source_file": file_name,
+                "processed_at": datetime.now().isoformat(),
+                "model_used": model_name,
+                "routing": routing,
+                "latency_ms": round(latency * 1000, 1),
+                "prompt_tokens": prompt_tokens,
+                "cached_prompt_tokens": cached_tokens,
+                "output_tokens": output_tokens,
+                "response_format": "compact" if self.compact_response else "full",
+                "model_stats": self.router.stats(model_name)
+            })
+            if local is not None:
+                result["provenance"]["extractor"] = extractor_name
+            if self.stream:
+                first_field_s = response.first_field_s
+                result["provenance"]["streaming"] = {
+                    "first_field_ms": round(first_field_s * 1000, 1) if first_field_s is not None else None,
+                    "stopped_early": response.stopped_early
+                }
             return result
             
         except Exception as e:
             logger.error(f"Error processing {file_name}: {e}")
-            return {
-                "summary": f"Error processing file: {str(e)}",
-                "key_facts": [],
-                "topics": [],
-                "entities": {"people": [], "organizations": [], "locations": []},
-                "sentiment": "neutral",
-                "provenance": {
-                    "source_file": file_name,
-                    "processed_at": datetime.now().isoformat(),
-                    "model_used": "gemini-1.5-flash",
-                    "error": str(e)
-                }
+            self.router.record(model_name, file_name, time.perf_counter() - started, parsed=None)
+            return self.error_result(file_name, model_name, routing, str(e))
+    
+    def extract_locally(self, content: str, file_name: str):
+        """Run the local extractors; returns `(extractor name, LocalExtraction)` or None."""
+        if self.extractors is None:
+            return None
+        try:
+            return self.extractors.extract(content, file_name)
+        except Exception as e:
+            logger.warning(f"Local extraction failed for {file_name}, using the model: {e}")
+            return None
+    
+    def local_result(self, file_name: str, extractor_name: str, extraction) -> Dict[str, Any]:
+        """Build the analysis for a document read entirely by a local extractor."""
+        result = extraction.result()
+        result["provenance"] = {
+            "source_file": file_name,
+            "processed_at": datetime.now().isoformat(),
+            "model_used": "local",
+            "extractor": extractor_name
+        }
+        return result
+    
+    def error_result(self, file_name: str, model_name: str, routing: Dict[str, Any],
+                     error: str) -> Dict[str, Any]:
+        """Build the analysis recorded for a document that could not be processed."""
+        return {
+            "summary": f"Error processing file: {error}",
+            "key_facts": [],
+            "topics": [],
+            "entities": {"people": [], "organizations": [], "locations": []},
+            "sentiment": "neutral",
+            "provenance": {
+                "source_file": file_name,
+                "processed_at": datetime.now().isoformat(),
+                "model_used": model_name,
+                "routing": routing,
+                "error": error
             }
+        }
     
-    def process_files(self) -> List[Dict[str, Any]]:
-        """Process all files in the data directory."""
-        results = []
-        
-        # Find all supported files
-        supported_extensions = ['.md', '.txt', '.json']
+    def discover_files(self) -> List[Path]:
+        """Find all supported files in the data directory."""
         files = []
-        for ext in supported_extensions:
+        for ext in SUPPORTED_EXTENSIONS:
             files.extend(self.data_dir.glob(f"*{ext}"))
+        return files
+    
+    def analysis_path(self, file_path: Path) -> Path:
+        """Return the path of the per-file analysis for a data file."""
+        return self.demo_dir / f"{file_path.stem}_analysis.json"
+    
+    def file_info(self, file_path: Path) -> Dict[str, Any]:
+        """Describe a data file so later runs can tell whether it changed."""
+        stat = file_path.stat()
+        return {
+            "path": str(file_path),
+            "size_bytes": stat.st_size,
+            "modified": datetime.fromtimestamp(stat.st_mtime).isoformat()
+        }
+    
+    def load_analysis(self, file_path: Path) -> Optional[Dict[str, Any]]:
+        """Load the saved analysis for a data file if it is still current."""
+        output_file = self.analysis_path(file_path)
+        try:
+            with open(output_file, 'r', encoding='utf-8') as f:
+                analysis = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        
+        if analysis.get("file_info") != self.file_info(file_path):
+            return None
+        return analysis
+    
+    def load_preview_analysis(self, file_path: Path, keep_mark: bool = False) -> Optional[Dict[str, Any]]:
+        """Return the analysis a preview saved for a data file, if the file is unchanged.
+        
+        Unless `keep_mark` is set, the preview mark is replaced by
+        `reused_from_preview`, so the analysis is reused only once.
+        """
+        analysis = self.load_analysis(file_path)
+        if analysis is None or not analysis.get("provenance", {}).get("preview_run"):
+            return None
+        if not keep_mark:
+            analysis["provenance"]["reused_from_preview"] = analysis["provenance"].pop("preview_run")
+            self.writer.submit(self.analysis_path(file_path), analysis)
+        return analysis
+    
+    def process_file(self, file_path: Path,
+                     on_field: Optional[Callable[[str, Any], None]] = None,
+                     preview: bool = False) -> Dict[str, Any]:
+        """Analyze a single file and save its individual result."""
+        with log_context(file=file_path.name):
+            return self._process_file(file_path, on_field, preview)
+    
+    def _process_file(self, file_path: Path, on_field: Optional[Callable[[str, Any], None]],
+                      preview: bool = False) -> Dict[str, Any]:
+        logger.info(f"Processing: {file_path.name}")
+        
+        # Read file content
+        content = self.read_file(file_path)
+        
+        # Show streamed fields as they arrive unless the caller handles them
+        if self.stream and on_field is None:
+            def on_field(name, value):
+                if name == "summary":
+                    logger.info(f"⚡ {file_path.name}: {value}")
+                else:
+                    logger.debug(f"⚡ {file_path.name}: {name} received")
+        
+        # Extract key facts
+        facts = self.extract_key_facts(content, file_path.name, on_field)
+        
+        # Add file info
+        facts["file_info"] = self.file_info(file_path)
+        if preview:
+            # Lets a later full run reuse this analysis
+            facts["provenance"]["preview_run"] = RUN_ID
         
+        # Queue individual result for the background writer
+        output_file = self.analysis_path(file_path)
+        self.writer.submit(output_file, facts)
+        
+        logger.info(f"✅ Queued analysis for {output_file}")
+        return facts
+    
+    def process_files(self, concurrency: Optional[int] = None, policy: Optional[str] = None,
+                      files: Optional[List[Path]] = None, preview: bool = False) -> List[Dict[str, Any]]:
+        """Process all files in the data directory (or just `files`).
+        
+        Files are dispatched in the order chosen by the size-aware scheduler
+        (`lpt`, `spt` or `fifo`) and processed by `concurrency` worker threads.
+        Results are returned in discovery order. Analyses saved by a preview
+        are reused while their file is unchanged; with `preview`, new
+        analyses are marked for reuse.
+        """
+        files = self.discover_files() if files is None else files
         if not files:
             logger.warning("No files found in data directory")
-            return results
+            return []
         
-        logger.info(f"Found {len(files)} files to process")
+        concurrency = concurrency or int(os.getenv("WRANGLER_CONCURRENCY", "1"))
+        policy = policy or os.getenv("WRANGLER_SCHEDULE", "lpt")
+        hints_file = os.getenv("WRANGLER_SCHEDULE_HINTS")
+        jobs = schedule(files, self.cost_estimator, policy,
+                        load_hints(Path(hints_file) if hints_file else None))
         
-        for file_path in files:
-            logger.info(f"Processing: {file_path.name}")
-            
-            # Read file content
-            content = self.read_file(file_path)
-            
-            # Extract key facts
-            facts = self.extract_key_facts(content, file_path.name)
-            
-            # Add file info
-            facts["file_info"] = {
-                "path": str(file_path),
-                "size_bytes": file_path.stat().st_size,
-                "modified": datetime.fromtimestamp(file_path.stat().st_mtime).isoformat()
-            }
-            
-            results.append(facts)
-            
-            # Save individual result
-            output_file = self.demo_dir / f"{file_path.stem}_analysis.json"
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(facts, f, indent=2, ensure_ascii=False)
-            
-            logger.info(f"✅ Saved analysis to {output_file}")
+        logger.info(f"Found {len(files)} files to process "
+                    f"({policy} order, {concurrency} worker(s))")
+        
+        def run(job):
+            reused = self.load_preview_analysis(job.path, keep_mark=preview)
+            if reused is not None:
+                return job, reused, None
+            job_started = time.perf_counter()
+            facts = self.process_file(job.path, preview=preview)
+            return job, facts, time.perf_counter() - job_started
         
-        return results
+        results = {}
+        reused = 0
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [executor.submit(run, job) for job in jobs]
+            for future in as_completed(futures):
+                job, facts, elapsed = future.result()
+                results[job.index] = facts
+                if elapsed is None:
+                    reused += 1
+                    continue
+                with log_context(file=job.path.name):
+                    self.cost_estimator.observe(job.path, job.size_bytes, elapsed, job.estimated_seconds)
+                
+                if (job.deadline_seconds is not None
+                        and time.perf_counter() - started > job.deadline_seconds):
+                    logger.warning(f"⚠️  {job.path.name} missed its {job.deadline_seconds}s deadline")
+        
+        if self.learn_costs:
+            self.cost_estimator.save()
+        error = self.cost_estimator.mean_absolute_error()
+        # No error to report when every file was reused rather than timed
+        error_note = f" (cost estimate mean error {error:.2f}s)" if error is not None else ""
+        logger.info(f"Processed {len(results)} files in {time.perf_counter() - started:.2f}s{error_note}")
+        if reused:
+            logger.info(f"♻️  Reused {reused} analyses saved by a preview")
+        
+        writer = self.writer.stats()
+        logger.info(f"Output writer: queue depth {writer['queue_depth']} "
+                    f"(max {writer['max_queue_depth']}/{writer['queue_capacity']}), "
+                    f"flush p95 {writer['flush_latency']['p95_ms']} ms")
+        
+        return [results[index] for index in sorted(results)]
     
     def generate_summary_report(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Generate a comprehensive summary report."""
         
-        # Collect all key facts
-        all_facts = []
-        all_topics = []
-        all_entities = {"people": [], "organizations": [], "locations": []}
-        
+        # Aggregate facts, entities and model usage (see reporting.py)
+        accumulator = SummaryAccumulator()
         for result in results:
-            all_facts.extend(result.get("key_facts", []))
-            all_topics.extend(result.get("topics", []))
-            
-            entities = result.get("entities", {})
-            for key in all_entities:
-                all_entities[key].extend(entities.get(key, []))
+            try:
+                accumulator.add(result, self.router.default_model)
+            except (KeyError, TypeError, AttributeError) as e:
+                logger.warning(f"Leaving a malformed analysis out of the report ({type(e).__name__}: {e})")
+        
+        # Cluster near-synonym topics instead of listing every spelling
+        topics = self.topic_clusterer.cluster(accumulator.file_topics())
+        self.topic_clusterer.save()
         
         # Create summary report
-        summary_report = {
-            "metadata": {
-                "generated_at": datetime.now().isoformat(),
-                "total_files_processed": len(results),
-                "total_facts_extracted": len(all_facts),
-                "unique_topics": list(set(all_topics)),
-                "model_used": "gemini-1.5-flash"
-            },
-            "consolidated_facts": all_facts[:20],  # Top 20 facts
-            "consolidated_entities": {
-                key: list(set(values))[:10]  # Top 10 unique entities per category
-                for key, values in all_entities.items()
+        summary_report = build_summary_report(accumulator, topics, RUN_ID, {
+            "model_used": self.router.default_model,
+            "model_stats": self.router.stats(),
+            "model_calls": self.hedger.stats(),
+            "response_format": {
+                "format": "compact" if self.compact_response else "full",
+                "max_output_tokens": (self.generation_config or {}).get("max_output_tokens")
             },
-            "file_summaries": [
-                {
-                    "file": result["provenance"]["source_file"],
-                    "summary": result["summary"],
-                    "fact_count": len(result.get("key_facts", [])),
-                    "topics": result.get("topics", [])
-                }
-                for result in results
-            ]
-        }
+            "credentials": self.credentials.stats(),
+            "local_extractors": (self.extractors.stats(self.hedger.latency.percentile(50))
+                                 if self.extractors is not None else None)
+        })
+        
+        if self.corpus_reducer is not None:
+            summary_report["corpus_summary"] = self.corpus_reducer.reduce(results)
         
         return summary_report
+    
+    def save_summary_report(self, summary_report: Dict[str, Any]) -> Path:
+        """Write the summary report and wait until every queued output is on disk."""
+        summary_file = self.demo_dir / "summary_report.json"
+        summary_report["metadata"]["output_writer"] = self.writer.stats()
+        self.writer.submit(summary_file, summary_report)
+        self.writer.flush()
+        return summary_file
+    
+    def close(self):
+        """Flush pending outputs, stop background workers and drop cached prefixes."""
+        self.writer.close()
+        self.hedger.shutdown()
+        for cached_content in self._cached_contents:
+            try:
+                cached_content.delete()
+            except Exception as e:
+                logger.warning(f"Could not delete cached content {cached_content.name}: {e}")
+        self._cached_contents = []
 
 
-def run_demo():
+def run_demo(concurrency: Optional[int] = None, policy: Optional[str] = None,
+             pretty: Optional[bool] = None, profile: bool = False,
+             cassette_mode: Optional[str] = None, cassette_path: Optional[Path] = None,
+             replay_latency: Optional[bool] = None, stream: Optional[bool] = None,
+             corpus_summary: Optional[bool] = None, local_extractors: Optional[bool] = None,
+             compact_response: Optional[bool] = None):
     """Run the complete demo workflow."""
     console.print("\n🚀 [bold blue]Gemini CLI Buildathon Demo[/bold blue]")
     console.print("=" * 50)
     
+    wrangler = None
+    profiler = None
     try:
         # Initialize the wrangler
-        wrangler = GeminiFileWrangler()
+        wrangler = GeminiFileWrangler(pretty=pretty, cassette_mode=cassette_mode,
+                                      cassette_path=cassette_path, replay_latency=replay_latency,
+                                      stream=stream, corpus_summary=corpus_summary,
+                                      local_extractors=local_extractors,
+                                      compact_response=compact_response)
+        
+        if profile:
+            from profiling import StageProfiler
+            profiler = StageProfiler(wrangler.demo_dir)
+            profiler.instrument(wrangler)
+            profiler.start()
         
         # Process files
         console.print("\n📁 [bold]Processing files...[/bold]")
-        results = wrangler.process_files()
+        results = wrangler.process_files(concurrency=concurrency, policy=policy)
         
         if not results:
             console.print("❌ No files processed. Please add files to the /data directory.")
@@ -249,9 +731,7 @@ def run_demo():
         summary_report = wrangler.generate_summary_report(results)
         
         # Save summary report
-        summary_file = wrangler.demo_dir / "summary_report.json"
-        with open(summary_file, 'w', encoding='utf-8') as f:
-            json.dump(summary_report, f, indent=2, ensure_ascii=False)
+        summary_file = wrangler.save_summary_report(summary_report)
         
         # Display results
         console.print(f"\n✅ [bold green]Demo completed successfully![/bold green]")
@@ -267,22 +747,555 @@ def run_demo():
             console.print(f"[bold]Key Facts:[/bold] {len(result.get('key_facts', []))} facts extracted")
             console.print(f"[bold]Topics:[/bold] {', '.join(result.get('topics', [])[:3])}")
         
+        corpus = summary_report.get("corpus_summary")
+        if corpus and corpus["levels"]:
+            console.print(f"\n🌳 [bold]Corpus Summary[/bold] ({corpus['levels']} level(s), "
+                          f"{corpus['model_calls']} call(s), {corpus['cache_hits']} cached):")
+            console.print(corpus["summary"])
+        
         console.print(f"\n📁 [bold]Output files saved to:[/bold] {wrangler.demo_dir}")
         
     except Exception as e:
         console.print(f"\n❌ [bold red]Demo failed:[/bold red] {e}")
         logger.exception("Demo execution failed")
+    finally:
+        if wrangler is not None:
+            wrangler.close()
+        if profiler is not None:
+            collapsed_file, json_file = profiler.stop()
+            console.print(f"🔬 [bold]Profile written to:[/bold] {collapsed_file}, {json_file}")
 
 
-if __name__ == "__main__":
-    import sys
+def run_preview(size: int, seed: Optional[int] = None, concurrency: Optional[int] = None,
+                policy: Optional[str] = None, compact_response: Optional[bool] = None):
+    """Process a stratified sample of data/ and write a provisional summary report."""
+    from preview import estimate, stratified_sample
+    
+    console.print("\n🔭 [bold blue]Gemini CLI Buildathon Preview[/bold blue]")
+    console.print("=" * 50)
+    
+    wrangler = GeminiFileWrangler(compact_response=compact_response)
+    try:
+        files = wrangler.discover_files()
+        if not files:
+            console.print("❌ No files found. Please add files to the /data directory.")
+            return
+        
+        strata = stratified_sample(files, size, seed)
+        sample = [file_path for stratum in strata for file_path in stratum.sample]
+        console.print(f"🎯 Sampled {len(sample)} of {len(files)} files from {len(strata)} strata "
+                      f"(by {', '.join(strata[0].fields) or 'nothing'})")
+        
+        results = wrangler.process_files(concurrency=concurrency, policy=policy, files=sample, preview=True)
+        summary_report = wrangler.generate_summary_report(results)
+        file_topics = {entry["file"]: entry["canonical_topics"] for entry in summary_report["file_summaries"]}
+        preview = estimate(strata, dict(zip(sample, results)), file_topics)
+        summary_report["metadata"]["provisional"] = True
+        summary_report["preview"] = preview
+        summary_file = wrangler.save_summary_report(summary_report)
+    finally:
+        wrangler.close()
+    
+    console.print("\n📊 [bold]Estimated topic frequencies[/bold] (share of files, 95% CI):")
+    for row in preview["topic_frequencies"][:10]:
+        console.print(f"  {row['name']:<32} {row['share']:6.1%}  [{row['ci'][0]:.1%}, {row['ci'][1]:.1%}]")
+    console.print(f"\n🧮 [bold]Projected full run[/bold] ({preview['population_files']:,} files):")
+    for name, total in preview["projected_totals"].items():
+        if name != "files":
+            console.print(f"  {name:<14} {total['estimate']:>14,.2f}  [{total['ci'][0]:,.2f}, {total['ci'][1]:,.2f}]")
+    console.print(f"\n📋 Provisional report saved to {summary_file}; a full run reuses the sampled analyses")
+
+
+def run_watch(debounce: float = 0.5, poll_interval: float = 1.0, force_polling: bool = False,
+              stream: Optional[bool] = None, compact_response: Optional[bool] = None):
+    """Keep a warm wrangler and process files as they land in the data directory."""
+    from watch import create_watcher, debounced_changes
+    
+    console.print("\n👀 [bold blue]Gemini CLI Buildathon Watch Mode[/bold blue]")
+    console.print("=" * 50)
     
-    if len(sys.argv) > 1 and sys.argv[1] == "demo":
-        run_demo()
+    wrangler = GeminiFileWrangler(stream=stream, compact_response=compact_response)
+    
+    # Reuse analyses that are still current, process anything new or changed
+    results = {}
+    for file_path in wrangler.discover_files():
+        analysis = wrangler.load_analysis(file_path)
+        results[file_path.name] = analysis if analysis else wrangler.process_file(file_path)
+    
+    if results:
+        wrangler.save_summary_report(wrangler.generate_summary_report(list(results.values())))
+    console.print(f"📄 {len(results)} files up to date, waiting for changes (Ctrl+C to stop)")
+    
+    watcher = create_watcher(wrangler.data_dir, SUPPORTED_EXTENSIONS,
+                             poll_interval=poll_interval, force_polling=force_polling)
+    try:
+        for changed in debounced_changes(watcher, debounce=debounce):
+            started = time.perf_counter()
+            updated = 0
+            
+            for file_path in sorted(changed):
+                if not file_path.is_file():
+                    if results.pop(file_path.name, None) is not None:
+                        wrangler.analysis_path(file_path).unlink(missing_ok=True)
+                        logger.info(f"🗑️  Removed analysis for {file_path.name}")
+                        updated += 1
+                    continue
+                
+                if wrangler.load_analysis(file_path) is not None:
+                    continue  # Touched but unchanged since the last analysis
+                
+                try:
+                    results[file_path.name] = wrangler.process_file(file_path)
+                    updated += 1
+                except (OSError, UnicodeDecodeError) as e:
+                    logger.error(f"Could not read {file_path.name}: {e}")
+            
+            if updated:
+                summary_file = wrangler.save_summary_report(
+                    wrangler.generate_summary_report(list(results.values()))
+                )
+                elapsed = time.perf_counter() - started
+                console.print(f"✅ Updated {updated} file(s) and {summary_file} in {elapsed:.2f}s")
+    except KeyboardInterrupt:
+        console.print("\n👋 Watch mode stopped")
+    finally:
+        watcher.close()
+        wrangler.close()
+
+
+def run_server(host: str, port: int, max_concurrency: int, max_queue: int, stand_in: bool = False,
+               stream: Optional[bool] = None, compact_response: Optional[bool] = None):
+    """Serve extract_key_facts over HTTP with a shared, warm wrangler."""
+    import asyncio
+    from server import serve
+    
+    model_factory = None
+    if stand_in:
+        from stand_in import StandInModel
+        model_factory = StandInModel
+    
+    wrangler = GeminiFileWrangler(model_factory=model_factory, stream=stream,
+                                  compact_response=compact_response)
+    try:
+        asyncio.run(serve(wrangler, host=host, port=port,
+                          max_concurrency=max_concurrency, max_queue=max_queue))
+    except KeyboardInterrupt:
+        console.print("\n👋 Server stopped")
+    finally:
+        wrangler.close()
+
+
+def run_load_test(host: str, port: int, total: int, concurrency: int, duplicate_ratio: float):
+    """Load-test a running analysis service and print throughput and tail latency."""
+    import asyncio
+    from server import load_test
+    
+    console.print(f"\n🔥 [bold]Load testing http://{host}:{port}[/bold] "
+                  f"({total} requests, concurrency {concurrency})")
+    report = asyncio.run(load_test(host=host, port=port, total=total,
+                                   concurrency=concurrency, duplicate_ratio=duplicate_ratio))
+    console.print_json(json.dumps(report))
+
+
+def run_batch(stand_in: bool = False, reprocess_all: bool = False, poll_interval: float = 5.0,
+              max_poll_interval: float = 60.0, max_resubmits: int = 2, failure_rate: float = 0.1,
+              compact_response: Optional[bool] = None):
+    """Process pending files through asynchronous batch jobs and rebuild the summary report."""
+    from batch import BatchClient, BatchRunner, StandInBatchServer
+    
+    console.print("\n📦 [bold blue]Gemini CLI Buildathon Batch Mode[/bold blue]")
+    console.print("=" * 50)
+    
+    server = None
+    wrangler = None
+    try:
+        if stand_in:
+            from stand_in import StandInModel
+            server = StandInBatchServer(failure_rate=failure_rate)
+            client = BatchClient("stand-in", base_url=server.start())
+            wrangler = GeminiFileWrangler(model_factory=StandInModel, compact_response=compact_response)
+            console.print(f"🧪 Using the local stand-in batch endpoint at {client.base_url}")
+        else:
+            wrangler = GeminiFileWrangler(compact_response=compact_response)
+            # A replay cassette or a custom model factory leaves the pool without real keys
+            api_keys = [credential.api_key for credential in wrangler.credentials.credentials
+                        if credential.api_key]
+            if not api_keys:
+                raise ValueError("Batch mode needs an API key (GEMINI_API_KEY, GEMINI_API_KEYS or "
+                                 "GEMINI_CREDENTIALS_FILE) and cannot replay a cassette; "
+                                 "use --stand-in to run offline")
+            client = BatchClient(api_keys[0])
+        
+        # Reuse analyses that are still current unless everything is reprocessed
+        results = {}
+        pending = []
+        for file_path in wrangler.discover_files():
+            analysis = None if reprocess_all else wrangler.load_analysis(file_path)
+            if analysis:
+                results[file_path.name] = analysis
+            else:
+                pending.append(file_path)
+        console.print(f"📁 {len(pending)} file(s) to process, {len(results)} up to date")
+        
+        runner = BatchRunner(wrangler, client, wrangler.instructions, poll_initial_s=poll_interval,
+                             poll_max_s=max_poll_interval, max_resubmits=max_resubmits)
+        if pending:
+            results.update(runner.run(pending))
+        if not results:
+            console.print("❌ No files processed. Please add files to the /data directory.")
+            return
+        
+        ordered = [results[file_path.name] for file_path in wrangler.discover_files()
+                   if file_path.name in results]
+        summary_report = wrangler.generate_summary_report(ordered)
+        summary_report["metadata"]["batch"] = runner.stats()
+        summary_file = wrangler.save_summary_report(summary_report)
+        
+        stats = runner.stats()
+        console.print(f"✅ {stats['requests']} request(s) in {len(stats['jobs'])} job(s), "
+                      f"{stats['resubmitted']} resubmitted, {stats['failed']} failed, "
+                      f"estimated cost ${stats['estimated_cost_usd']:.6f}")
+        console.print(f"📁 Summary report saved to {summary_file}")
+    finally:
+        if wrangler is not None:
+            wrangler.close()
+        if server is not None:
+            server.stop()
+
+
+def run_report(workers: Optional[int] = None, pretty: Optional[bool] = None):
+    """Rebuild the summary report from the analyses saved in demo/, without model calls."""
+    from reporting import rebuild_summary
+    
+    demo_dir = Path("demo")
+    if not demo_dir.is_dir():
+        console.print("❌ No demo/ directory with saved analyses. Run the demo first.")
+        return
+    
+    console.print(f"\n📊 [bold blue]Rebuilding summary report[/bold blue] from {demo_dir}")
+    topic_clusterer = TopicClusterer(
+        threshold=float(os.getenv("WRANGLER_TOPIC_THRESHOLD", DEFAULT_TOPIC_THRESHOLD)),
+        state_path=demo_dir / "topic_clusters.npz"
+    )
+    summary_report = rebuild_summary(demo_dir, topic_clusterer, RUN_ID, workers=workers)
+    rebuild = summary_report["metadata"]["rebuild"]
+    if not rebuild["loaded"]:
+        console.print("❌ No readable analyses found. Run the demo first.")
+        return
+    
+    summary_file = demo_dir / "summary_report.json"
+    writer = OutputWriter(pretty=env_flag("WRANGLER_PRETTY_JSON") if pretty is None else pretty)
+    try:
+        writer.submit(summary_file, summary_report)
+    finally:
+        writer.close()
+    
+    console.print(f"✅ Rebuilt {summary_file} from {rebuild['loaded']:,} analyses in {rebuild['total_s']:.2f}s "
+                  f"(loaded in {rebuild['load_s']:.2f}s)")
+    if rebuild["skipped_count"]:
+        console.print(f"⚠️  Skipped {rebuild['skipped_count']:,} unreadable analyses "
+                      f"(listed under metadata.rebuild.skipped)")
+
+
+def run_plan(concurrency: Optional[int] = None, calibrate: bool = True, as_json: bool = False):
+    """Estimate tokens, wall time and spend for processing data/ without running it."""
+    from planner import RunPlanner, pool_rpm
+    
+    concurrency = concurrency or int(os.getenv("WRANGLER_CONCURRENCY", "1"))
+    try:
+        # Never upload cached content just to plan
+        wrangler = GeminiFileWrangler(context_cache=False, local_extractors=False)
+    except ValueError as e:
+        logger.warning(f"{e}; planning with uncalibrated token estimates and no rate limit")
+        wrangler = None
+    
+    try:
+        if wrangler is not None:
+            router, estimator, demo_dir = wrangler.router, wrangler.cost_estimator, wrangler.demo_dir
+            data_dir, rpm = wrangler.data_dir, pool_rpm(wrangler.credentials)
+            count_model = wrangler.model_factory(router.default_model)
+            count_tokens = (lambda text: count_model.count_tokens(text).total_tokens) if calibrate else None
+        else:
+            router, demo_dir, data_dir = ModelRouter.from_env(), Path("demo"), Path("data")
+            demo_dir.mkdir(exist_ok=True)
+            estimator, rpm, count_tokens = CostEstimator(demo_dir / "cost_model.json"), None, None
+        
+        instructions = wrangler.instructions if wrangler is not None else EXTRACTION_INSTRUCTIONS
+        planner = RunPlanner(router, estimator, demo_dir, instructions,
+                             count_tokens=count_tokens, rpm=rpm, concurrency=concurrency,
+                             context_cache=env_flag("GEMINI_CONTEXT_CACHE"))
+        plan = planner.plan(data_dir, SUPPORTED_EXTENSIONS)
+    finally:
+        if wrangler is not None:
+            wrangler.close()
+    
+    if as_json:
+        console.print_json(json.dumps(plan))
+        return
+    
+    tokens, timing, advice = plan["tokens"], plan["time"], plan["recommendations"]
+    console.print(f"\n🧮 [bold blue]Run plan[/bold blue] ({plan['files']} files, "
+                  f"{plan['bytes'] / 1024 / 1024:.1f} MB, planned in {plan['plan_s']:.2f}s)")
+    console.print(f"Input tokens: {tokens['input']:,} "
+                  f"({'calibrated' if tokens['calibrated'] else 'uncalibrated'} estimate), "
+                  f"output tokens: {tokens['output']:,}")
+    for model, stats in plan["models"].items():
+        console.print(f"  {model}: {stats['files']:,} files, {stats['calls']:,} calls, "
+                      f"${stats['estimated_cost_usd']:.4f}")
+    rate = f", {timing['rate_limit_rpm']:g} rpm" if timing["rate_limit_rpm"] else ""
+    console.print(f"Projected wall time: {timing['projected_wall_s']:,.1f}s "
+                  f"at concurrency {timing['concurrency']}{rate}")
+    console.print(f"Projected spend: ${plan['estimated_cost_usd']:.4f} "
+                  f"(${plan['batch_cost_usd']:.4f} in batch mode)")
+    console.print(f"\n💡 [bold]Recommended:[/bold] --concurrency {advice['concurrency']} "
+                  f"(projected {advice['projected_wall_s']:,.1f}s)")
+    for note in advice["notes"]:
+        console.print(f"  - {note}")
+
+
+def run_eval(gold_path: Path, configs_path: Optional[Path] = None, backend: str = "stand-in",
+             cassette_path: Optional[Path] = None):
+    """Score extraction quality against latency, tokens and cost under a matrix of settings."""
+    from evaluation import Evaluator
+    
+    def make_wrangler(config):
+        kwargs = {"local_extractors": bool(config.get("local_extractors")),
+                  "stream": bool(config.get("stream")),
+                  "compact_response": bool(config.get("compact"))}
+        if backend == "stand-in":
+            from stand_in import StandInModel
+            kwargs["model_factory"] = StandInModel
+        elif backend == "replay":
+            kwargs.update(cassette_mode="replay", cassette_path=cassette_path, replay_latency=True)
+        wrangler = GeminiFileWrangler(**kwargs)
+        if config.get("model"):
+            # Send every document to the configured model, without rules or escalation
+            wrangler.router = ModelRouter(rules=[], default_model=config["model"], escalation={})
+        return wrangler
+    
+    matrix = None
+    if configs_path:
+        with open(configs_path, 'r', encoding='utf-8') as f:
+            matrix = json.load(f)
+    
+    console.print(f"\n🧪 [bold blue]Evaluation[/bold blue] ({backend} responses, gold set {gold_path})")
+    report = Evaluator(make_wrangler, gold_path).run(matrix)
+    for row in sorted(report["configurations"], key=lambda row: -row["quality"]):
+        marker = "★" if row["pareto"] else " "
+        console.print(f"{marker} {row['name']:<28} quality {row['quality']:.3f} "
+                      f"(entities F1 {row['entity_f1']:.2f}, topics {row['topic_overlap']:.2f}, "
+                      f"facts {row['fact_coverage']:.2f})  {row['latency_ms']:8.1f} ms  "
+                      f"{row['tokens']:6d} tokens  ${row['cost_usd']:.6f}"
+                      + (f"  {row['errors']} error(s)" if row["errors"] else ""))
+    console.print(f"★ Pareto-optimal: {', '.join(report['pareto'])}")
+    for saving in report["compact_savings"]:
+        console.print(f"📉 {saving['compact']} vs {saving['full']}: "
+                      f"output tokens -{saving['output_token_reduction']:.0%}, "
+                      f"latency -{saving['latency_reduction']:.0%}, quality {saving['quality_change']:+.3f}")
+        for doc in saving["per_document"]:
+            console.print(f"   {doc['file']:<24} {doc['full_output_tokens']:5d} → {doc['compact_output_tokens']:5d} tokens, "
+                          f"{doc['full_latency_ms']:7.1f} → {doc['compact_latency_ms']:7.1f} ms")
+    console.print(f"📁 Report and plot saved to {', '.join(report['files'])}")
+
+
+def run_hedge_benchmark(calls: int, concurrency: int):
+    """Show how hedging settings move p99 latency and what they cost in extra calls."""
+    console.print(f"\n⏱️  [bold]Hedging benchmark[/bold] ({calls} simulated calls, concurrency {concurrency})")
+    rows = hedge_benchmark([None, 99, 95, 90], calls=calls, concurrency=concurrency)
+    for row in rows:
+        setting = f"p{row['hedge_percentile']:g}" if row["hedge_percentile"] else "off"
+        console.print(f"hedge {setting:>4}: p50 {row['p50_ms']:7.1f} ms, p99 {row['p99_ms']:7.1f} ms, "
+                      f"hedged {row['hedge_rate']:.1%}, extra calls {row['extra_calls_pct']}%")
+
+
+def print_usage():
+    """Print usage information for the demo script."""
+    console.print("Usage: python app.py [--log-format rich|json] [--log-sample RATE] <command> ...")
+    console.print("       python app.py demo [--concurrency N] [--schedule lpt|spt|fifo] [--pretty] [--profile]")
+    console.print("                         [--record [CASSETTE] | --replay [CASSETTE] [--replay-latency]]")
+    console.print("       python app.py watch [--debounce SECONDS] [--poll-interval SECONDS] [--polling]")
+    console.print("       python app.py serve [--host HOST] [--port PORT] [--stand-in]")
+    console.print("       python app.py loadtest [--requests N] [--concurrency N]")
+    console.print("       python app.py batch [--stand-in] [--all] [--max-resubmits N]")
+    console.print("       python app.py plan [--concurrency N] [--no-calibrate] [--json]")
+    console.print("       python app.py eval [--gold FILE] [--configs FILE] [--backend stand-in|replay|live]")
+    console.print("       python app.py hedge-bench [--calls N] [--concurrency N]")
+    console.print("       python app.py doctor [--online] [--json]")
+    console.print("\nThis script demonstrates the Gemini CLI integration.")
+    console.print("Make sure to:")
+    console.print("1. Set GEMINI_API_KEY in your .env file")
+    console.print("2. Add sample files to the /data directory")
+    console.print("3. Run: python app.py demo")
+
+
+def main(argv: Optional[List[str]] = None):
+    """Parse command line arguments and run the requested mode."""
+    parser = argparse.ArgumentParser(description="Gemini CLI Buildathon Demo", add_help=True)
+    parser.add_argument("--log-format", choices=LOG_FORMATS, default=None,
+                        help="rich console output or queued JSON lines on stderr (default: WRANGLER_LOG_FORMAT or rich)")
+    parser.add_argument("--log-sample", type=float, default=None, metavar="RATE",
+                        help="Share of files whose routine JSON log lines are kept (default: WRANGLER_LOG_SAMPLE or 1)")
+    subparsers = parser.add_subparsers(dest="command")
+    
+    demo_parser = subparsers.add_parser("demo", help="Process every file in data/ once")
+    demo_parser.add_argument("--concurrency", type=int, default=None,
+                             help="Files processed in parallel (default: WRANGLER_CONCURRENCY or 1)")
+    demo_parser.add_argument("--schedule", choices=POLICIES, default=None,
+                             help="Dispatch order: longest first, shortest first or discovery order")
+    demo_parser.add_argument("--pretty", action="store_true", default=None,
+                             help="Indent JSON outputs for debugging (default: compact)")
+    demo_parser.add_argument("--profile", action="store_true",
+                             help="Write per-stage CPU and allocation profiles to the output directory")
+    cassette_group = demo_parser.add_mutually_exclusive_group()
+    cassette_group.add_argument("--record", nargs="?", const=DEFAULT_CASSETTE, type=Path, metavar="CASSETTE",
+                                help=f"Append every model call to a JSONL cassette (default: {DEFAULT_CASSETTE})")
+    cassette_group.add_argument("--replay", nargs="?", const=DEFAULT_CASSETTE, type=Path, metavar="CASSETTE",
+                                help="Answer model calls from a cassette without network access")
+    demo_parser.add_argument("--replay-latency", action="store_true", default=None,
+                             help="Sleep for the recorded latency of each replayed call")
+    demo_parser.add_argument("--stream", action="store_true", default=None,
+                             help="Stream responses and show fields as they arrive (default: GEMINI_STREAM)")
+    demo_parser.add_argument("--corpus-summary", action="store_true", default=None,
+                             help="Add a model-written corpus summary to the report (tree reduction)")
+    demo_parser.add_argument("--no-local-extractors", dest="local_extractors", action="store_false", default=None,
+                             help="Send structured files to the model instead of reading them locally")
+    demo_parser.add_argument("--compact", dest="compact_response", action="store_true", default=None,
+                             help="Ask for short keys and capped lists with a bounded output budget")
+    
+    preview_parser = subparsers.add_parser("preview", help="Process a stratified sample for a provisional report")
+    preview_parser.add_argument("--size", type=int, default=DEFAULT_PREVIEW_SIZE,
+                                help=f"Files to sample (default: {DEFAULT_PREVIEW_SIZE})")
+    preview_parser.add_argument("--seed", type=int, default=None, help="Random seed for a repeatable sample")
+    preview_parser.add_argument("--concurrency", type=int, default=None,
+                                help="Worker threads (default: WRANGLER_CONCURRENCY or 1)")
+    preview_parser.add_argument("--schedule", choices=POLICIES, default=None,
+                                help="Dispatch order for the sampled files (default: WRANGLER_SCHEDULE or lpt)")
+    preview_parser.add_argument("--compact", dest="compact_response", action="store_true", default=None,
+                                help="Ask for short keys and capped lists with a bounded output budget")
+    
+    watch_parser = subparsers.add_parser("watch", help="Process files in data/ as they change")
+    watch_parser.add_argument("--debounce", type=float, default=0.5,
+                              help="Seconds of quiet before a burst of writes is processed")
+    watch_parser.add_argument("--poll-interval", type=float, default=1.0,
+                              help="Seconds between scans when polling")
+    watch_parser.add_argument("--polling", action="store_true",
+                              help="Poll file stats instead of using inotify")
+    watch_parser.add_argument("--stream", action="store_true", default=None,
+                              help="Stream responses and show summaries as they arrive")
+    watch_parser.add_argument("--compact", dest="compact_response", action="store_true", default=None,
+                              help="Ask for short keys and capped lists with a bounded output budget")
+    
+    serve_parser = subparsers.add_parser("serve", help="Serve extract_key_facts over HTTP")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8080)
+    serve_parser.add_argument("--max-concurrency", type=int, default=8,
+                              help="Model calls allowed in flight at once")
+    serve_parser.add_argument("--max-queue", type=int, default=64,
+                              help="Calls allowed to wait before requests are rejected with 503")
+    serve_parser.add_argument("--stand-in", action="store_true",
+                              help="Use the local stand-in model instead of the Gemini API")
+    serve_parser.add_argument("--stream", action="store_true", default=None,
+                              help="Stream model responses so /v1/extract/stream sends fields as they complete")
+    serve_parser.add_argument("--compact", dest="compact_response", action="store_true", default=None,
+                              help="Ask for short keys and capped lists with a bounded output budget")
+    
+    load_parser = subparsers.add_parser("loadtest", help="Load-test a running server")
+    load_parser.add_argument("--host", default="127.0.0.1")
+    load_parser.add_argument("--port", type=int, default=8080)
+    load_parser.add_argument("--requests", type=int, default=500)
+    load_parser.add_argument("--concurrency", type=int, default=50)
+    load_parser.add_argument("--duplicates", type=float, default=0.5,
+                             help="Share of requests repeating a hot document")
+    
+    batch_parser = subparsers.add_parser("batch", help="Process pending files through async batch jobs")
+    batch_parser.add_argument("--all", action="store_true",
+                              help="Reprocess every file, not just new or changed ones")
+    batch_parser.add_argument("--poll-interval", type=float, default=5.0,
+                              help="Initial seconds between job status checks (doubles up to the maximum)")
+    batch_parser.add_argument("--max-poll-interval", type=float, default=60.0)
+    batch_parser.add_argument("--max-resubmits", type=int, default=2,
+                              help="Follow-up jobs allowed for failed items")
+    batch_parser.add_argument("--stand-in", action="store_true",
+                              help="Run against a local stand-in batch endpoint instead of the Gemini API")
+    batch_parser.add_argument("--failure-rate", type=float, default=0.1,
+                              help="Share of items the stand-in endpoint fails")
+    batch_parser.add_argument("--compact", dest="compact_response", action="store_true", default=None,
+                              help="Ask for short keys and capped lists with a bounded output budget")
+    
+    report_parser = subparsers.add_parser("report", help="Rebuild the summary report from saved analyses, offline")
+    report_parser.add_argument("--workers", type=int, default=None,
+                               help="Processes parsing analyses (default: one per CPU)")
+    report_parser.add_argument("--pretty", action="store_true", default=None,
+                               help="Indent the JSON report (WRANGLER_PRETTY_JSON)")
+    
+    plan_parser = subparsers.add_parser("plan", help="Estimate tokens, time and cost of a demo run without running it")
+    plan_parser.add_argument("--concurrency", type=int, default=None,
+                             help="Concurrency to project wall time for (default: WRANGLER_CONCURRENCY or 1)")
+    plan_parser.add_argument("--no-calibrate", dest="calibrate", action="store_false",
+                             help="Skip count_tokens calibration calls, using cached or default ratios")
+    plan_parser.add_argument("--json", action="store_true", help="Print the plan as JSON")
+    
+    eval_parser = subparsers.add_parser("eval", help="Score extraction quality against latency and cost for a matrix of settings")
+    eval_parser.add_argument("--gold", type=Path, default=Path("eval/gold.json"),
+                             help="Labeled gold set (default: eval/gold.json)")
+    eval_parser.add_argument("--configs", type=Path, default=None,
+                             help="JSON list of configurations, or dict of lists to combine (default: built-in matrix)")
+    eval_parser.add_argument("--backend", choices=("stand-in", "replay", "live"), default="stand-in",
+                             help="Where responses come from (default: the offline stand-in model)")
+    eval_parser.add_argument("--cassette", type=Path, default=None,
+                             help=f"Cassette for --backend replay (default: {DEFAULT_CASSETTE})")
+    
+    hedge_parser = subparsers.add_parser("hedge-bench",
+                                         help="Measure hedging's effect on p99 with simulated stragglers")
+    hedge_parser.add_argument("--calls", type=int, default=400)
+    hedge_parser.add_argument("--concurrency", type=int, default=8)
+    
+    # Options after `doctor` are passed through to doctor.py
+    subparsers.add_parser("doctor", help="Check setup and connectivity (see python doctor.py --help)")
+    
+    args, extra_args = parser.parse_known_args(argv)
+    if extra_args and args.command != "doctor":
+        parser.error(f"unrecognized arguments: {' '.join(extra_args)}")
+    configure_logging(args.log_format, args.log_sample)
+    
+    if args.command == "demo":
+        cassette_mode = "record" if args.record else "replay" if args.replay else None
+        run_demo(concurrency=args.concurrency, policy=args.schedule, pretty=args.pretty,
+                 profile=args.profile, cassette_mode=cassette_mode,
+                 cassette_path=args.record or args.replay, replay_latency=args.replay_latency,
+                 stream=args.stream, corpus_summary=args.corpus_summary,
+                 local_extractors=args.local_extractors, compact_response=args.compact_response)
+    elif args.command == "preview":
+        if args.size < 1:
+            parser.error("--size must be at least 1")
+        run_preview(args.size, seed=args.seed, concurrency=args.concurrency, policy=args.schedule,
+                    compact_response=args.compact_response)
+    elif args.command == "watch":
+        run_watch(debounce=args.debounce, poll_interval=args.poll_interval,
+                  force_polling=args.polling, stream=args.stream, compact_response=args.compact_response)
+    elif args.command == "serve":
+        run_server(args.host, args.port, args.max_concurrency, args.max_queue,
+                   stand_in=args.stand_in, stream=args.stream, compact_response=args.compact_response)
+    elif args.command == "loadtest":
+        run_load_test(args.host, args.port, args.requests, args.concurrency, args.duplicates)
+    elif args.command == "batch":
+        run_batch(stand_in=args.stand_in, reprocess_all=args.all, poll_interval=args.poll_interval,
+                  max_poll_interval=args.max_poll_interval, max_resubmits=args.max_resubmits,
+                  failure_rate=args.failure_rate, compact_response=args.compact_response)
+    elif args.command == "report":
+        run_report(workers=args.workers, pretty=args.pretty)
+    elif args.command == "plan":
+        run_plan(concurrency=args.concurrency, calibrate=args.calibrate, as_json=args.json)
+    elif args.command == "eval":
+        run_eval(args.gold, args.configs, backend=args.backend, cassette_path=args.cassette)
+    elif args.command == "hedge-bench":
+        run_hedge_benchmark(args.calls, args.concurrency)
+    elif args.command == "doctor":
+        from doctor import main as doctor_main
+        sys.exit(doctor_main(extra_args))
     else:
-        console.print("Usage: python app.py demo")
-        console.print("\nThis script demonstrates the Gemini CLI integration.")
-        console.print("Make sure to:")
-        console.print("1. Set GEMINI_API_KEY in your .env file")
-        console.print("2. Add sample files to the /data directory")
-        console.print("3. Run: python app.py demo")
+        print_usage()
+
+
+if __name__ == "__main__":
+    main()
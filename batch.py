@@ -0,0 +1,505 @@
+#!/usr/bin/env python3
+"""
+Offline bulk processing through the Gemini Batch API.
+
+For backfills where latency does not matter, `BatchRunner` compiles every
+pending document into a JSONL file of `GenerateContentRequest`s (one job per
+routed model), uploads it, creates an asynchronous batch job and polls it
+with exponential backoff. Finished results are ingested into the usual
+per-file analyses. Items that errored, went missing or did not parse are
+resubmitted in a follow-up job, up to `max_resubmits` times, and anything
+still failing is written as an error analysis. Files the local extractors
+read completely never enter a job, and partially extracted ones only send
+their free text. Batch requests are billed at half the interactive price.
+
+`StandInBatchServer` implements the same REST endpoints locally (upload,
+`batchGenerateContent`, job status, download) on top of `StandInModel`, with
+a configurable per-item failure rate, so the whole flow runs end to end
+without an API key.
+
+Request and result lines look like:
+
+    {"key": "notes.txt", "request": {"contents": [...], "system_instruction": {...},
+                                     "generationConfig": {...}}}
+    {"key": "notes.txt", "response": {"candidates": [...], "usageMetadata": {...}}}
+    {"key": "notes.txt", "error": {"code": 500, "message": "..."}}
+"""
+
+import json
+import time
+import uuid
+import random
+import logging
+import threading
+import urllib.error
+import urllib.request
+from pathlib import Path
+from datetime import datetime
+from urllib.parse import parse_qs, urlparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from routing import estimate_cost
+from structured_logging import log_context
+
+logger = logging.getLogger("gemini-demo")
+
+DEFAULT_BASE_URL = "https://generativelanguage.googleapis.com"
+BATCH_DISCOUNT = 0.5
+
+SUCCEEDED = "SUCCEEDED"
+TERMINAL_STATES = {SUCCEEDED, "FAILED", "CANCELLED", "EXPIRED"}
+
+
+class BatchError(RuntimeError):
+    """Raised when the batch service rejects a request."""
+
+
+def job_state(job: Dict[str, Any]) -> str:
+    """Job state without its `BATCH_STATE_` / `JOB_STATE_` prefix."""
+    state = job.get("metadata", {}).get("state") or job.get("state") or "PENDING"
+    for prefix in ("BATCH_STATE_", "JOB_STATE_"):
+        if state.startswith(prefix):
+            return state[len(prefix):]
+    return state
+
+
+def responses_file(job: Dict[str, Any]) -> Optional[str]:
+    return (job.get("response", {}).get("responsesFile")
+            or job.get("metadata", {}).get("output", {}).get("responsesFile"))
+
+
+def request_line(key: str, prompt: str, system_instruction: str,
+                 generation_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    request = {
+        "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+        "system_instruction": {"parts": [{"text": system_instruction}]},
+    }
+    if generation_config:
+        # The REST API spells generation settings in camel case
+        request["generationConfig"] = {
+            "".join(word.capitalize() if i else word for i, word in enumerate(name.split("_"))): value
+            for name, value in generation_config.items()
+        }
+    return {"key": key, "request": request}
+
+
+def response_text(response: Dict[str, Any]) -> str:
+    candidates = response.get("candidates") or [{}]
+    parts = candidates[0].get("content", {}).get("parts", [])
+    return "".join(part.get("text", "") for part in parts)
+
+
+class BatchClient:
+    """Minimal REST client for file upload and batch jobs."""
+
+    def __init__(self, api_key: str, base_url: str = DEFAULT_BASE_URL, timeout: float = 60.0):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, method: str, url: str, data: Optional[bytes] = None,
+                 headers: Optional[Dict[str, str]] = None) -> Tuple[bytes, Any]:
+        if not url.startswith("http"):
+            url = f"{self.base_url}/{url.lstrip('/')}"
+        request = urllib.request.Request(url, data=data, method=method,
+                                         headers={"x-goog-api-key": self.api_key, **(headers or {})})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.read(), response.headers
+        except urllib.error.HTTPError as e:
+            raise BatchError(f"{method} {urlparse(url).path} failed with {e.code}: "
+                             f"{e.read()[:200].decode('utf-8', 'replace')}") from e
+
+    def _json(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        body, _ = self._request(method, path, data, {"Content-Type": "application/json"})
+        return json.loads(body or b"{}")
+
+    def upload(self, data: bytes, display_name: str) -> str:
+        """Upload a JSONL file (resumable protocol) and return its `files/...` name."""
+        _, headers = self._request("POST", "upload/v1beta/files", json.dumps({
+            "file": {"display_name": display_name}
+        }).encode("utf-8"), {
+            "Content-Type": "application/json",
+            "X-Goog-Upload-Protocol": "resumable",
+            "X-Goog-Upload-Command": "start",
+            "X-Goog-Upload-Header-Content-Length": str(len(data)),
+            "X-Goog-Upload-Header-Content-Type": "application/jsonl",
+        })
+        upload_url = headers.get("X-Goog-Upload-URL")
+        if not upload_url:
+            raise BatchError("Upload did not return an upload URL")
+        body, _ = self._request("POST", upload_url, data, {
+            "X-Goog-Upload-Offset": "0",
+            "X-Goog-Upload-Command": "upload, finalize",
+        })
+        return json.loads(body)["file"]["name"]
+
+    def create(self, model: str, file_name: str, display_name: str) -> Dict[str, Any]:
+        return self._json("POST", f"v1beta/models/{model}:batchGenerateContent", {
+            "batch": {"display_name": display_name, "input_config": {"file_name": file_name}}
+        })
+
+    def get(self, name: str) -> Dict[str, Any]:
+        return self._json("GET", f"v1beta/{name}")
+
+    def download(self, file_name: str) -> bytes:
+        body, _ = self._request("GET", f"download/v1beta/{file_name}:download?alt=media")
+        return body
+
+
+def poll(client: BatchClient, name: str, initial_s: float = 5.0, max_s: float = 60.0,
+         timeout_s: float = 24 * 3600, sleep: Callable[[float], None] = time.sleep) -> Dict[str, Any]:
+    """Poll a job with exponential backoff until it reaches a terminal state."""
+    started = time.monotonic()
+    delay = initial_s
+    while True:
+        job = client.get(name)
+        state = job_state(job)
+        if state in TERMINAL_STATES:
+            return job
+        if time.monotonic() - started > timeout_s:
+            raise BatchError(f"Batch {name} still {state} after {timeout_s:.0f}s")
+        logger.info(f"⏳ {name} is {state.lower()}, checking again in {delay:.1f}s")
+        sleep(delay)
+        delay = min(max_s, delay * 2)
+
+
+class BatchRunner:
+    """Compile, submit, poll and ingest batch jobs for a wrangler."""
+
+    def __init__(self, wrangler, client: BatchClient, system_instruction: str,
+                 poll_initial_s: float = 5.0, poll_max_s: float = 60.0, max_resubmits: int = 2):
+        self.wrangler = wrangler
+        self.client = client
+        self.system_instruction = system_instruction
+        self.poll_initial_s = poll_initial_s
+        self.poll_max_s = poll_max_s
+        self.max_resubmits = max_resubmits
+        self.work_dir = wrangler.demo_dir / "batch"
+
+        self.jobs: List[Dict[str, Any]] = []
+        self.requests = 0
+        self.resubmitted = 0
+        self.failed = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.cost = 0.0
+
+    def run(self, files: List[Path]) -> Dict[str, Dict[str, Any]]:
+        """Process `files` through batch jobs and return analyses by file name."""
+        run_id = datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+
+        results = {}
+        pending = {}
+        for file_path in files:
+            content = self.wrangler.read_file(file_path)
+            local = self.wrangler.extract_locally(content, file_path.name)
+            if local is not None and local[1].complete:
+                results[file_path.name] = self._save(
+                    file_path, self.wrangler.local_result(file_path.name, *local))
+                continue
+            if local is not None:
+                content = local[1].remainder or content
+            routing = self.wrangler.router.route(content, file_path.name)
+            pending[file_path.name] = {
+                "path": file_path,
+                "routing": routing,
+                "prompt": self.wrangler.build_prompt(content, file_path.name),
+                "local": local,
+                "error": None,
+            }
+
+        for attempt in range(self.max_resubmits + 1):
+            if not pending:
+                break
+            if attempt:
+                self.resubmitted += len(pending)
+                logger.info(f"🔁 Resubmitting {len(pending)} failed item(s), attempt {attempt + 1}")
+
+            with log_context(attempt=attempt + 1):
+                submitted = [self._submit(run_id, attempt, model, {key: pending[key] for key in keys})
+                             for model, keys in self._by_model(pending).items()]
+                for job_name, model, keys in submitted:
+                    outcome = self._collect(job_name, keys)
+                    for key in keys:
+                        item = pending[key]
+                        line = outcome.get(key)
+                        with log_context(file=key):
+                            facts = self._ingest(item, model, job_name, attempt, line,
+                                                 final=attempt == self.max_resubmits)
+                        if facts is not None:
+                            results[key] = facts
+                            del pending[key]
+
+        for key, item in pending.items():
+            self.failed += 1
+            logger.error(f"Batch processing failed for {key}: {item['error']}")
+            facts = self.wrangler.error_result(key, item["routing"]["model"], item["routing"],
+                                               item["error"])
+            results[key] = self._save(item["path"], facts)
+        return results
+
+    def _by_model(self, pending: Dict[str, Dict[str, Any]]) -> Dict[str, List[str]]:
+        groups: Dict[str, List[str]] = {}
+        for key, item in pending.items():
+            groups.setdefault(item["routing"]["model"], []).append(key)
+        return groups
+
+    def _submit(self, run_id: str, attempt: int, model: str, items: Dict[str, Dict[str, Any]]):
+        keys = list(items)
+        lines = [request_line(key, item["prompt"], self.system_instruction, self.wrangler.generation_config)
+                 for key, item in items.items()]
+        request_file = self.work_dir / f"{run_id}-{model}-{attempt}.jsonl"
+        data = "".join(json.dumps(line, ensure_ascii=False) + "\n" for line in lines).encode("utf-8")
+        request_file.write_bytes(data)
+
+        file_name = self.client.upload(data, request_file.name)
+        job = self.client.create(model, file_name, f"wrangler-{run_id}-{attempt}")
+        self.requests += len(keys)
+        self.jobs.append({"name": job["name"], "model": model, "requests": len(keys),
+                          "attempt": attempt, "input": str(request_file)})
+        logger.info(f"📦 Submitted {job['name']} with {len(keys)} request(s) for {model}")
+        return job["name"], model, keys
+
+    def _collect(self, job_name: str, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Wait for a job and return its result lines by key (empty if the job failed)."""
+        job = poll(self.client, job_name, self.poll_initial_s, self.poll_max_s)
+        state = job_state(job)
+        for entry in self.jobs:
+            if entry["name"] == job_name:
+                entry["state"] = state
+        output_file = responses_file(job)
+        if state != SUCCEEDED or not output_file:
+            error = job.get("error", {}).get("message") or (
+                f"batch job {state.lower()}" if state != SUCCEEDED else "batch job returned no responses file")
+            logger.error(f"❌ {job_name} ended {state}: {error}")
+            return {key: {"key": key, "error": {"message": error}} for key in keys}
+
+        output = self.client.download(output_file)
+        (self.work_dir / f"{job_name.replace('/', '-')}-results.jsonl").write_bytes(output)
+        lines = {}
+        for raw in output.decode("utf-8").splitlines():
+            if raw.strip():
+                line = json.loads(raw)
+                lines[line.get("key")] = line
+        return lines
+
+    def _ingest(self, item: Dict[str, Any], model: str, job_name: str, attempt: int,
+                line: Optional[Dict[str, Any]], final: bool) -> Optional[Dict[str, Any]]:
+        """Turn one result line into a saved analysis, or record why it must be retried."""
+        if line is None:
+            item["error"] = "missing from batch output"
+            return None
+        if "error" in line or "response" not in line:
+            item["error"] = line.get("error", {}).get("message", "no response")
+            return None
+
+        response = line["response"]
+        facts, parsed = self.wrangler.parse_response(response_text(response))
+        if not parsed and not final:
+            item["error"] = "unparseable response"
+            return None
+        if item["local"] is not None:
+            extractor_name, extraction = item["local"]
+            facts = extraction.merge(facts)
+            facts.setdefault("provenance", {})["extractor"] = extractor_name
+
+        usage = response.get("usageMetadata", {})
+        prompt_tokens = usage.get("promptTokenCount", 0)
+        output_tokens = usage.get("candidatesTokenCount", 0)
+        cost = estimate_cost(model, prompt_tokens, output_tokens) * BATCH_DISCOUNT
+        self.prompt_tokens += prompt_tokens
+        self.output_tokens += output_tokens
+        self.cost += cost
+
+        facts.setdefault("provenance", {}).update({
+            "source_file": item["path"].name,
+            "processed_at": datetime.now().isoformat(),
+            "model_used": model,
+            "routing": item["routing"],
+            "prompt_tokens": prompt_tokens,
+            "output_tokens": output_tokens,
+            "response_format": "compact" if self.wrangler.compact_response else "full",
+            "batch": {"job": job_name, "attempt": attempt + 1,
+                      "estimated_cost_usd": round(cost, 6)},
+        })
+        return self._save(item["path"], facts)
+
+    def _save(self, file_path: Path, facts: Dict[str, Any]) -> Dict[str, Any]:
+        facts["file_info"] = self.wrangler.file_info(file_path)
+        self.wrangler.writer.submit(self.wrangler.analysis_path(file_path), facts)
+        return facts
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "jobs": self.jobs,
+            "requests": self.requests,
+            "resubmitted": self.resubmitted,
+            "failed": self.failed,
+            "prompt_tokens": self.prompt_tokens,
+            "output_tokens": self.output_tokens,
+            "estimated_cost_usd": round(self.cost, 6),
+        }
+
+
+class StandInBatchServer:
+    """Local implementation of the batch REST endpoints backed by `StandInModel`.
+
+    Each item fails with probability `failure_rate`, so partial failures and
+    resubmission can be exercised. Jobs stay pending for `processing_s`.
+    """
+
+    def __init__(self, failure_rate: float = 0.1, processing_s: float = 0.5, seed: int = 0):
+        from stand_in import StandInModel
+
+        self._model_class = StandInModel
+        # One model per system instruction, so compact requests get compact replies
+        self.models: Dict[str, Any] = {}
+        self.failure_rate = failure_rate
+        self.processing_s = processing_s
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.files: Dict[str, bytes] = {}
+        self.uploads: Dict[str, str] = {}
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def start(self) -> str:
+        """Serve on a free local port and return the base URL."""
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        threading.Thread(target=self._server.serve_forever, name="stand-in-batch", daemon=True).start()
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def _run_job(self, name: str, model: str, file_name: str):
+        time.sleep(self.processing_s)
+        output = []
+        for raw in self.files[file_name].decode("utf-8").splitlines():
+            if not raw.strip():
+                continue
+            line = json.loads(raw)
+            with self._lock:
+                fail = self._random.random() < self.failure_rate
+            if fail:
+                output.append({"key": line["key"],
+                               "error": {"code": 500, "message": "Internal error (stand-in)"}})
+                continue
+            prompt = "".join(part["text"] for part in line["request"]["contents"][0]["parts"])
+            response = self._model(line["request"]).generate_content(prompt)
+            output.append({"key": line["key"], "response": {
+                "candidates": [{"content": {"role": "model", "parts": [{"text": response.text}]}}],
+                "usageMetadata": {
+                    "promptTokenCount": response.usage_metadata.prompt_token_count,
+                    "candidatesTokenCount": response.usage_metadata.candidates_token_count,
+                },
+            }})
+
+        result_file = f"files/{uuid.uuid4().hex[:12]}"
+        with self._lock:
+            self.files[result_file] = "".join(
+                json.dumps(line, ensure_ascii=False) + "\n" for line in output).encode("utf-8")
+            self.jobs[name]["metadata"]["state"] = "BATCH_STATE_SUCCEEDED"
+            self.jobs[name]["metadata"]["output"] = {"responsesFile": result_file}
+            self.jobs[name]["response"] = {"responsesFile": result_file}
+            self.jobs[name]["done"] = True
+
+    def _model(self, request: Dict[str, Any]):
+        parts = request.get("system_instruction", {}).get("parts", [])
+        instruction = "".join(part.get("text", "") for part in parts)
+        with self._lock:
+            if instruction not in self.models:
+                self.models[instruction] = self._model_class(
+                    base_latency=0.0, seconds_per_1k_tokens=0.0, seconds_per_1k_output_tokens=0.0,
+                    system_instruction=instruction)
+            return self.models[instruction]
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, body: bytes, headers: Optional[Dict[str, str]] = None,
+                      content_type: str = "application/json"):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_json(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None):
+                self._send(status, json.dumps(payload).encode("utf-8"), headers)
+
+            def _authorized(self) -> bool:
+                if self.headers.get("x-goog-api-key"):
+                    return True
+                self._send_json(401, {"error": {"code": 401, "message": "API key required"}})
+                return False
+
+            def do_POST(self):
+                if not self._authorized():
+                    return
+                url = urlparse(self.path)
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                command = self.headers.get("X-Goog-Upload-Command", "")
+
+                if url.path == "/upload/v1beta/files" and command == "start":
+                    upload_id = uuid.uuid4().hex[:12]
+                    server.uploads[upload_id] = f"files/{upload_id}"
+                    host = f"http://{self.headers.get('Host')}"
+                    self._send_json(200, {}, {"X-Goog-Upload-URL":
+                                              f"{host}/upload/v1beta/files?upload_id={upload_id}"})
+                elif url.path == "/upload/v1beta/files" and "finalize" in command:
+                    file_name = server.uploads.pop(parse_qs(url.query).get("upload_id", [""])[0], None)
+                    if file_name is None:
+                        return self._send_json(404, {"error": {"code": 404, "message": "Unknown upload"}})
+                    server.files[file_name] = body
+                    self._send_json(200, {"file": {"name": file_name, "mimeType": "application/jsonl"}})
+                elif url.path.startswith("/v1beta/models/") and url.path.endswith(":batchGenerateContent"):
+                    model = url.path[len("/v1beta/models/"):-len(":batchGenerateContent")]
+                    file_name = json.loads(body)["batch"]["input_config"]["file_name"]
+                    if file_name not in server.files:
+                        return self._send_json(400, {"error": {"code": 400, "message": "Unknown input file"}})
+                    name = f"batches/{uuid.uuid4().hex[:12]}"
+                    job = {"name": name, "metadata": {"model": f"models/{model}",
+                                                      "state": "BATCH_STATE_PENDING"}, "done": False}
+                    with server._lock:
+                        server.jobs[name] = job
+                    threading.Thread(target=server._run_job, args=(name, model, file_name),
+                                     daemon=True).start()
+                    self._send_json(200, job)
+                else:
+                    self._send_json(404, {"error": {"code": 404, "message": f"No route for {url.path}"}})
+
+            def do_GET(self):
+                if not self._authorized():
+                    return
+                url = urlparse(self.path)
+                if url.path.startswith("/v1beta/batches/"):
+                    with server._lock:
+                        job = server.jobs.get(url.path[len("/v1beta/"):])
+                        payload = json.loads(json.dumps(job)) if job else None
+                    if payload is None:
+                        return self._send_json(404, {"error": {"code": 404, "message": "Unknown batch"}})
+                    self._send_json(200, payload)
+                elif url.path.startswith("/download/v1beta/") and url.path.endswith(":download"):
+                    file_name = url.path[len("/download/v1beta/"):-len(":download")]
+                    with server._lock:
+                        data = server.files.get(file_name)
+                    if data is None:
+                        return self._send_json(404, {"error": {"code": 404, "message": "Unknown file"}})
+                    self._send(200, data, content_type="application/jsonl")
+                else:
+                    self._send_json(404, {"error": {"code": 404, "message": f"No route for {url.path}"}})
+
+        return Handler
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Record/replay cassettes for model calls.
+
+In record mode every model request and response (with usage metadata and
+latency) is appended to a JSONL cassette. In replay mode responses are
+served from the cassette by request hash, at memory speed or with the
+recorded latencies, so the full pipeline can run offline and in CI.
+
+Each cassette line looks like:
+
+    {"hash": "...", "model": "gemini-1.5-flash", "request": {"prompt": "...", "generation_config": null},
+     "response": {"text": "...", "usage_metadata": {...}}, "latency_s": 1.23, "recorded_at": "..."}
+"""
+
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from stand_in import StandInResponse, StandInUsage, stream_chunks
+from streaming import chunk_text
+
+DEFAULT_CASSETTE = Path("demo") / "cassette.jsonl"
+
+USAGE_FIELDS = ("prompt_token_count", "candidates_token_count", "total_token_count",
+                "cached_content_token_count")
+
+
+class CassetteMiss(KeyError):
+    """Raised in replay mode when a request was never recorded."""
+
+
+def request_hash(model_name: str, system_instruction: Optional[str], prompt: str,
+                 generation_config: Any = None) -> str:
+    """Stable hash of everything that determines a model's response."""
+    payload = json.dumps({
+        "model": model_name,
+        "system_instruction": system_instruction,
+        "prompt": prompt,
+        "generation_config": generation_config,
+    }, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """Append-only JSONL store of model interactions, indexed by request hash."""
+
+    def __init__(self, path: Path = DEFAULT_CASSETTE):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, List[Dict[str, Any]]]] = None
+        self._replayed: Dict[str, int] = {}
+
+    def load(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Read the cassette into memory (once)."""
+        with self._lock:
+            if self._entries is None:
+                entries: Dict[str, List[Dict[str, Any]]] = {}
+                if self.path.exists():
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        for line in f:
+                            if line.strip():
+                                entry = json.loads(line)
+                                entries.setdefault(entry["hash"], []).append(entry)
+                self._entries = entries
+            return self._entries
+
+    def append(self, entry: Dict[str, Any]):
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+            if self._entries is not None:
+                self._entries.setdefault(entry["hash"], []).append(entry)
+
+    def lookup(self, key: str) -> Dict[str, Any]:
+        """Return the recorded entry for a hash, cycling through repeated recordings."""
+        recorded = self.load().get(key)
+        if not recorded:
+            raise CassetteMiss(f"No recorded response for request {key[:12]} in {self.path}")
+        with self._lock:
+            index = self._replayed.get(key, 0)
+            self._replayed[key] = index + 1
+        return recorded[index % len(recorded)]
+
+
+def _usage_dict(response) -> Dict[str, int]:
+    usage = getattr(response, "usage_metadata", None)
+    return {field: getattr(usage, field, 0) or 0 for field in USAGE_FIELDS}
+
+
+class RecordingModel:
+    """Wrap a model and append every call to a cassette."""
+
+    def __init__(self, model, model_name: str, cassette: Cassette,
+                 system_instruction: Optional[str] = None):
+        self._model = model
+        self.model_name = model_name
+        self.cassette = cassette
+        self.system_instruction = system_instruction
+
+    def generate_content(self, prompt, **kwargs):
+        generation_config = kwargs.get("generation_config")
+        started = time.perf_counter()
+        response = self._model.generate_content(prompt, **kwargs)
+        if kwargs.get("stream"):
+            return self._record_stream(response, prompt, generation_config, started)
+
+        self._record(prompt, generation_config, response.text, response,
+                     time.perf_counter() - started)
+        return response
+
+    def _record_stream(self, chunks, prompt, generation_config, started: float):
+        """Pass chunks through, recording what was received once the stream ends or is closed."""
+        received = []
+        last = None
+        try:
+            for chunk in chunks:
+                received.append(chunk_text(chunk))
+                last = chunk
+                yield chunk
+        finally:
+            self._record(prompt, generation_config, "".join(received), last,
+                         time.perf_counter() - started)
+
+    def _record(self, prompt, generation_config, text: str, response, latency: float):
+        self.cassette.append({
+            "hash": request_hash(self.model_name, self.system_instruction, prompt, generation_config),
+            "model": self.model_name,
+            "request": {"prompt": prompt, "generation_config": generation_config},
+            "response": {"text": text, "usage_metadata": _usage_dict(response)},
+            "latency_s": round(latency, 4),
+            "recorded_at": datetime.now().isoformat(),
+        })
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+
+class ReplayModel:
+    """Serve recorded responses by request hash, optionally with recorded latency."""
+
+    def __init__(self, model_name: str, cassette: Cassette,
+                 system_instruction: Optional[str] = None, simulate_latency: bool = False):
+        self.model_name = model_name
+        self.cassette = cassette
+        self.system_instruction = system_instruction
+        self.simulate_latency = simulate_latency
+
+    def generate_content(self, prompt, stream: bool = False, **kwargs):
+        key = request_hash(self.model_name, self.system_instruction, prompt,
+                           kwargs.get("generation_config"))
+        entry = self.cassette.lookup(key)
+        latency = entry.get("latency_s", 0) if self.simulate_latency else 0
+
+        usage = entry["response"].get("usage_metadata", {})
+        response_usage = StandInUsage(usage.get("prompt_token_count", 0),
+                                      usage.get("candidates_token_count", 0))
+        response_usage.cached_content_token_count = usage.get("cached_content_token_count", 0)
+        if stream:
+            return stream_chunks(entry["response"]["text"], response_usage, latency)
+        time.sleep(latency)
+        return StandInResponse(entry["response"]["text"], response_usage)
+
+
+def recording_factory(model_factory: Callable[..., Any], cassette: Cassette) -> Callable[..., Any]:
+    """Model factory whose models record every call to `cassette`."""
+    def factory(model_name: str, system_instruction: Optional[str] = None, **kwargs):
+        model = model_factory(model_name, system_instruction=system_instruction, **kwargs)
+        return RecordingModel(model, model_name, cassette, system_instruction)
+    return factory
+
+
+def replay_factory(cassette: Cassette, simulate_latency: bool = False) -> Callable[..., Any]:
+    """Model factory whose models answer from `cassette` without network access."""
+    cassette.load()
+
+    def factory(model_name: str, system_instruction: Optional[str] = None, **kwargs):
+        return ReplayModel(model_name, cassette, system_instruction, simulate_latency)
+    return factory
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Compact response schema.
+
+Generation time grows with output tokens. The full schema spends many of
+them on long key names and lists of any length. In compact mode the model
+is asked for one-letter keys and a capped number of items per field.
+`max_output_tokens` is sized from those caps, and `expand` turns the reply
+back into the full result schema locally:
+
+    {"s": "summary", "f": ["fact"], "t": ["topic"],
+     "e": {"p": ["person"], "o": ["org"], "l": ["place"]}, "m": "0"}
+
+Sentiment is `+`, `-` or `0`. Provenance is never requested; the wrangler
+fills it in after the call.
+"""
+
+from typing import Any, Dict, Tuple
+
+COMPACT_KEYS = {"s": "summary", "f": "key_facts", "t": "topics", "e": "entities", "m": "sentiment"}
+COMPACT_FIELDS = tuple(COMPACT_KEYS)
+ENTITY_KEYS = {"p": "people", "o": "organizations", "l": "locations"}
+SENTIMENTS = {"+": "positive", "-": "negative", "0": "neutral"}
+
+# Items allowed per list field (per category for entities)
+LIMITS = {"key_facts": 5, "topics": 5, "entities": 5}
+
+# Rough output tokens per item, used to size max_output_tokens with some headroom
+_SUMMARY_TOKENS = 90
+_TOKENS_PER_ITEM = {"key_facts": 35, "topics": 6, "entities": 8}
+_OVERHEAD_TOKENS = 40
+_HEADROOM = 1.5
+
+COMPACT_INSTRUCTIONS = f"""Analyze the document provided by the user and extract key facts.
+
+Reply with compact JSON only, using exactly these keys:
+{{"s": "summary, at most 2 sentences",
+ "f": ["key fact", ...],
+ "t": ["topic", ...],
+ "e": {{"p": ["person", ...], "o": ["organization", ...], "l": ["location", ...]}},
+ "m": "+ for positive, - for negative, 0 for neutral"}}
+
+At most {LIMITS['key_facts']} facts, {LIMITS['topics']} topics and {LIMITS['entities']} entities per list, most important first. Keep facts short. Omit empty lists."""
+
+
+def output_token_budget() -> int:
+    """`max_output_tokens` for a compact reply at the item caps."""
+    items = sum(_TOKENS_PER_ITEM[field] * LIMITS[field] * (3 if field == "entities" else 1)
+                for field in LIMITS)
+    return int((_SUMMARY_TOKENS + items + _OVERHEAD_TOKENS) * _HEADROOM)
+
+
+def generation_config() -> Dict[str, Any]:
+    return {"max_output_tokens": output_token_budget()}
+
+
+def _expand_entities(value: Any) -> Dict[str, Any]:
+    value = value if isinstance(value, dict) else {}
+    return {name: list(value.get(short, value.get(name, [])))[:LIMITS["entities"]]
+            for short, name in ENTITY_KEYS.items()}
+
+
+def expand_field(key: str, value: Any) -> Tuple[str, Any]:
+    """Full field name and value for one compact field."""
+    name = COMPACT_KEYS.get(key, key)
+    if name == "entities":
+        return name, _expand_entities(value)
+    if name == "sentiment":
+        return name, SENTIMENTS.get(str(value), value)
+    if name in LIMITS and isinstance(value, list):
+        return name, value[:LIMITS[name]]
+    return name, value
+
+
+def is_compact(data: Dict[str, Any]) -> bool:
+    """Whether a reply uses the compact keys and none of the full ones."""
+    return (any(key in data for key in COMPACT_KEYS)
+            and not any(name in data for name in COMPACT_KEYS.values()))
+
+
+def expand(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Full result schema from a compact reply; replies with any full-schema key pass through."""
+    if any(name in data for name in COMPACT_KEYS.values()):
+        return data
+    result = dict(expand_field(key, data.get(key)) for key in COMPACT_FIELDS)
+    for name in ("key_facts", "topics"):
+        result[name] = result[name] or []
+    result["summary"] = result["summary"] or ""
+    result["sentiment"] = result["sentiment"] or "neutral"
+    return result
+
+
+def compress(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Compact form of a full result, within the item caps (used by stand-in models)."""
+    reverse_sentiments = {name: short for short, name in SENTIMENTS.items()}
+    entities = result.get("entities", {})
+    compact = {
+        "s": result.get("summary", ""),
+        "f": result.get("key_facts", [])[:LIMITS["key_facts"]],
+        "t": result.get("topics", [])[:LIMITS["topics"]],
+        "e": {short: entities.get(name, [])[:LIMITS["entities"]]
+              for short, name in ENTITY_KEYS.items() if entities.get(name)},
+        "m": reverse_sentiments.get(result.get("sentiment"), "0"),
+    }
+    return {key: value for key, value in compact.items() if value != [] and value != {}}
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Hierarchical corpus summary.
+
+`CorpusReducer` builds a model-written summary of the whole corpus by tree
+reduction. Per-file summaries are the leaves. Each level groups its nodes
+into token-bounded batches, summarizes the batches in parallel and feeds the
+results to the next level, until a single root remains.
+
+Group boundaries are content-defined: a group ends after a node whose
+anchor (a hash of the file name, or of the first child for inner nodes)
+hits a fixed residue, or when the token budget is full. Adding, removing or
+editing a file therefore only changes its own group, not every group after
+it. Nodes are cached by a hash of their children's text, so after a few
+files change only the path from those leaves to the root is recomputed.
+The cache lives in `demo/corpus_cache.json` and is pruned to the current
+tree after every run.
+"""
+
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from routing import estimate_tokens
+
+logger = logging.getLogger("gemini-demo")
+
+REDUCE_INSTRUCTIONS = """You combine summaries of documents (or of groups of documents) from one corpus into a single summary.
+
+Reply with JSON only:
+{
+    "summary": "3-5 sentence synthesis of what these documents cover together",
+    "themes": ["theme1", "theme2", "theme3"]
+}
+
+Focus on themes shared across documents and notable differences between them. Do not list the documents one by one."""
+
+
+class Node:
+    """One summary in the reduction tree."""
+
+    def __init__(self, text: str, anchor: str, themes: Optional[List[str]] = None):
+        self.text = text
+        self.anchor = anchor
+        self.themes = themes or []
+
+
+def _hash(*parts: str) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def group_nodes(nodes: List[Node], max_tokens: int, fan_in: int) -> List[List[Node]]:
+    """Split nodes into groups at content-defined boundaries within a token budget.
+
+    Every group but the last holds at least two nodes, so each level shrinks.
+    """
+    groups: List[List[Node]] = []
+    current: List[Node] = []
+    tokens = 0
+    for node in nodes:
+        cost = estimate_tokens(node.text)
+        if len(current) >= 2 and tokens + cost > max_tokens:
+            groups.append(current)
+            current, tokens = [], 0
+        current.append(node)
+        tokens += cost
+        if len(current) >= 2 and int(node.anchor[:8], 16) % fan_in == 0:
+            groups.append(current)
+            current, tokens = [], 0
+    if current:
+        groups.append(current)
+    return groups
+
+
+def parse_reduction(text: str) -> Tuple[str, List[str]]:
+    """Read `summary` and `themes` from a reply, tolerating fences around the JSON."""
+    match = re.search(r"\{.*\}", text, re.DOTALL)
+    try:
+        data = json.loads(match.group(0)) if match else {}
+    except json.JSONDecodeError:
+        data = {}
+    if not isinstance(data, dict) or not data.get("summary"):
+        return text.strip(), []
+    return data["summary"], [str(theme) for theme in data.get("themes", [])]
+
+
+class CorpusReducer:
+    """Tree-reduce per-file summaries into one corpus summary, caching inner nodes."""
+
+    def __init__(self, generate: Callable[[str], str], cache_path: Path, model_name: str,
+                 max_batch_tokens: int = 4000, fan_in: int = 8, concurrency: int = 4):
+        self.generate = generate
+        self.cache_path = cache_path
+        self.model_name = model_name
+        self.max_batch_tokens = max_batch_tokens
+        self.fan_in = fan_in
+        self.concurrency = concurrency
+        self._lock = threading.Lock()
+
+    def _load_cache(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _save_cache(self, cache: Dict[str, Dict[str, Any]]):
+        tmp_path = self.cache_path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, ensure_ascii=False, separators=(",", ":"))
+        tmp_path.replace(self.cache_path)
+
+    def leaves(self, results: List[Dict[str, Any]]) -> List[Node]:
+        """One leaf per analysed file, in file-name order so the tree is stable."""
+        leaves = []
+        for result in results:
+            file_name = result.get("provenance", {}).get("source_file", "")
+            if result.get("provenance", {}).get("error"):
+                continue
+            topics = ", ".join(result.get("topics", [])[:5])
+            text = f"{file_name}: {result.get('summary', '')}" + (f" (topics: {topics})" if topics else "")
+            leaves.append(Node(text, _hash("leaf", file_name)))
+        return sorted(leaves, key=lambda node: node.text)
+
+    def _prompt(self, level: int, group: List[Node]) -> str:
+        # Keep any single child from crowding out its siblings
+        limit = self.max_batch_tokens * 4 // 2
+        items = "\n".join(f"- {node.text[:limit]}" for node in group)
+        return f"Level {level} group of {len(group)} summaries\nContent:\n{items}"
+
+    def _reduce_group(self, level: int, group: List[Node], cache: Dict[str, Dict[str, Any]],
+                      used: Dict[str, Dict[str, Any]], counters: Dict[str, int]) -> Node:
+        key = _hash(self.model_name, REDUCE_INSTRUCTIONS, str(level), *(node.text for node in group))
+        anchor = _hash("node", group[0].anchor)
+
+        entry = cache.get(key)
+        if entry is None:
+            try:
+                summary, themes = parse_reduction(self.generate(self._prompt(level, group)))
+                entry = {"summary": summary, "themes": themes, "level": level, "children": len(group)}
+                with self._lock:
+                    counters["model_calls"] += 1
+            except Exception as e:
+                # Fall back to the children's own text and leave the node uncached
+                logger.error(f"Corpus summary for a level {level} group failed: {e}")
+                with self._lock:
+                    counters["errors"] += 1
+                return Node(" ".join(node.text for node in group), anchor,
+                            sorted({theme for node in group for theme in node.themes}))
+        else:
+            with self._lock:
+                counters["cache_hits"] += 1
+
+        with self._lock:
+            used[key] = entry
+        return Node(entry["summary"], anchor, entry["themes"])
+
+    def reduce(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Build (or incrementally update) the corpus summary for `results`."""
+        started = time.perf_counter()
+        nodes = self.leaves(results)
+        if not nodes:
+            return {"summary": "", "themes": [], "model": self.model_name, "levels": 0, "nodes": 0,
+                    "model_calls": 0, "cache_hits": 0, "errors": 0,
+                    "elapsed_s": round(time.perf_counter() - started, 3)}
+
+        cache = self._load_cache()
+        used: Dict[str, Dict[str, Any]] = {}
+        counters = {"model_calls": 0, "cache_hits": 0, "errors": 0}
+        total_nodes = 0
+        level = 0
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while True:
+                level += 1
+                groups = group_nodes(nodes, self.max_batch_tokens, self.fan_in)
+                nodes = list(executor.map(
+                    lambda group: self._reduce_group(level, group, cache, used, counters), groups
+                ))
+                total_nodes += len(nodes)
+                logger.info(f"🌳 Corpus level {level}: {len(groups)} group(s)")
+                if len(nodes) == 1:
+                    break
+
+        self._save_cache(used)
+        return {
+            "summary": nodes[0].text,
+            "themes": nodes[0].themes,
+            "model": self.model_name,
+            "levels": level,
+            "nodes": total_nodes,
+            "model_calls": counters["model_calls"],
+            "cache_hits": counters["cache_hits"],
+            "errors": counters["errors"],
+            "elapsed_s": round(time.perf_counter() - started, 3),
+        }
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Pooled API credentials.
+
+Quotas are enforced per key (and per project), so one key caps throughput no
+matter how many workers run. `CredentialPool` spreads calls over several
+keys: each credential has its own requests-per-minute limiter and health
+state, `lease()` hands out the least-loaded credential that has quota left,
+keys answering 429 cool down with exponential backoff, and keys rejected as
+invalid are taken out of rotation.
+
+Credentials are read from, in order:
+
+- `GEMINI_CREDENTIALS_FILE`, a JSON list such as
+      [{"name": "team-a", "api_key_env": "GEMINI_KEY_A", "project": "proj-a", "rpm": 15},
+       {"api_key": "...", "project": "proj-b"}]
+  (`api_key_env` keeps the secret itself out of the file)
+- `GEMINI_API_KEYS`, a comma-separated list of keys
+- `GEMINI_API_KEY`
+
+`GEMINI_KEY_RPM` sets the default per-key limit. Credentials naming the same
+project share one limiter, because the quota belongs to the project. Keys
+are only ever logged redacted, as `...` plus their last four characters.
+"""
+
+import os
+import re
+import json
+import time
+import logging
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger("gemini-demo")
+
+BASE_COOLDOWN_S = 5.0
+MAX_COOLDOWN_S = 120.0
+# Errors without a status code are rate limits only when their message says so
+RATE_LIMIT_MESSAGE = re.compile(r"\b429\b.*(quota|rate)", re.IGNORECASE)
+
+
+def redact(api_key: str) -> str:
+    """Show only the last four characters of a key."""
+    return f"...{api_key[-4:]}" if api_key else "(none)"
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    """Whether an SDK or HTTP error is a 429 / quota exhaustion."""
+    code = getattr(error, "code", None)
+    return (code == 429 or type(error).__name__ in ("ResourceExhausted", "TooManyRequests")
+            or RATE_LIMIT_MESSAGE.search(str(error)) is not None)
+
+
+def is_invalid_key(error: BaseException) -> bool:
+    """Whether an error means the key itself is unusable."""
+    text = str(error)
+    return (type(error).__name__ in ("PermissionDenied", "Unauthenticated")
+            or "API_KEY_INVALID" in text or "API key not valid" in text)
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Server-suggested retry delay in seconds, when the error carries one."""
+    response = getattr(error, "response", None)
+    value = getattr(response, "headers", {}).get("Retry-After") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class RateLimiter:
+    """Token bucket allowing `rpm` requests per minute, with bursts up to `rpm`."""
+
+    def __init__(self, rpm: Optional[float] = None):
+        self.rpm = rpm
+        self._tokens = float(rpm) if rpm else 0.0
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        if self.rpm:
+            self._tokens = min(float(self.rpm), self._tokens + (now - self._updated) * self.rpm / 60)
+        self._updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a request may be sent (0 when one may go now)."""
+        if not self.rpm:
+            return 0.0
+        self._refill(now)
+        return 0.0 if self._tokens >= 1 else (1 - self._tokens) * 60 / self.rpm
+
+    def take(self, now: float):
+        if self.rpm:
+            self._refill(now)
+            self._tokens -= 1
+
+
+class Credential:
+    """One API key with its limiter and health state."""
+
+    def __init__(self, api_key: Optional[str] = None, name: Optional[str] = None,
+                 project: Optional[str] = None, rpm: Optional[float] = None):
+        self.api_key = api_key
+        self.name = name or redact(api_key or "")
+        self.project = project
+        self.rpm = rpm
+        self.limiter: Optional[RateLimiter] = None
+        self.model_factory: Optional[Callable[..., Any]] = None
+
+        self.in_flight = 0
+        self.calls = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.consecutive_rate_limits = 0
+        self.cooldown_until = 0.0
+        self.disabled = False
+
+    def __repr__(self) -> str:
+        return f"Credential({self.name!r}, project={self.project!r})"
+
+    def state(self, now: float) -> str:
+        if self.disabled:
+            return "disabled"
+        return "cooling_down" if now < self.cooldown_until else "ok"
+
+    def to_dict(self, now: float) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "key": redact(self.api_key or ""),
+            "project": self.project,
+            "rpm": self.rpm,
+            "state": self.state(now),
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "errors": self.errors,
+            "rate_limited": self.rate_limited,
+            "cooldown_remaining_s": round(max(0.0, self.cooldown_until - now), 1),
+        }
+
+
+class NoUsableCredentials(RuntimeError):
+    """Raised when every credential has been disabled."""
+
+
+class CredentialPool:
+    """Least-loaded scheduling over credentials with per-key limits and 429 cooldowns."""
+
+    def __init__(self, credentials: List[Credential]):
+        self.credentials = credentials
+        self._condition = threading.Condition()
+
+        limiters: Dict[str, RateLimiter] = {}
+        for credential in credentials:
+            if credential.project is None:
+                credential.limiter = RateLimiter(credential.rpm)
+            else:
+                credential.limiter = limiters.setdefault(credential.project, RateLimiter(credential.rpm))
+
+    def __len__(self) -> int:
+        return len(self.credentials)
+
+    @classmethod
+    def from_env(cls) -> "CredentialPool":
+        """Load credentials from `GEMINI_CREDENTIALS_FILE`, `GEMINI_API_KEYS` or `GEMINI_API_KEY`."""
+        default_rpm = float(os.getenv("GEMINI_KEY_RPM")) if os.getenv("GEMINI_KEY_RPM") else None
+
+        credentials_file = os.getenv("GEMINI_CREDENTIALS_FILE")
+        if credentials_file:
+            with open(Path(credentials_file), 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+            credentials = []
+            for i, entry in enumerate(entries):
+                api_key = entry.get("api_key") or os.getenv(entry.get("api_key_env", ""))
+                if not api_key:
+                    raise ValueError(f"Credential {entry.get('name', i)} in {credentials_file} has no key")
+                credentials.append(Credential(api_key, name=entry.get("name"),
+                                              project=entry.get("project"),
+                                              rpm=entry.get("rpm", default_rpm)))
+            return cls(credentials)
+
+        keys = [key.strip() for key in os.getenv("GEMINI_API_KEYS", "").split(",") if key.strip()]
+        if not keys and os.getenv("GEMINI_API_KEY"):
+            keys = [os.getenv("GEMINI_API_KEY")]
+        return cls([Credential(key, rpm=default_rpm) for key in dict.fromkeys(keys)])
+
+    def _pick(self, now: float) -> Optional[Credential]:
+        usable = [c for c in self.credentials if c.state(now) == "ok" and c.limiter.wait_time(now) == 0]
+        if not usable:
+            return None
+        return min(usable, key=lambda c: (c.in_flight, c.calls))
+
+    def _next_ready(self, now: float) -> float:
+        waits = [max(c.cooldown_until - now, c.limiter.wait_time(now))
+                 for c in self.credentials if not c.disabled]
+        if not waits:
+            raise NoUsableCredentials("Every API key has been rejected as invalid")
+        return max(0.01, min(waits))
+
+    def acquire(self) -> Credential:
+        """Block until a credential has quota, then reserve one call on it."""
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                credential = self._pick(now)
+                if credential is not None:
+                    credential.limiter.take(now)
+                    credential.in_flight += 1
+                    credential.calls += 1
+                    return credential
+                self._condition.wait(timeout=self._next_ready(now))
+
+    def release(self, credential: Credential, error: Optional[BaseException] = None):
+        """Return a credential, updating its health from the call's outcome."""
+        with self._condition:
+            credential.in_flight -= 1
+            if error is None:
+                credential.consecutive_rate_limits = 0
+            elif is_rate_limited(error):
+                credential.rate_limited += 1
+                credential.consecutive_rate_limits += 1
+                cooldown = retry_after(error) or min(
+                    MAX_COOLDOWN_S, BASE_COOLDOWN_S * 2 ** (credential.consecutive_rate_limits - 1))
+                credential.cooldown_until = time.monotonic() + cooldown
+                logger.warning(f"🔑 Key {credential.name} rate limited, cooling down for {cooldown:.0f}s")
+            elif is_invalid_key(error):
+                credential.errors += 1
+                credential.disabled = True
+                logger.error(f"🔑 Key {credential.name} rejected, removing it from the pool")
+            else:
+                credential.errors += 1
+            self._condition.notify_all()
+
+    @contextmanager
+    def lease(self) -> Iterator[Credential]:
+        credential = self.acquire()
+        try:
+            yield credential
+        except BaseException as e:
+            self.release(credential, e)
+            raise
+        else:
+            self.release(credential)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._condition:
+            return [credential.to_dict(now) for credential in self.credentials]
+
+
+def client_factory(credential: Credential) -> Callable[..., Any]:
+    """Model factory whose models send requests with this credential's key.
+
+    `genai.configure` sets one process-wide key, so each credential gets its
+    own generative service client instead.
+    """
+    import google.generativeai as genai
+    from google.ai import generativelanguage as glm
+
+    client = glm.GenerativeServiceClient(client_options={"api_key": credential.api_key})
+
+    def factory(model_name: str, **kwargs):
+        model = genai.GenerativeModel(model_name, **kwargs)
+        model._client = client
+        return model
+    return factory
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Health check for the Gemini CLI Buildathon project.
+
+Consolidates test_setup.py, verify_cli.py, verify_both_clis.py,
+verify_oauth.py and test_api_curl.py into one command whose checks run
+concurrently under a single global deadline:
+
+    python doctor.py                 # local checks only, fast enough for a readiness probe
+    python doctor.py --online        # also call the API and run the official CLI
+    python doctor.py --json          # machine-readable report
+
+Dependencies are checked with `importlib.util.find_spec` without importing
+them, and the resolved location of the official CLI is cached between runs
+so `npx` does not have to re-resolve the package every time.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import threading
+import importlib.util
+import subprocess
+import urllib.request
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+CLI_PACKAGE = "https://github.com/google-gemini/gemini-cli"
+REQUIRED_PACKAGES = ["google.generativeai", "dotenv", "rich", "numpy", "scipy"]
+SAMPLE_FILES = ["sample_article.md", "meeting_notes.txt", "project_data.json"]
+PLACEHOLDER_KEY = "your_gemini_api_key_here"
+CACHE_FILE = Path(os.getenv("XDG_CACHE_HOME", Path.home() / ".cache")) / "gemini-buildathon" / "doctor.json"
+
+PASS, WARN, FAIL, SKIP, TIMEOUT = "pass", "warn", "fail", "skip", "timeout"
+
+# Concurrent checks share one npx resolution
+_resolve_lock = threading.Lock()
+
+
+def load_environment():
+    """Load .env if python-dotenv is available (its absence is reported separately)."""
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        return
+    load_dotenv()
+
+
+def redact(api_key: str) -> str:
+    return f"...{api_key[-4:]}"
+
+
+def configured_api_key() -> Optional[str]:
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key or api_key == PLACEHOLDER_KEY:
+        return None
+    return api_key
+
+
+# Local checks
+
+def check_env_file(deadline: float) -> Tuple[str, str]:
+    if Path(".env").exists():
+        return PASS, ".env file found"
+    return WARN, ".env file not found (copy .env.example)"
+
+
+def check_api_key(deadline: float) -> Tuple[str, str]:
+    api_key = configured_api_key()
+    if api_key:
+        return PASS, f"GEMINI_API_KEY configured (ends with: {redact(api_key)})"
+    if os.getenv("GOOGLE_CLOUD_PROJECT"):
+        return WARN, "GEMINI_API_KEY not configured, OAuth project set"
+    return FAIL, "GEMINI_API_KEY not configured"
+
+
+def check_dependencies(deadline: float) -> Tuple[str, str]:
+    missing = []
+    for package in REQUIRED_PACKAGES:
+        try:
+            if importlib.util.find_spec(package) is None:
+                missing.append(package)
+        except ModuleNotFoundError:
+            missing.append(package)
+    if missing:
+        return FAIL, f"Missing packages: {', '.join(missing)} (run: pip install -r requirements.txt)"
+    return PASS, f"All dependencies available ({', '.join(REQUIRED_PACKAGES)})"
+
+
+def check_data_files(deadline: float) -> Tuple[str, str]:
+    data_dir = Path("data")
+    if not data_dir.is_dir():
+        return FAIL, "data directory not found"
+    missing = [name for name in SAMPLE_FILES if not (data_dir / name).exists()]
+    if missing:
+        return WARN, f"Missing sample files: {', '.join(missing)}"
+    return PASS, "All sample data files present"
+
+
+def check_output_dir(deadline: float) -> Tuple[str, str]:
+    demo_dir = Path(os.getenv("OUTPUT_DIR", "demo"))
+    if demo_dir.exists() and not os.access(demo_dir, os.W_OK):
+        return FAIL, f"{demo_dir} is not writable"
+    return PASS, f"{demo_dir} is writable"
+
+
+def check_cloud_project(deadline: float) -> Tuple[str, str]:
+    project = os.getenv("GOOGLE_CLOUD_PROJECT")
+    if project:
+        return PASS, f"Google Cloud Project set: {project} (paid Code Assist License)"
+    return PASS, "No Google Cloud Project set (free tier)"
+
+
+# Official CLI location, cached between runs
+
+def read_cache() -> Dict[str, Any]:
+    try:
+        with open(CACHE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def write_cache(cache: Dict[str, Any]):
+    try:
+        CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with open(CACHE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, indent=2)
+    except OSError:
+        pass
+
+
+def find_cli_binary() -> Optional[str]:
+    """Locate an installed `gemini` binary, globally or in the npx cache."""
+    on_path = shutil.which("gemini")
+    if on_path:
+        return on_path
+    npx_cache = Path(os.getenv("npm_config_cache", Path.home() / ".npm")) / "_npx"
+    candidates = sorted(npx_cache.glob("*/node_modules/.bin/gemini"),
+                        key=lambda p: p.stat().st_mtime, reverse=True) if npx_cache.is_dir() else []
+    return str(candidates[0]) if candidates else None
+
+
+def resolve_cli(resolve_with_npx: bool = False, timeout: float = 30) -> Optional[str]:
+    """Return the official CLI binary, using the cached location while it is still valid."""
+    with _resolve_lock:
+        return _resolve_cli(resolve_with_npx, timeout)
+
+
+def _resolve_cli(resolve_with_npx: bool, timeout: float) -> Optional[str]:
+    cache = read_cache()
+    cached = cache.get("cli_path")
+    if cached and os.access(cached, os.X_OK):
+        return cached
+
+    path = find_cli_binary()
+    if path is None and resolve_with_npx and shutil.which("npx"):
+        # One-time resolution: let npx install the package, then cache the binary it left behind
+        subprocess.run(["npx", "--yes", CLI_PACKAGE, "--version"],
+                       capture_output=True, text=True, timeout=timeout)
+        path = find_cli_binary()
+
+    if path:
+        cache["cli_path"] = path
+        cache["resolved_at"] = time.time()
+        write_cache(cache)
+    return path
+
+
+def check_cli_location(deadline: float) -> Tuple[str, str]:
+    path = resolve_cli()
+    if path:
+        return PASS, f"Official CLI at {path}"
+    return WARN, "Official Gemini CLI not resolved yet (run: python doctor.py --online)"
+
+
+# Online checks
+
+def check_cli_version(deadline: float) -> Tuple[str, str]:
+    path = resolve_cli(resolve_with_npx=True, timeout=max(1.0, deadline - time.monotonic()))
+    if not path:
+        return FAIL, "Official Gemini CLI not found (needs Node.js and npx)"
+    result = subprocess.run([path, "--version"], capture_output=True, text=True,
+                            timeout=max(1.0, deadline - time.monotonic()))
+    if result.returncode != 0:
+        return FAIL, f"Version check failed: {result.stderr.strip()}"
+    return PASS, f"Gemini CLI version: {result.stdout.strip()}"
+
+
+def check_cli_prompt(deadline: float) -> Tuple[str, str]:
+    path = resolve_cli(resolve_with_npx=True, timeout=max(1.0, deadline - time.monotonic()))
+    if not path:
+        return FAIL, "Official Gemini CLI not found (needs Node.js and npx)"
+    result = subprocess.run([path, "-p", 'Say "Official CLI works!" in exactly those words.'],
+                            capture_output=True, text=True,
+                            timeout=max(1.0, deadline - time.monotonic()))
+    if result.returncode != 0:
+        return FAIL, f"CLI error: {result.stderr.strip()}"
+    return PASS, f"Official CLI responded: {result.stdout.strip()[:80]}"
+
+
+def check_sdk_api(deadline: float) -> Tuple[str, str]:
+    api_key = configured_api_key()
+    if not api_key:
+        return SKIP, "GEMINI_API_KEY not configured"
+    import google.generativeai as genai
+
+    genai.configure(api_key=api_key)
+    model = genai.GenerativeModel(os.getenv("GEMINI_MODEL") or "gemini-1.5-flash")
+    response = model.generate_content(
+        "Say 'Hello, Gemini!' in exactly those words.",
+        request_options={"timeout": max(1.0, deadline - time.monotonic())}
+    )
+    if "Hello, Gemini!" in response.text:
+        return PASS, "Python SDK call succeeded"
+    return WARN, f"Python SDK responded unexpectedly: {response.text.strip()[:80]}"
+
+
+def check_rest_api(deadline: float) -> Tuple[str, str]:
+    api_key = configured_api_key()
+    if not api_key:
+        return SKIP, "GEMINI_API_KEY not configured"
+    request = urllib.request.Request(
+        "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent",
+        data=json.dumps({"contents": [{"parts": [{"text": "Reply with OK"}]}]}).encode("utf-8"),
+        headers={"Content-Type": "application/json", "X-goog-api-key": api_key},
+        method="POST"
+    )
+    with urllib.request.urlopen(request, timeout=max(1.0, deadline - time.monotonic())) as response:
+        data = json.load(response)
+    if "candidates" in data:
+        tokens = data.get("usageMetadata", {}).get("totalTokenCount")
+        return PASS, f"REST API call succeeded ({tokens} tokens)"
+    return FAIL, f"Unexpected REST response: {json.dumps(data)[:80]}"
+
+
+LOCAL_CHECKS: Dict[str, Callable[[float], Tuple[str, str]]] = {
+    "env_file": check_env_file,
+    "api_key": check_api_key,
+    "dependencies": check_dependencies,
+    "data_files": check_data_files,
+    "output_dir": check_output_dir,
+    "cloud_project": check_cloud_project,
+    "cli_location": check_cli_location,
+}
+
+ONLINE_CHECKS: Dict[str, Callable[[float], Tuple[str, str]]] = {
+    "sdk_api": check_sdk_api,
+    "rest_api": check_rest_api,
+    "cli_version": check_cli_version,
+    "cli_prompt": check_cli_prompt,
+}
+
+
+def run_checks(online: bool = False, deadline_s: float = 5.0) -> Dict[str, Any]:
+    """Run all checks concurrently and return a report; unfinished checks time out."""
+    load_environment()
+    checks = dict(LOCAL_CHECKS)
+    if online:
+        checks.update(ONLINE_CHECKS)
+
+    started = time.monotonic()
+    deadline = started + deadline_s
+
+    def timed(check):
+        check_started = time.monotonic()
+        try:
+            status, message = check(deadline)
+        except subprocess.TimeoutExpired:
+            status, message = TIMEOUT, "Timed out"
+        except Exception as e:
+            status, message = FAIL, f"{type(e).__name__}: {e}"
+        return status, message, time.monotonic() - check_started
+
+    # Daemon threads, so checks still running at the deadline cannot hold up exit
+    outcomes: Dict[str, Tuple[str, str, float]] = {}
+    threads = []
+    for name, check in checks.items():
+        thread = threading.Thread(target=lambda n=name, c=check: outcomes.__setitem__(n, timed(c)),
+                                  name=f"doctor-{name}", daemon=True)
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join(max(0.0, deadline - time.monotonic()))
+
+    results = {}
+    for name in checks:
+        status, message, elapsed = outcomes.get(
+            name, (TIMEOUT, f"Did not finish within {deadline_s}s", deadline_s)
+        )
+        results[name] = {"status": status, "message": message, "elapsed_ms": round(elapsed * 1000, 1)}
+
+    healthy = all(result["status"] not in (FAIL, TIMEOUT) for result in results.values())
+    return {
+        "healthy": healthy,
+        "online": online,
+        "deadline_s": deadline_s,
+        "elapsed_ms": round((time.monotonic() - started) * 1000, 1),
+        "checks": results,
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    icons = {PASS: "✅", WARN: "⚠️ ", FAIL: "❌", SKIP: "⏭️ ", TIMEOUT: "⏰"}
+    print("🩺 Gemini CLI Buildathon Doctor")
+    print("=" * 40)
+    for name, result in report["checks"].items():
+        print(f"{icons[result['status']]} {name}: {result['message']} ({result['elapsed_ms']} ms)")
+    print("=" * 40)
+    if report["healthy"]:
+        print(f"🎉 Healthy ({report['elapsed_ms']} ms)")
+    else:
+        print(f"❌ Unhealthy ({report['elapsed_ms']} ms). Please fix the issues above.")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Check the project's setup and connectivity")
+    parser.add_argument("--online", action="store_true",
+                        help="Also call the API and run the official CLI")
+    parser.add_argument("--deadline", type=float, default=None,
+                        help="Global deadline in seconds (default: 2 offline, 60 online)")
+    parser.add_argument("--json", action="store_true", help="Print a machine-readable report")
+    args = parser.parse_args(argv)
+
+    deadline = args.deadline if args.deadline is not None else (60.0 if args.online else 2.0)
+    report = run_checks(online=args.online, deadline_s=deadline)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    return 0 if report["healthy"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Quality-versus-latency evaluation.
+
+`Evaluator` runs `extract_key_facts` over a labeled gold set (see
+`eval/gold.json`) once per configuration in a matrix. It scores each
+analysis against the labels:
+
+- entity precision and recall, micro-averaged over people, organizations and
+  locations
+- topic overlap, a Jaccard index where a topic matches when its words
+  contain (or are contained in) another's, or the two share most words
+- fact coverage, the share of gold facts whose content words mostly appear
+  in one extracted fact
+
+Quality is the mean of entity F1, topic overlap and fact coverage. Each
+configuration is also measured for latency, tokens and cost per document.
+Configurations that no other configuration beats on quality, latency and
+cost at once are marked Pareto-optimal. Each compact-response configuration
+is also compared per document with its full-schema twin, for the output
+tokens and latency it saves. The results are written to
+`demo/eval/eval_report.json`, with a scatter plot in `demo/eval/pareto.svg`.
+
+The matrix is either a list of configurations or a dict of lists expanded
+as a cartesian product. Knobs: `model` (forced for every document),
+`local_extractors`, `stream`, `compact` (the compact response schema) and
+`max_chars` (documents truncated to their first `max_chars` characters). Runs are offline against the stand-in model
+or a recorded cassette unless the live API is requested.
+"""
+
+import re
+import json
+import time
+import logging
+import itertools
+from pathlib import Path
+from xml.sax.saxutils import escape
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from routing import estimate_cost
+
+logger = logging.getLogger("gemini-demo")
+
+DEFAULT_GOLD = Path("eval/gold.json")
+
+DEFAULT_MATRIX = {
+    "model": ["gemini-1.5-flash", "gemini-1.5-flash-8b"],
+    "local_extractors": [False, True],
+    "compact": [False, True],
+    "max_chars": [None, 2000],
+}
+
+ENTITY_KEYS = ("people", "organizations", "locations")
+
+STOPWORDS = {
+    "the", "and", "for", "are", "was", "with", "that", "this", "from", "has", "have", "its",
+    "into", "than", "by", "of", "to", "in", "on", "at", "is", "be", "an", "a", "as", "per",
+}
+
+
+def normalize(text: str) -> str:
+    return " ".join(re.findall(r"[a-z0-9$%.]+", str(text).lower())).strip(". ")
+
+
+def content_words(text: str) -> set:
+    return {word.strip(".") for word in normalize(text).split()
+            if word.strip(".") and word.strip(".") not in STOPWORDS}
+
+
+def expand_matrix(matrix) -> List[Dict[str, Any]]:
+    """Configurations from a list, or the cartesian product of a dict of lists."""
+    if isinstance(matrix, list):
+        configs = [dict(config) for config in matrix]
+    else:
+        keys = list(matrix)
+        configs = [dict(zip(keys, values)) for values in itertools.product(*(matrix[k] for k in keys))]
+    for config in configs:
+        config.setdefault("name", config_name(config))
+    return configs
+
+
+def config_name(config: Dict[str, Any]) -> str:
+    parts = [str(config.get("model", "default")).replace("gemini-", "")]
+    if config.get("local_extractors"):
+        parts.append("local")
+    if config.get("stream"):
+        parts.append("stream")
+    if config.get("compact"):
+        parts.append("compact")
+    if config.get("max_chars"):
+        parts.append(f"{config['max_chars']}c")
+    return "+".join(parts)
+
+
+def entity_counts(predicted: Dict[str, Any], gold: Dict[str, Any]) -> Tuple[int, int, int]:
+    """True positives, predicted and gold entity counts across categories."""
+    true_positives = n_predicted = n_gold = 0
+    for key in ENTITY_KEYS:
+        p = {normalize(e) for e in (predicted or {}).get(key, []) if normalize(e)}
+        g = {normalize(e) for e in gold.get(key, []) if normalize(e)}
+        true_positives += len(p & g)
+        n_predicted += len(p)
+        n_gold += len(g)
+    return true_positives, n_predicted, n_gold
+
+
+def _topics_match(a: set, b: set) -> bool:
+    if not a or not b:
+        return False
+    return a <= b or b <= a or len(a & b) / len(a | b) >= 0.5
+
+
+def topic_overlap(predicted: List[str], gold: List[str]) -> float:
+    predicted = [content_words(t) for t in predicted]
+    gold = [content_words(t) for t in gold]
+    if not any(predicted) and not any(gold):
+        return 1.0
+    # Each predicted topic can match one gold topic
+    unused = list(predicted)
+    matched = 0
+    for g in gold:
+        match = next((p for p in unused if _topics_match(p, g)), None)
+        if match is not None:
+            unused.remove(match)
+            matched += 1
+    return matched / (len(gold) + len(predicted) - matched)
+
+
+def fact_coverage(predicted: List[str], gold: List[str], threshold: float = 0.6) -> float:
+    if not gold:
+        return 1.0
+    predicted_words = [content_words(fact) for fact in predicted]
+    covered = 0
+    for fact in gold:
+        words = content_words(fact)
+        if words and any(len(words & p) / len(words) >= threshold for p in predicted_words):
+            covered += 1
+    return covered / len(gold)
+
+
+def _ratio(numerator: float, denominator: float) -> Optional[float]:
+    return numerator / denominator if denominator else None
+
+
+def _reduction(full: float, compact: float) -> Optional[float]:
+    return round(1 - compact / full, 3) if full else None
+
+
+def compact_savings(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Output-token and latency reduction of each compact configuration over its full twin, per document."""
+    by_config = {json.dumps({k: v for k, v in row["config"].items() if k != "name"}, sort_keys=True): row
+                 for row in rows}
+    savings = []
+    for row in rows:
+        if not row["config"].get("compact"):
+            continue
+        twin_config = {k: v for k, v in row["config"].items() if k not in ("name", "compact")}
+        twin = (by_config.get(json.dumps({**twin_config, "compact": False}, sort_keys=True))
+                or by_config.get(json.dumps(twin_config, sort_keys=True)))
+        if twin is None:
+            continue
+
+        full_documents = {d["file"]: d for d in twin["per_document"]}
+        documents = []
+        for compact in row["per_document"]:
+            full = full_documents.get(compact["file"])
+            if full is None or full["error"] or compact["error"]:
+                continue
+            documents.append({
+                "file": compact["file"],
+                "full_output_tokens": full["output_tokens"],
+                "compact_output_tokens": compact["output_tokens"],
+                "output_token_reduction": _reduction(full["output_tokens"], compact["output_tokens"]),
+                "full_latency_ms": full["latency_ms"],
+                "compact_latency_ms": compact["latency_ms"],
+                "latency_reduction": _reduction(full["latency_ms"], compact["latency_ms"]),
+            })
+        if not documents:
+            continue
+        full_tokens = sum(d["full_output_tokens"] for d in documents)
+        full_latency = sum(d["full_latency_ms"] for d in documents)
+        savings.append({
+            "compact": row["name"],
+            "full": twin["name"],
+            "output_token_reduction": _reduction(full_tokens, sum(d["compact_output_tokens"] for d in documents)),
+            "latency_reduction": _reduction(full_latency, sum(d["compact_latency_ms"] for d in documents)),
+            "quality_change": round(row["quality"] - twin["quality"], 3),
+            "per_document": documents,
+        })
+    return savings
+
+
+def pareto_front(rows: List[Dict[str, Any]]) -> List[str]:
+    """Names of configurations no other configuration beats on quality, latency and cost.
+
+    Configurations with failed documents are left out.
+    """
+    rows = [row for row in rows if not row["errors"]]
+
+    def dominates(a, b):
+        better_or_equal = (a["quality"] >= b["quality"] and a["latency_ms"] <= b["latency_ms"]
+                           and a["cost_usd"] <= b["cost_usd"])
+        strictly = (a["quality"] > b["quality"] or a["latency_ms"] < b["latency_ms"]
+                    or a["cost_usd"] < b["cost_usd"])
+        return better_or_equal and strictly
+    return [row["name"] for row in rows if not any(dominates(other, row) for other in rows)]
+
+
+class Evaluator:
+    """Score `extract_key_facts` against a gold set under a matrix of configurations."""
+
+    def __init__(self, make_wrangler: Callable[[Dict[str, Any]], Any], gold_path: Path = DEFAULT_GOLD,
+                 output_dir: Path = Path("demo/eval")):
+        self.make_wrangler = make_wrangler
+        self.gold_path = gold_path
+        self.output_dir = output_dir
+        with open(gold_path, 'r', encoding='utf-8') as f:
+            self.gold = json.load(f)["documents"]
+
+    def run_config(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        wrangler = self.make_wrangler(config)
+        documents = []
+        try:
+            for label in self.gold:
+                path = Path(label["file"])
+                content = wrangler.read_file(path)
+                if config.get("max_chars"):
+                    content = content[:config["max_chars"]]
+
+                started = time.perf_counter()
+                result = wrangler.extract_key_facts(content, path.name)
+                latency = time.perf_counter() - started
+
+                provenance = result.get("provenance", {})
+                model = provenance.get("model_used")
+                prompt_tokens = provenance.get("prompt_tokens", 0)
+                output_tokens = provenance.get("output_tokens", 0)
+                tp, n_predicted, n_gold = entity_counts(result.get("entities", {}), label.get("entities", {}))
+                documents.append({
+                    "file": path.name,
+                    "model": model,
+                    "error": provenance.get("error"),
+                    "latency_ms": round(latency * 1000, 1),
+                    "tokens": prompt_tokens + output_tokens,
+                    "output_tokens": output_tokens,
+                    "cost_usd": estimate_cost(model, prompt_tokens, output_tokens) if model != "local" else 0.0,
+                    "entity_tp": tp,
+                    "entity_predicted": n_predicted,
+                    "entity_gold": n_gold,
+                    "topic_overlap": topic_overlap(result.get("topics", []), label.get("topics", [])),
+                    "fact_coverage": fact_coverage(result.get("key_facts", []), label.get("key_facts", [])),
+                })
+        finally:
+            wrangler.close()
+        return self.summarize(config, documents)
+
+    def summarize(self, config: Dict[str, Any], documents: List[Dict[str, Any]]) -> Dict[str, Any]:
+        n = len(documents)
+        tp = sum(d["entity_tp"] for d in documents)
+        precision = _ratio(tp, sum(d["entity_predicted"] for d in documents))
+        recall = _ratio(tp, sum(d["entity_gold"] for d in documents))
+        f1 = 2 * precision * recall / (precision + recall) if precision and recall else 0.0
+        topics = sum(d["topic_overlap"] for d in documents) / n
+        facts = sum(d["fact_coverage"] for d in documents) / n
+        return {
+            "name": config["name"],
+            "config": config,
+            "documents": n,
+            "errors": sum(1 for d in documents if d["error"]),
+            "entity_precision": round(precision, 3) if precision is not None else None,
+            "entity_recall": round(recall, 3) if recall is not None else None,
+            "entity_f1": round(f1, 3),
+            "topic_overlap": round(topics, 3),
+            "fact_coverage": round(facts, 3),
+            "quality": round((f1 + topics + facts) / 3, 3),
+            "latency_ms": round(sum(d["latency_ms"] for d in documents) / n, 1),
+            "tokens": round(sum(d["tokens"] for d in documents) / n),
+            "output_tokens": round(sum(d["output_tokens"] for d in documents) / n),
+            "cost_usd": round(sum(d["cost_usd"] for d in documents) / n, 8),
+            "per_document": documents,
+        }
+
+    def run(self, matrix=None) -> Dict[str, Any]:
+        configs = expand_matrix(matrix if matrix is not None else DEFAULT_MATRIX)
+        rows = []
+        for config in configs:
+            logger.info(f"🧪 Evaluating {config['name']} on {len(self.gold)} gold document(s)")
+            rows.append(self.run_config(config))
+
+        front = pareto_front(rows)
+        for row in rows:
+            row["pareto"] = row["name"] in front
+
+        report = {"gold": str(self.gold_path), "configurations": rows, "pareto": front,
+                  "compact_savings": compact_savings(rows)}
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        report_file = self.output_dir / "eval_report.json"
+        with open(report_file, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        plot_file = self.output_dir / "pareto.svg"
+        plot_file.write_text(scatter_svg(rows), encoding='utf-8')
+        report["files"] = [str(report_file), str(plot_file)]
+        return report
+
+
+def scatter_svg(rows: List[Dict[str, Any]], width: int = 320, height: int = 260) -> str:
+    """Quality against latency, tokens and cost per document, Pareto-optimal points filled."""
+    margin = 40
+    panels = [("latency_ms", "latency per document (ms)"), ("tokens", "tokens per document"),
+              ("cost_usd", "cost per document (USD)")]
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width * len(panels)}" height="{height}" '
+             f'font-family="sans-serif" font-size="10">']
+    for i, (key, label) in enumerate(panels):
+        left = i * width + margin
+        plot_w, plot_h = width - 2 * margin, height - 2 * margin
+        top = margin // 2
+        low = min(row[key] for row in rows)
+        high = max(row[key] for row in rows)
+        span = (high - low) or 1
+
+        parts.append(f'<rect x="{left}" y="{top}" width="{plot_w}" height="{plot_h}" fill="none" stroke="#999"/>')
+        parts.append(f'<text x="{left + plot_w / 2}" y="{top + plot_h + 28}" text-anchor="middle">{label}</text>')
+        parts.append(f'<text x="{left - 28}" y="{top + plot_h / 2}" text-anchor="middle" '
+                     f'transform="rotate(-90 {left - 28} {top + plot_h / 2})">quality</text>')
+        parts.append(f'<text x="{left}" y="{top + plot_h + 14}">{low:g}</text>')
+        parts.append(f'<text x="{left + plot_w}" y="{top + plot_h + 14}" text-anchor="end">{high:g}</text>')
+        for row in rows:
+            x = left + (row[key] - low) / span * plot_w
+            y = top + (1 - row["quality"]) * plot_h
+            fill = "#1a73e8" if row.get("pareto") else "white"
+            # Config names come from the user's config file
+            name = escape(row["name"])
+            parts.append(f'<circle cx="{x:.1f}" cy="{y:.1f}" r="4" fill="{fill}" stroke="#1a73e8">'
+                         f'<title>{name}: quality {row["quality"]}</title></circle>')
+            parts.append(f'<text x="{x + 6:.1f}" y="{y - 4:.1f}" font-size="8">{name}</text>')
+    parts.append("</svg>")
+    return "\n".join(parts)
@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+Local fast-path extractors for structured files.
+
+Some documents carry their people, dates and tags in plain fields, so a
+model round-trip only reads them back. `ExtractorRegistry` maps file types
+to deterministic extractors, and each extractor checks a content signature
+before claiming a document:
+
+- `JSONExtractor` - JSON objects; people from records with a name plus a
+  role/email, facts from short scalar fields by key path, topics from keys
+  and skill/tag lists
+- `CSVExtractor` - CSV tables; columns classified by header name
+- `FrontMatterExtractor` - markdown with a `---` front-matter block
+  (title, authors, tags, date); the body remains for the model
+
+An extraction either completes the analysis (no model call at all) or
+returns a free-text `remainder`, which is sent to the model, and whose
+result is merged with the local fields. An extraction with neither a
+summary nor a remainder sends the whole document to the model. The registry keeps per-extractor hit
+rates, extraction time and the model calls and prompt tokens saved.
+
+Extra extractors can be registered in code or named in `WRANGLER_EXTRACTORS`
+as comma-separated `module:attribute` references to extractor classes.
+"""
+
+import io
+import os
+import csv
+import json
+import time
+import threading
+import importlib
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from routing import estimate_tokens
+
+PERSON_HINT_KEYS = {"role", "title", "email", "position", "job_title"}
+ORGANIZATION_KEYS = {"organization", "organisation", "company", "org", "employer", "publisher", "vendor"}
+LOCATION_KEYS = {"location", "city", "country", "region", "address", "place"}
+TOPIC_LIST_KEYS = {"skills", "tags", "keywords", "topics", "categories"}
+AUTHOR_KEYS = {"author", "authors", "by", "attendees", "owner"}
+
+MAX_FACTS = 10
+MAX_TOPICS = 8
+MAX_FACT_VALUE_CHARS = 80
+MAX_FACT_TEXT_CHARS = 200
+# Free text below this many words is kept locally rather than sent to the model
+MIN_REMAINDER_WORDS = 40
+
+
+class LocalExtraction:
+    """Fields filled locally, plus any free text that still needs the model."""
+
+    def __init__(self, summary: Optional[str] = None, key_facts: Optional[List[str]] = None,
+                 topics: Optional[List[str]] = None, entities: Optional[Dict[str, List[str]]] = None,
+                 remainder: Optional[str] = None):
+        self.summary = summary
+        self.key_facts = key_facts or []
+        self.topics = topics or []
+        self.entities = {"people": [], "organizations": [], "locations": []}
+        for key, values in (entities or {}).items():
+            self.entities[key] = _unique(values)
+        self.remainder = remainder
+
+    @property
+    def complete(self) -> bool:
+        return not self.remainder and bool(self.summary)
+
+    def result(self) -> Dict[str, Any]:
+        return {
+            "summary": self.summary or "",
+            "key_facts": self.key_facts[:MAX_FACTS],
+            "topics": _unique(self.topics)[:MAX_TOPICS],
+            "entities": {key: values[:10] for key, values in self.entities.items()},
+            "sentiment": "neutral",
+        }
+
+    def merge(self, model_result: Dict[str, Any]) -> Dict[str, Any]:
+        """Combine local fields with the model's analysis of the remainder."""
+        merged = dict(model_result)
+        merged["summary"] = model_result.get("summary") or self.summary or ""
+        merged["key_facts"] = _unique(self.key_facts + list(model_result.get("key_facts", [])))
+        merged["topics"] = _unique(self.topics + list(model_result.get("topics", [])))
+        entities = model_result.get("entities", {})
+        merged["entities"] = {
+            key: _unique(self.entities.get(key, []) + list(entities.get(key, [])))
+            for key in ("people", "organizations", "locations")
+        }
+        return merged
+
+
+class Extractor:
+    """Base class: claim documents by file type and content signature."""
+
+    name = "extractor"
+    extensions: Tuple[str, ...] = ()
+
+    def matches(self, content: str, file_name: str) -> bool:
+        return True
+
+    def extract(self, content: str, file_name: str) -> Optional[LocalExtraction]:
+        raise NotImplementedError
+
+
+class JSONExtractor(Extractor):
+    """Read people, facts and topics from JSON key paths."""
+
+    name = "json"
+    extensions = (".json",)
+
+    def matches(self, content: str, file_name: str) -> bool:
+        return content.lstrip()[:1] in ("{", "[")
+
+    def extract(self, content: str, file_name: str) -> Optional[LocalExtraction]:
+        try:
+            data = json.loads(content)
+        except json.JSONDecodeError:
+            return None
+
+        people, organizations, locations, facts, topics, long_texts = [], [], [], [], [], []
+
+        def walk(value: Any, path: str, key: str):
+            if isinstance(value, dict):
+                name = value.get("name") or value.get("full_name")
+                if isinstance(name, str) and PERSON_HINT_KEYS & set(value):
+                    people.append(name)
+                    role = value.get("role") or value.get("title") or value.get("position")
+                    if isinstance(role, str):
+                        facts.append(f"{name}: {role}")
+                for child_key, child in value.items():
+                    walk(child, f"{path}.{child_key}" if path else child_key, child_key.lower())
+            elif isinstance(value, list):
+                if key in TOPIC_LIST_KEYS:
+                    topics.extend(item for item in value if isinstance(item, str))
+                for item in value:
+                    walk(item, f"{path}[]", key)
+            elif isinstance(value, str):
+                if key in ORGANIZATION_KEYS:
+                    organizations.append(value)
+                elif key in LOCATION_KEYS:
+                    locations.append(value)
+                elif len(value.split()) >= 12:
+                    long_texts.append(value)
+                elif key == "description":
+                    pass  # Used for the summary
+                elif "[]" not in path and path.count(".") <= 1 and len(value) <= MAX_FACT_VALUE_CHARS:
+                    facts.append(f"{path}: {value}")
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                if "[]" not in path and path.count(".") <= 1:
+                    facts.append(f"{path}: {value}")
+
+        walk(data, "", "")
+
+        summary = self._summary(data)
+        if isinstance(data, dict):
+            topics = [key.replace("_", " ") for key in data] + topics
+        remainder = "\n".join(long_texts)
+        if len(remainder.split()) < MIN_REMAINDER_WORDS:
+            # Too little free text for a model call; keep it as facts instead
+            facts[:0] = [text[:MAX_FACT_TEXT_CHARS] for text in long_texts]
+            remainder = None
+        return LocalExtraction(
+            summary=summary,
+            key_facts=facts,
+            topics=topics,
+            entities={"people": people, "organizations": organizations, "locations": locations},
+            remainder=remainder,
+        )
+
+    def _summary(self, data: Any) -> Optional[str]:
+        if isinstance(data, list):
+            fields = sorted({key for item in data if isinstance(item, dict) for key in item})
+            return f"List of {len(data)} records with fields {', '.join(fields[:8])}."
+        if not isinstance(data, dict):
+            return None
+
+        # The document's own name and description, at the top level or one level down
+        described = data if "description" in data else next(
+            (value for value in data.values() if isinstance(value, dict) and "description" in value), None)
+        parts = []
+        if described is not None:
+            name = described.get("name") or described.get("title")
+            version = described.get("version")
+            label = f"{name} ({version})" if name and version else name
+            parts.append(f"{label}: {described['description']}" if label else described["description"])
+            parts[-1] = parts[-1].rstrip(".") + "."
+        lists = [f"{key.replace('_', ' ')} ({len(value)})" for key, value in data.items()
+                 if isinstance(value, list) and value]
+        if lists:
+            parts.append(f"Includes {', '.join(lists)}.")
+        return " ".join(parts) or None
+
+
+class CSVExtractor(Extractor):
+    """Summarize a CSV table and classify its columns by header."""
+
+    name = "csv"
+    extensions = (".csv",)
+
+    def matches(self, content: str, file_name: str) -> bool:
+        first_line = content.lstrip().split("\n", 1)[0]
+        return "," in first_line or ";" in first_line or "\t" in first_line
+
+    def extract(self, content: str, file_name: str) -> Optional[LocalExtraction]:
+        try:
+            dialect = csv.Sniffer().sniff(content[:4096], delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        rows = list(csv.reader(io.StringIO(content), dialect))
+        rows = [row for row in rows if any(cell.strip() for cell in row)]
+        if len(rows) < 2:
+            return None
+        header, records = [cell.strip() for cell in rows[0]], rows[1:]
+
+        entities: Dict[str, List[str]] = defaultdict(list)
+        facts = [f"{len(records)} rows, {len(header)} columns"]
+        for index, column in enumerate(header):
+            values = [row[index].strip() for row in records if index < len(row) and row[index].strip()]
+            key = column.lower().replace(" ", "_")
+            if key in {"name", "full_name", "person", "employee"} | AUTHOR_KEYS:
+                entities["people"].extend(values)
+            elif key in ORGANIZATION_KEYS:
+                entities["organizations"].extend(values)
+            elif key in LOCATION_KEYS:
+                entities["locations"].extend(values)
+            else:
+                numbers = _numbers(values)
+                if numbers and len(numbers) == len(values) and len(facts) < MAX_FACTS:
+                    facts.append(f"{column}: {min(numbers):g} to {max(numbers):g}")
+
+        return LocalExtraction(
+            summary=f"Table of {len(records)} rows with columns {', '.join(header[:10])}.",
+            key_facts=facts,
+            topics=header,
+            entities=entities,
+        )
+
+
+class FrontMatterExtractor(Extractor):
+    """Read title, authors, tags and dates from markdown front matter."""
+
+    name = "front_matter"
+    extensions = (".md",)
+
+    def matches(self, content: str, file_name: str) -> bool:
+        return content.startswith("---\n") and "\n---" in content[4:]
+
+    def extract(self, content: str, file_name: str) -> Optional[LocalExtraction]:
+        end = content.index("\n---", 3)
+        fields = parse_front_matter(content[4:end])
+        body = content[end + 4:].split("\n", 1)[-1].strip()
+
+        entities: Dict[str, List[str]] = defaultdict(list)
+        facts, topics = [], []
+        for key, value in fields.items():
+            values = value if isinstance(value, list) else [value]
+            if key in AUTHOR_KEYS:
+                entities["people"].extend(values)
+            elif key in ORGANIZATION_KEYS:
+                entities["organizations"].extend(values)
+            elif key in LOCATION_KEYS:
+                entities["locations"].extend(values)
+            elif key in TOPIC_LIST_KEYS:
+                topics.extend(values)
+            elif key not in ("description", "summary") and not isinstance(value, list):
+                facts.append(f"{key}: {value}")
+
+        summary = fields.get("description") or fields.get("summary")
+        return LocalExtraction(
+            summary=summary if isinstance(summary, str) else None,
+            key_facts=facts,
+            topics=topics,
+            entities=entities,
+            remainder=body if len(body.split()) >= MIN_REMAINDER_WORDS else None,
+        )
+
+
+def parse_front_matter(text: str) -> Dict[str, Any]:
+    """Parse the flat `key: value` / `key: [a, b]` / `- item` subset of YAML used in front matter."""
+    fields: Dict[str, Any] = {}
+    current = None
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            continue
+        if stripped.startswith("- ") and current is not None:
+            fields.setdefault(current, [])
+            if isinstance(fields[current], list):
+                fields[current].append(_unquote(stripped[2:]))
+            continue
+        if ":" not in stripped:
+            continue
+        key, value = stripped.split(":", 1)
+        current = key.strip().lower()
+        value = value.strip()
+        if value.startswith("[") and value.endswith("]"):
+            fields[current] = [_unquote(item) for item in value[1:-1].split(",") if item.strip()]
+        elif value:
+            fields[current] = _unquote(value)
+    return fields
+
+
+class ExtractorRegistry:
+    """Extractors by file type, with per-extractor hit statistics."""
+
+    def __init__(self, extractors: Optional[List[Extractor]] = None):
+        self._by_extension: Dict[str, List[Extractor]] = defaultdict(list)
+        self._stats: Dict[str, Dict[str, float]] = defaultdict(lambda: {
+            "candidates": 0, "hits": 0, "complete": 0, "extract_s": 0.0, "saved_prompt_tokens": 0,
+        })
+        self._lock = threading.Lock()
+        for extractor in extractors or []:
+            self.register(extractor)
+
+    @classmethod
+    def from_env(cls) -> "ExtractorRegistry":
+        """Built-in extractors plus any named in `WRANGLER_EXTRACTORS`."""
+        registry = cls([JSONExtractor(), CSVExtractor(), FrontMatterExtractor()])
+        for reference in filter(None, (ref.strip() for ref in os.getenv("WRANGLER_EXTRACTORS", "").split(","))):
+            module_name, _, attribute = reference.partition(":")
+            registry.register(getattr(importlib.import_module(module_name), attribute)())
+        return registry
+
+    def register(self, extractor: Extractor):
+        """Add an extractor; later registrations are tried first for their file types."""
+        for extension in extractor.extensions:
+            self._by_extension[extension.lower()].insert(0, extractor)
+
+    @property
+    def extensions(self) -> List[str]:
+        return sorted(self._by_extension)
+
+    def extract(self, content: str, file_name: str) -> Optional[Tuple[str, LocalExtraction]]:
+        """Run the first extractor that claims the document; returns its name and result, or None.
+
+        Every document of a registered type counts as a candidate for hit rates.
+        """
+        extension = os.path.splitext(file_name)[1].lower()
+        for extractor in self._by_extension.get(extension, []):
+            started = time.perf_counter()
+            extraction = extractor.extract(content, file_name) if extractor.matches(content, file_name) else None
+            elapsed = time.perf_counter() - started
+
+            with self._lock:
+                stats = self._stats[extractor.name]
+                stats["candidates"] += 1
+                stats["extract_s"] += elapsed
+                if extraction is not None:
+                    stats["hits"] += 1
+                    # Incomplete extractions without a remainder still send the whole document
+                    sent = extraction.remainder or ("" if extraction.complete else content)
+                    stats["saved_prompt_tokens"] += max(0, estimate_tokens(content) - estimate_tokens(sent))
+                    if extraction.complete:
+                        stats["complete"] += 1
+            if extraction is not None:
+                return extractor.name, extraction
+        return None
+
+    def stats(self, model_latency_s: Optional[float] = None) -> Dict[str, Any]:
+        """Hit rates and savings; time saved is estimated from the observed model latency."""
+        with self._lock:
+            report = {}
+            for name, stats in self._stats.items():
+                candidates = stats["candidates"]
+                report[name] = {
+                    "candidates": candidates,
+                    "hits": stats["hits"],
+                    "hit_rate": round(stats["hits"] / candidates, 3) if candidates else 0.0,
+                    "model_calls_saved": stats["complete"],
+                    "partial": stats["hits"] - stats["complete"],
+                    "saved_prompt_tokens": stats["saved_prompt_tokens"],
+                    "extract_ms": round(stats["extract_s"] * 1000, 2),
+                    "estimated_time_saved_s": (
+                        round(stats["complete"] * model_latency_s - stats["extract_s"], 3) or 0.0
+                        if model_latency_s is not None else None
+                    ),
+                }
+            return report
+
+
+def _unique(items: List[Any]) -> List[Any]:
+    seen = set()
+    unique = []
+    for item in items:
+        marker = json.dumps(item, sort_keys=True) if isinstance(item, (dict, list)) else item
+        if marker not in seen:
+            seen.add(marker)
+            unique.append(item)
+    return unique
+
+
+def _unquote(value: str) -> str:
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+        return value[1:-1]
+    return value
+
+
+def _numbers(values: List[str]) -> List[float]:
+    numbers = []
+    for value in values:
+        try:
+            numbers.append(float(value.replace(",", "")))
+        except ValueError:
+            pass
+    return numbers
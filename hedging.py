@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Per-call deadlines and request hedging for model calls.
+
+`HedgedCaller.call` runs a blocking call on a worker thread and gives up
+when its deadline passes; the remaining time is also handed to the call so
+the SDK can abort the underlying request. With hedging enabled, a call
+that is still running after the observed pNN latency of its size class gets
+a duplicate; the first response wins and the loser is cancelled (or, if it
+already started, abandoned until its own timeout fires). A cap on the
+hedge rate bounds the extra load.
+
+`benchmark` measures how each setting moves p99 and what it costs, using
+simulated calls with occasional stragglers.
+"""
+
+import os
+import math
+import time
+import random
+import threading
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional
+
+from stats import LatencyTracker, percentile
+
+MIN_SAMPLES = 20
+
+
+class CallDeadlineExceeded(TimeoutError):
+    """Raised when a model call does not finish within its deadline."""
+
+
+def size_class(size: int) -> int:
+    """Bucket request sizes (in characters) by powers of two."""
+    return int(math.log2(max(1, size // 256)))
+
+
+class HedgedCaller:
+    """Run calls with a deadline and optional hedging after the pNN latency."""
+
+    def __init__(self, deadline_s: float = 120.0, hedge_percentile: Optional[float] = None,
+                 max_hedge_rate: float = 0.05, max_workers: int = 64):
+        self.deadline_s = deadline_s
+        self.hedge_percentile = hedge_percentile
+        self.max_hedge_rate = max_hedge_rate
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="model-call")
+        self._latency_by_class: Dict[int, LatencyTracker] = {}
+        self._lock = threading.Lock()
+
+        self.latency = LatencyTracker()
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.deadline_exceeded = 0
+
+    @classmethod
+    def from_env(cls) -> "HedgedCaller":
+        """Configure from `GEMINI_CALL_DEADLINE`, `GEMINI_HEDGE_PERCENTILE` and `GEMINI_MAX_HEDGE_RATE`."""
+        hedge_percentile = os.getenv("GEMINI_HEDGE_PERCENTILE")
+        return cls(
+            deadline_s=float(os.getenv("GEMINI_CALL_DEADLINE", "120")),
+            hedge_percentile=float(hedge_percentile) if hedge_percentile else None,
+            max_hedge_rate=float(os.getenv("GEMINI_MAX_HEDGE_RATE", "0.05")),
+        )
+
+    def _tracker(self, size: int) -> LatencyTracker:
+        bucket = size_class(size)
+        with self._lock:
+            if bucket not in self._latency_by_class:
+                self._latency_by_class[bucket] = LatencyTracker(window=500)
+            return self._latency_by_class[bucket]
+
+    def hedge_delay(self, size: int) -> Optional[float]:
+        """Seconds to wait before hedging a call of this size, or None to not hedge."""
+        if self.hedge_percentile is None:
+            return None
+        tracker = self._tracker(size)
+        if tracker.count >= MIN_SAMPLES:
+            return tracker.percentile(self.hedge_percentile)
+        if self.latency.count >= MIN_SAMPLES:
+            return self.latency.percentile(self.hedge_percentile)
+        return None
+
+    def _may_hedge(self) -> bool:
+        with self._lock:
+            if self.hedged + 1 > self.max_hedge_rate * self.calls:
+                return False
+            self.hedged += 1
+            return True
+
+    def call(self, fn: Callable[[float], Any], size: int = 0,
+             deadline_s: Optional[float] = None, hedge: bool = True) -> Any:
+        """Call `fn(timeout_s)` with a deadline, hedging slow calls when enabled.
+
+        Pass `hedge=False` for calls with side effects that must not run twice.
+        """
+        deadline_s = deadline_s or self.deadline_s
+        started = time.monotonic()
+        deadline = started + deadline_s
+        with self._lock:
+            self.calls += 1
+
+        # Attempts run with the caller's context so their log records keep its correlation fields
+        context = contextvars.copy_context()
+        primary = self._executor.submit(context.run, fn, deadline_s)
+        pending = {primary}
+        errors = []
+
+        delay = self.hedge_delay(size) if hedge else None
+        if delay is not None:
+            done, _ = wait(pending, timeout=min(delay, deadline_s))
+            if not done and self._may_hedge():
+                pending.add(self._executor.submit(context.copy().run, fn,
+                                                  max(0.001, deadline - time.monotonic())))
+
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is not None:
+                    errors.append(future.exception())
+                    continue
+                for loser in pending:
+                    loser.cancel()
+                elapsed = time.monotonic() - started
+                self.latency.record(elapsed)
+                self._tracker(size).record(elapsed)
+                if future is not primary:
+                    with self._lock:
+                        self.hedge_wins += 1
+                return future.result()
+
+        if errors and not pending:
+            raise errors[0]
+
+        for future in pending:
+            future.cancel()
+        with self._lock:
+            self.deadline_exceeded += 1
+        raise CallDeadlineExceeded(f"Model call exceeded its {deadline_s:.1f}s deadline")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "deadline_s": self.deadline_s,
+            "hedge_percentile": self.hedge_percentile,
+            "max_hedge_rate": self.max_hedge_rate,
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "hedge_rate": round(self.hedged / self.calls, 4) if self.calls else 0.0,
+            "deadline_exceeded": self.deadline_exceeded,
+            "latency": self.latency.summary(),
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def benchmark(settings: List[Optional[float]], calls: int = 400, concurrency: int = 8,
+              base_latency: float = 0.02, straggler_probability: float = 0.03,
+              straggler_multiplier: float = 20.0, max_hedge_rate: float = 0.1,
+              seed: int = 7) -> List[Dict[str, Any]]:
+    """Measure p50/p99 and extra calls per hedge setting against simulated stragglers.
+
+    Each simulated call takes `base_latency` (+/-20%), except that with
+    `straggler_probability` it takes `straggler_multiplier` times as long.
+    """
+    rows = []
+    for hedge_percentile in settings:
+        rng = random.Random(seed)
+        rng_lock = threading.Lock()
+        attempts = [0]
+
+        def simulated_call(timeout_s: float) -> str:
+            with rng_lock:
+                attempts[0] += 1
+                latency = base_latency * rng.uniform(0.8, 1.2)
+                if rng.random() < straggler_probability:
+                    latency *= straggler_multiplier
+            time.sleep(min(latency, timeout_s))
+            return "ok"
+
+        caller = HedgedCaller(hedge_percentile=hedge_percentile, max_hedge_rate=max_hedge_rate,
+                              max_workers=concurrency * 2)
+        latencies = []
+        latencies_lock = threading.Lock()
+
+        def run_one(_):
+            started = time.monotonic()
+            caller.call(simulated_call, size=1000)
+            with latencies_lock:
+                latencies.append(time.monotonic() - started)
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(run_one, range(calls)))
+        caller.shutdown()
+
+        rows.append({
+            "hedge_percentile": hedge_percentile,
+            "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+            "hedge_rate": round(caller.hedged / calls, 4),
+            "extra_calls_pct": round((attempts[0] - calls) / calls * 100, 1),
+        })
+    return rows
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Write-behind JSON output writer.
+
+`OutputWriter` moves serialization and file I/O off the processing path: a
+dedicated thread drains a bounded queue, writes each batch with
+write-to-temp-plus-rename so readers never see a partial file, and keeps
+queue depth and flush latency statistics so slow storage shows up in logs
+and reports. Output is compact by default; pretty-printing is opt-in.
+"""
+
+import os
+import json
+import time
+import queue
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict
+
+from stats import LatencyTracker
+
+logger = logging.getLogger("gemini-demo")
+
+_STOP = object()
+
+
+def encode_json(obj: Any, pretty: bool = False) -> bytes:
+    """Serialize to UTF-8 JSON, compact unless `pretty` is set."""
+    if pretty:
+        text = json.dumps(obj, indent=2, ensure_ascii=False)
+    else:
+        text = json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+    return text.encode("utf-8")
+
+
+def atomic_write(path: Path, data: bytes, fsync: bool = False):
+    """Write `data` to a temporary file next to `path`, then rename it into place."""
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+class OutputWriter:
+    """Background thread that batches and atomically writes JSON files."""
+
+    def __init__(self, pretty: bool = False, max_queue: int = 256, batch_size: int = 64,
+                 fsync: bool = False):
+        self.pretty = pretty
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+
+        self.flush_latency = LatencyTracker()  # Time to write one batch
+        self.write_latency = LatencyTracker()  # Time from submit until a file is in place
+        self.max_queue_depth = 0
+        self.blocked_submits = 0
+        self.writes = 0
+        self.batches = 0
+        self.bytes_written = 0
+        self.failures = 0
+
+        self._thread = threading.Thread(target=self._run, name="output-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, path: Path, obj: Any):
+        """Queue `obj` to be written to `path`; blocks only while the queue is full.
+
+        `obj` is serialized later on the writer thread, so it must not be
+        modified after it has been submitted.
+        """
+        item = (Path(path), obj, time.perf_counter())
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.blocked_submits += 1
+            logger.warning(f"Output queue full ({self._queue.maxsize}), storage is falling behind")
+            self._queue.put(item)
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+
+    def flush(self):
+        """Block until every queued write has completed."""
+        self._queue.join()
+
+    def close(self):
+        """Flush pending writes and stop the writer thread."""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = any(item is _STOP for item in batch)
+            self._write_batch([item for item in batch if item is not _STOP])
+            for _ in batch:
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _write_batch(self, batch):
+        if not batch:
+            return
+        started = time.perf_counter()
+
+        # Only the latest version of a path in the batch needs to reach storage
+        latest = {}
+        for path, obj, submitted in batch:
+            latest[path] = (obj, submitted)
+
+        for path, (obj, submitted) in latest.items():
+            try:
+                data = encode_json(obj, pretty=self.pretty)
+                atomic_write(path, data, fsync=self.fsync)
+                self.writes += 1
+                self.bytes_written += len(data)
+                self.write_latency.record(time.perf_counter() - submitted)
+            except Exception as e:
+                self.failures += 1
+                logger.error(f"Failed to write {path}: {e}")
+
+        self.batches += 1
+        self.flush_latency.record(time.perf_counter() - started)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "max_queue_depth": self.max_queue_depth,
+            "queue_capacity": self._queue.maxsize,
+            "blocked_submits": self.blocked_submits,
+            "writes": self.writes,
+            "batches": self.batches,
+            "bytes_written": self.bytes_written,
+            "failures": self.failures,
+            "flush_latency": self.flush_latency.summary(),
+            "write_latency": self.write_latency.summary(),
+        }
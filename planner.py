@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Dry-run planning.
+
+`RunPlanner` estimates what `python app.py demo` would cost before it runs.
+It only stats files and makes no model calls, except for a small calibration
+sample:
+
+- input tokens come from file sizes, divided by bytes per token for each file
+  type. The ratio is calibrated with `count_tokens` on a few files of each
+  type and cached in `demo/token_calibration.json`, so later plans make no
+  calls at all
+- output tokens, and the share of files answered by local extractors, come
+  from a sample of saved analyses
+- wall time comes from the learned per-file cost model, the concurrency and
+  the pooled keys' request rate limits
+- spend is priced per routed model, with the batch-mode price alongside
+
+It also recommends a concurrency (enough workers to saturate the rate
+limit), batch mode for long runs, context caching when the shared
+instructions dominate input, and a chunk size for files too long for one
+request. Files are aggregated per type and model, so a million-file
+directory is planned in seconds.
+"""
+
+import os
+import json
+import math
+import time
+import logging
+import itertools
+from pathlib import Path
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from batch import BATCH_DISCOUNT
+from routing import MIN_CACHED_TOKENS, ModelRouter, estimate_cost, estimate_tokens, tokens_for_length
+from scheduler import CostEstimator
+
+logger = logging.getLogger("gemini-demo")
+
+DEFAULT_BYTES_PER_TOKEN = 4.0
+CALIBRATION_SAMPLES = 5
+HISTORY_SAMPLE = 500
+# Roughly the size of a filled-in extraction schema
+DEFAULT_OUTPUT_TOKENS = 300
+# Longer prompts are billed at long-context prices and are slow to answer
+LONG_CONTEXT_TOKENS = 128_000
+CHUNK_TOKENS = 32_000
+MAX_RECOMMENDED_CONCURRENCY = 64
+# Runs projected to take longer than this are cheaper and no slower as batch jobs
+BATCH_RECOMMEND_S = 3600
+
+
+def scan_files(data_dir: Path, extensions: Iterable[str]) -> Iterator[Tuple[str, str, int]]:
+    """Yield `(name, suffix, size)` for each supported file, like `discover_files`."""
+    extensions = {ext.lower() for ext in extensions}
+    with os.scandir(data_dir) as entries:
+        for entry in entries:
+            suffix = os.path.splitext(entry.name)[1].lower()
+            if suffix in extensions and entry.is_file():
+                yield entry.name, suffix, entry.stat().st_size
+
+
+def pool_rpm(pool) -> Optional[float]:
+    """Combined requests per minute of a credential pool, or None when any key is unlimited."""
+    limiters = {id(c.limiter): c.limiter for c in pool.credentials if not c.disabled}
+    if not limiters or any(not limiter.rpm for limiter in limiters.values()):
+        return None
+    return float(sum(limiter.rpm for limiter in limiters.values()))
+
+
+class TokenCalibration:
+    """Bytes per token for each file type, measured with `count_tokens` on a cached sample."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.samples: Dict[str, Dict[str, List[int]]] = {}
+        self.instructions_tokens: Optional[int] = None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.samples = data.get("samples", {})
+            self.instructions_tokens = data.get("instructions_tokens")
+        except (OSError, json.JSONDecodeError):
+            pass
+
+    def needs(self, suffix: str, name: str) -> bool:
+        samples = self.samples.get(suffix, {})
+        return name not in samples and len(samples) < CALIBRATION_SAMPLES
+
+    def calibrate(self, candidates: Dict[str, List[Path]], instructions: str,
+                  count_tokens: Callable[[str], int]) -> int:
+        """Count tokens for the candidate files (and the instructions); returns calls made."""
+        jobs = [(suffix, path) for suffix, paths in candidates.items() for path in paths]
+        if self.instructions_tokens is None:
+            jobs.append((None, None))
+
+        def count(job):
+            suffix, path = job
+            text = instructions if path is None else path.read_text(encoding='utf-8', errors='ignore')
+            return job, len(text.encode('utf-8')), count_tokens(text)
+
+        calls = 0
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [executor.submit(count, job) for job in jobs]
+            for future in futures:
+                try:
+                    (suffix, path), size, tokens = future.result()
+                except Exception as e:
+                    logger.warning(f"Token calibration call failed: {e}")
+                    continue
+                calls += 1
+                if path is None:
+                    self.instructions_tokens = tokens
+                elif tokens:
+                    self.samples.setdefault(suffix, {})[path.name] = [size, tokens]
+        return calls
+
+    def bytes_per_token(self, suffix: str) -> Tuple[float, bool]:
+        """Calibrated ratio for a file type (falling back to every type), and whether it is calibrated."""
+        samples = list(self.samples.get(suffix, {}).values())
+        if not samples:
+            samples = [sample for by_name in self.samples.values() for sample in by_name.values()]
+        tokens = sum(sample[1] for sample in samples)
+        if not tokens:
+            return DEFAULT_BYTES_PER_TOKEN, False
+        return sum(sample[0] for sample in samples) / tokens, True
+
+    def save(self):
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"samples": self.samples, "instructions_tokens": self.instructions_tokens}, f)
+        tmp_path.replace(self.path)
+
+
+def load_history(demo_dir: Path, limit: int = HISTORY_SAMPLE) -> Dict[str, Dict[str, int]]:
+    """Output tokens and local-extractor hits per file type from a sample of saved analyses."""
+    history: Dict[str, Dict[str, int]] = defaultdict(lambda: {"files": 0, "local": 0, "calls": 0,
+                                                              "output_tokens": 0})
+    try:
+        entries = [entry.path for entry in os.scandir(demo_dir) if entry.name.endswith("_analysis.json")]
+    except OSError:
+        return {}
+    for path in itertools.islice(entries, limit):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                analysis = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+        provenance = analysis.get("provenance", {})
+        if provenance.get("error"):
+            continue
+        stats = history[Path(provenance.get("source_file", "")).suffix.lower()]
+        stats["files"] += 1
+        if provenance.get("model_used") == "local":
+            stats["local"] += 1
+        elif provenance.get("output_tokens"):
+            stats["calls"] += 1
+            stats["output_tokens"] += provenance["output_tokens"]
+    return dict(history)
+
+
+class RunPlanner:
+    """Estimate tokens, wall time and spend of a run without making model calls."""
+
+    def __init__(self, router: ModelRouter, estimator: CostEstimator, demo_dir: Path,
+                 instructions: str, count_tokens: Optional[Callable[[str], int]] = None,
+                 rpm: Optional[float] = None, concurrency: int = 1,
+                 context_cache: bool = False):
+        self.router = router
+        self.estimator = estimator
+        self.demo_dir = demo_dir
+        self.instructions = instructions
+        self.count_tokens = count_tokens
+        self.rpm = rpm
+        self.concurrency = max(1, concurrency)
+        self.context_cache = context_cache
+        self.calibration = TokenCalibration(demo_dir / "token_calibration.json")
+
+    def wall_time(self, total_s: float, longest_s: float, calls: float, concurrency: int) -> float:
+        """Projected makespan: the slower of the workers, the longest file and the rate limit."""
+        bounds = [total_s / concurrency, longest_s]
+        if self.rpm:
+            # The limiter allows a burst of one minute's requests up front
+            bounds.append(max(0.0, calls - self.rpm) * 60 / self.rpm)
+        return max(bounds)
+
+    def plan(self, data_dir: Path, extensions: Iterable[str]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        files = list(scan_files(data_dir, extensions))
+        scan_s = time.perf_counter() - started
+
+        calibration_calls = 0
+        if self.count_tokens is not None:
+            candidates: Dict[str, List[Path]] = defaultdict(list)
+            for name, suffix, size in files:
+                if size and len(candidates[suffix]) < CALIBRATION_SAMPLES and self.calibration.needs(suffix, name):
+                    candidates[suffix].append(data_dir / name)
+            if any(candidates.values()) or self.calibration.instructions_tokens is None:
+                calibration_calls = self.calibration.calibrate(candidates, self.instructions, self.count_tokens)
+                self.calibration.save()
+        instructions_tokens = self.calibration.instructions_tokens or estimate_tokens(self.instructions)
+
+        ratios = {suffix: self.calibration.bytes_per_token(suffix) for suffix in {f[1] for f in files}}
+        history = load_history(self.demo_dir)
+        all_calls = sum(h["calls"] for h in history.values())
+        default_output = (sum(h["output_tokens"] for h in history.values()) / all_calls
+                          if all_calls else DEFAULT_OUTPUT_TOKENS)
+
+        # Aggregate per (type, model) so the per-file loop stays cheap
+        buckets: Dict[Tuple[str, str], List[int]] = defaultdict(lambda: [0, 0, 0])
+        largest = {}
+        oversized = 0
+        for name, suffix, size in files:
+            tokens = int(size / ratios[suffix][0]) + 1
+            # Route on the router's own estimate (bytes stand in for characters) so the split matches a run
+            rule = self.router.rule_for(tokens_for_length(size), suffix)
+            bucket = buckets[(suffix, rule["model"] if rule else self.router.default_model)]
+            bucket[0] += 1
+            bucket[1] += size
+            bucket[2] += tokens
+            largest[suffix] = max(largest.get(suffix, 0), size)
+            if tokens > LONG_CONTEXT_TOKENS:
+                oversized += 1
+
+        models: Dict[str, Dict[str, Any]] = {}
+        total_s = calls = input_tokens = output_tokens = cost = 0.0
+        for (suffix, model), (count, size, tokens) in buckets.items():
+            seen = history.get(suffix, {})
+            model_share = 1 - seen["local"] / seen["files"] if seen.get("files") else 1.0
+            output_per_call = seen["output_tokens"] / seen["calls"] if seen.get("calls") else default_output
+
+            bucket_calls = count * model_share
+            bucket_input = tokens * model_share + bucket_calls * instructions_tokens
+            bucket_output = bucket_calls * output_per_call
+            bucket_cost = estimate_cost(model, bucket_input, bucket_output)
+            base, per_kb = self.estimator.coefficients(suffix)
+            total_s += count * base + per_kb * size / 1024
+
+            stats = models.setdefault(model, {"files": 0, "calls": 0, "input_tokens": 0,
+                                              "output_tokens": 0, "estimated_cost_usd": 0.0})
+            stats["files"] += count
+            stats["calls"] += bucket_calls
+            stats["input_tokens"] += bucket_input
+            stats["output_tokens"] += bucket_output
+            stats["estimated_cost_usd"] += bucket_cost
+            calls += bucket_calls
+            input_tokens += bucket_input
+            output_tokens += bucket_output
+            cost += bucket_cost
+
+        for stats in models.values():
+            for key in ("calls", "input_tokens", "output_tokens"):
+                stats[key] = round(stats[key])
+            stats["estimated_cost_usd"] = round(stats["estimated_cost_usd"], 6)
+
+        longest_s = 0.0
+        for suffix, size in largest.items():
+            base, per_kb = self.estimator.coefficients(suffix)
+            longest_s = max(longest_s, base + per_kb * size / 1024)
+        recommendations = self.recommend(len(files), total_s, longest_s, calls,
+                                         calls * instructions_tokens, input_tokens, oversized)
+
+        return {
+            "files": len(files),
+            "bytes": sum(f[2] for f in files),
+            "tokens": {
+                "input": round(input_tokens),
+                "output": round(output_tokens),
+                "instructions_per_call": instructions_tokens,
+                "bytes_per_token": {suffix: round(ratio, 2) for suffix, (ratio, _) in ratios.items()},
+                "calibrated": all(calibrated for _, calibrated in ratios.values()) if ratios else False,
+                "calibration_calls": calibration_calls,
+                "history_samples": sum(h["files"] for h in history.values()),
+            },
+            "models": models,
+            "time": {
+                "concurrency": self.concurrency,
+                "rate_limit_rpm": self.rpm,
+                "serial_s": round(total_s, 1),
+                "longest_file_s": round(longest_s, 2),
+                "projected_wall_s": round(self.wall_time(total_s, longest_s, calls, self.concurrency), 1),
+            },
+            "estimated_cost_usd": round(cost, 6),
+            "batch_cost_usd": round(cost * BATCH_DISCOUNT, 6),
+            "recommendations": recommendations,
+            "plan_s": round(time.perf_counter() - started, 3),
+            "scan_s": round(scan_s, 3),
+        }
+
+    def recommend(self, files: int, total_s: float, longest_s: float, calls: float,
+                  instruction_tokens: float, input_tokens: float, oversized: int) -> Dict[str, Any]:
+        notes = []
+        mean_s = total_s / files if files else 0.0
+        if self.rpm:
+            # Little's law: more workers than this only wait on the rate limiter
+            concurrency = math.ceil(self.rpm / 60 * mean_s) or 1
+        else:
+            concurrency = MAX_RECOMMENDED_CONCURRENCY
+            notes.append("No request rate limit is configured; set GEMINI_KEY_RPM to size concurrency to your quota")
+        concurrency = max(1, min(concurrency, MAX_RECOMMENDED_CONCURRENCY, files or 1))
+        wall_s = self.wall_time(total_s, longest_s, calls, concurrency)
+        if self.rpm and wall_s > total_s / concurrency and wall_s > longest_s:
+            notes.append(f"The rate limit ({self.rpm:g} rpm) bounds this run; more API keys would shorten it")
+
+        batch = wall_s > BATCH_RECOMMEND_S
+        if batch:
+            notes.append(f"Projected to take {wall_s / 3600:.1f}h; `python app.py batch` halves spend "
+                         f"and is not bound by the per-minute rate limit")
+
+        # Cached content below the API minimum is rejected, so only suggest caching a prefix that qualifies
+        if (not self.context_cache and instruction_tokens >= MIN_CACHED_TOKENS
+                and input_tokens and instruction_tokens / input_tokens > 0.3):
+            notes.append(f"The shared instructions are {instruction_tokens / input_tokens:.0%} of input tokens; "
+                         f"GEMINI_CONTEXT_CACHE=1 sends them once per run")
+
+        chunk_tokens = None
+        if oversized:
+            chunk_tokens = CHUNK_TOKENS
+            notes.append(f"{oversized} file(s) exceed {LONG_CONTEXT_TOKENS:,} tokens; split them into chunks "
+                         f"of about {CHUNK_TOKENS:,} tokens")
+
+        return {
+            "concurrency": concurrency,
+            "projected_wall_s": round(wall_s, 1),
+            "batch": batch,
+            "chunk_tokens": chunk_tokens,
+            "notes": notes,
+        }
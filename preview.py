@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Stratified preview of a corpus.
+
+A full pass over a new corpus can take hours. `preview` processes a small
+stratified random sample instead and turns it into a provisional summary
+report within minutes:
+
+- files are grouped into strata by file type and size bucket. When there
+  are more strata than the sample can cover, size buckets and then types
+  are merged until every stratum gets at least one file. (Files are only
+  discovered at the top of `data/`, so there are no directories to
+  stratify by.)
+- the sample is allocated to strata in proportion to their file counts and
+  drawn at random within each stratum (`--seed` makes it repeatable)
+- topic and entity frequencies (the share of files mentioning each) and
+  full-run totals (facts, tokens, cost, model time) are estimated with the
+  stratified estimators, with 95% confidence intervals that include the
+  finite population correction
+
+Sampled analyses are saved like any other and marked with the preview's run
+ID. A later full run reuses them while their data file is unchanged.
+"""
+
+import math
+import random
+from pathlib import Path
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from routing import estimate_cost
+
+DEFAULT_SAMPLE_SIZE = 100
+Z_95 = 1.96
+# Upper bounds of the size buckets in bytes; larger files fall in the last bucket
+SIZE_BUCKETS = ((4 * 1024, "<4KB"), (64 * 1024, "4-64KB"), (1024 * 1024, "64KB-1MB"))
+# Stratum keys from finest to coarsest
+STRATA_LEVELS = (("type", "size"), ("type",), ())
+MAX_REPORTED_TOPICS = 20
+MAX_REPORTED_ENTITIES = 10
+
+
+def size_bucket(size_bytes: int) -> str:
+    for limit, label in SIZE_BUCKETS:
+        if size_bytes < limit:
+            return label
+    return ">1MB"
+
+
+def describe(file_path: Path, size_bytes: int) -> Dict[str, str]:
+    """Stratification attributes of one file."""
+    return {"type": file_path.suffix.lower() or "(none)", "size": size_bucket(size_bytes)}
+
+
+def allocate(counts: Dict[Tuple, int], size: int) -> Dict[Tuple, int]:
+    """Proportional allocation with at least one file per stratum (largest remainders).
+
+    Expects no more strata than `size`.
+    """
+    total = sum(counts.values())
+    if size >= total:
+        return dict(counts)
+    # One file per stratum first, the rest in proportion to the files left
+    allocation = {key: 1 for key in counts}
+    spare = size - len(counts)
+    left = total - len(counts)
+    shares = {key: spare * (count - 1) / left if left else 0.0 for key, count in counts.items()}
+    for key, share in shares.items():
+        allocation[key] += int(share)
+    by_remainder = sorted(counts, key=lambda key: shares[key] - int(shares[key]), reverse=True)
+    for key in by_remainder[:size - sum(allocation.values())]:
+        allocation[key] += 1
+    return allocation
+
+
+class Stratum:
+    """Files sharing one stratum key, and those drawn from them."""
+
+    def __init__(self, key: Tuple, fields: Sequence[str]):
+        self.key = key
+        self.fields = fields
+        self.files: List[Path] = []
+        self.sample: List[Path] = []
+
+    @property
+    def weight(self) -> int:
+        return len(self.files)
+
+    def describe(self) -> Dict[str, Any]:
+        return {**dict(zip(self.fields, self.key)), "files": len(self.files), "sampled": len(self.sample)}
+
+
+def stratified_sample(files: List[Path], size: int = DEFAULT_SAMPLE_SIZE,
+                      seed: Optional[int] = None) -> List[Stratum]:
+    """Strata of `files`, each with its random sample, `size` files in all."""
+    described = [(path, describe(path, path.stat().st_size)) for path in files]
+    for fields in STRATA_LEVELS:
+        groups: Dict[Tuple, List[Path]] = defaultdict(list)
+        for path, attributes in described:
+            groups[tuple(attributes[field] for field in fields)].append(path)
+        if len(groups) <= size:
+            break
+
+    rng = random.Random(seed)
+    allocation = allocate({key: len(paths) for key, paths in groups.items()}, size)
+    strata = []
+    for key in sorted(groups):
+        stratum = Stratum(key, fields)
+        stratum.files = sorted(groups[key])
+        stratum.sample = rng.sample(stratum.files, allocation[key])
+        strata.append(stratum)
+    return strata
+
+
+def _stratified_total(strata: List[Stratum], values: Dict[Path, float]) -> Dict[str, float]:
+    """Estimated population total of a per-file value, with a 95% confidence interval."""
+    sampled = [values[path] for stratum in strata for path in stratum.sample]
+    pooled = _variance(sampled)
+    total = variance = 0.0
+    for stratum in strata:
+        ys = [values[path] for path in stratum.sample]
+        if not ys:
+            continue
+        n, big_n = len(ys), stratum.weight
+        total += big_n * sum(ys) / n
+        # A single draw says nothing about spread, so borrow the pooled variance
+        s2 = _variance(ys) if n > 1 else pooled
+        variance += big_n ** 2 * (1 - n / big_n) * s2 / n
+    margin = Z_95 * math.sqrt(variance)
+    return {"estimate": round(total, 2), "ci": [round(max(0.0, total - margin), 2), round(total + margin, 2)]}
+
+
+def _variance(values: List[float]) -> float:
+    if len(values) < 2:
+        return 0.0
+    mean = sum(values) / len(values)
+    return sum((value - mean) ** 2 for value in values) / (len(values) - 1)
+
+
+def _frequencies(strata: List[Stratum], mentions: Dict[Path, set], population: int,
+                 limit: int) -> List[Dict[str, Any]]:
+    """Estimated share of files mentioning each label, most frequent in the sample first."""
+    counts = Counter(label for labels in mentions.values() for label in labels)
+    rows = []
+    for label, sampled in counts.most_common(limit):
+        estimate = _stratified_total(strata, {path: float(label in labels) for path, labels in mentions.items()})
+        rows.append({
+            "name": label,
+            "sampled_files": sampled,
+            "share": round(estimate["estimate"] / population, 4),
+            "ci": [round(bound / population, 4) for bound in estimate["ci"]],
+            "projected_files": round(estimate["estimate"]),
+        })
+    return rows
+
+
+def estimate(strata: List[Stratum], results: Dict[Path, Dict[str, Any]],
+             file_topics: Dict[str, List[str]]) -> Dict[str, Any]:
+    """Estimated frequencies and projected full-run totals from the sampled analyses.
+
+    `results` maps each sampled path to its analysis; `file_topics` maps file
+    names to canonical topics (see `TopicClusterer.cluster`).
+    """
+    population = sum(stratum.weight for stratum in strata)
+    sampled = [path for stratum in strata for path in stratum.sample]
+
+    topics = {path: set(file_topics.get(path.name, [])) for path in sampled}
+    entities = {
+        key: _frequencies(strata, {path: set((results[path].get("entities") or {}).get(key, []))
+                                   for path in sampled}, population, MAX_REPORTED_ENTITIES)
+        for key in ("people", "organizations", "locations")
+    }
+
+    def provenance(path):
+        return results[path].get("provenance", {})
+
+    def cost(path):
+        info = provenance(path)
+        if info.get("model_used") in (None, "local"):
+            return 0.0
+        return estimate_cost(info["model_used"], info.get("prompt_tokens", 0), info.get("output_tokens", 0))
+
+    per_file = {
+        "facts": lambda path: len(results[path].get("key_facts", [])),
+        "model_calls": lambda path: float(provenance(path).get("model_used") not in (None, "local")),
+        "prompt_tokens": lambda path: provenance(path).get("prompt_tokens", 0),
+        "output_tokens": lambda path: provenance(path).get("output_tokens", 0),
+        "cost_usd": cost,
+        "model_seconds": lambda path: provenance(path).get("latency_ms", 0) / 1000,
+        "errors": lambda path: float(bool(provenance(path).get("error"))),
+    }
+    totals = {name: _stratified_total(strata, {path: float(value(path)) for path in sampled})
+              for name, value in per_file.items()}
+
+    return {
+        "provisional": True,
+        "confidence": 0.95,
+        "population_files": population,
+        "sampled_files": len(sampled),
+        "stratified_by": list(strata[0].fields) if strata else [],
+        "strata": [stratum.describe() for stratum in strata],
+        "topic_frequencies": _frequencies(strata, topics, population, MAX_REPORTED_TOPICS),
+        "entity_frequencies": entities,
+        "projected_totals": {"files": population, **totals},
+    }
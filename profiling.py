@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Stage profiler for `python app.py --profile ...`.
+
+`StageProfiler.instrument` wraps the wrangler's pipeline methods on the
+instance (read, local extraction, prompt build, model call, parse, write, report), so nothing
+is wrapped and nothing is measured unless profiling was requested. While
+active it:
+
+- samples every thread's stack on a background thread and writes them as
+  collapsed stacks prefixed with the pipeline stage (flamegraph.pl /
+  speedscope input)
+- accounts wall and CPU time per stage
+- records tracemalloc snapshots at stage boundaries (top allocators per
+  stage) and the allocation peak while each file is processed
+"""
+
+import sys
+import json
+import time
+import threading
+import tracemalloc
+from pathlib import Path
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Wrangler attributes wrapped for each stage: (attribute path, method name)
+STAGES = {
+    "read": ("", "read_file"),
+    "local": ("", "extract_locally"),
+    "prompt": ("", "build_prompt"),
+    "call": ("", "call_model"),
+    "parse": ("", "parse_response"),
+    "write": ("writer", "_write_batch"),
+    "report": ("", "generate_summary_report"),
+}
+
+
+class StageProfiler:
+    """Per-stage CPU sampling and allocation tracking for one run."""
+
+    def __init__(self, output_dir: Path, sample_interval: float = 0.005,
+                 snapshots_per_stage: int = 5, traceback_limit: int = 1):
+        self.output_dir = output_dir
+        self.sample_interval = sample_interval
+        self.snapshots_per_stage = snapshots_per_stage
+        self.traceback_limit = traceback_limit
+
+        self._stage_by_thread: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._stacks: Counter = Counter()
+        self._stage_times = defaultdict(lambda: {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0})
+        self._stage_allocations: Dict[str, Counter] = defaultdict(Counter)
+        self._snapshots_taken: Counter = Counter()
+        self._file_peaks: Dict[str, int] = {}
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._started = 0.0
+
+    def instrument(self, wrangler):
+        """Wrap the wrangler's stage methods on this instance only."""
+        for stage, (owner_attr, method_name) in STAGES.items():
+            owner = getattr(wrangler, owner_attr) if owner_attr else wrangler
+            setattr(owner, method_name, self._wrap_stage(stage, getattr(owner, method_name)))
+        wrangler.process_file = self._wrap_file(wrangler.process_file)
+
+    def _wrap_stage(self, stage: str, fn: Callable) -> Callable:
+        def wrapper(*args, **kwargs):
+            thread_id = threading.get_ident()
+            previous = self._stage_by_thread.get(thread_id)
+            self._stage_by_thread[thread_id] = stage
+
+            with self._lock:
+                take_snapshot = (tracemalloc.is_tracing()
+                                 and self._snapshots_taken[stage] < self.snapshots_per_stage)
+                if take_snapshot:
+                    self._snapshots_taken[stage] += 1
+            before = self._snapshot() if take_snapshot else None
+
+            wall_started, cpu_started = time.perf_counter(), time.thread_time()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                wall, cpu = time.perf_counter() - wall_started, time.thread_time() - cpu_started
+                if before is not None and tracemalloc.is_tracing():
+                    self._record_allocations(stage, before, self._snapshot())
+                with self._lock:
+                    totals = self._stage_times[stage]
+                    totals["calls"] += 1
+                    totals["wall_s"] += wall
+                    totals["cpu_s"] += cpu
+                if previous is None:
+                    self._stage_by_thread.pop(thread_id, None)
+                else:
+                    self._stage_by_thread[thread_id] = previous
+        return wrapper
+
+    def _wrap_file(self, fn: Callable) -> Callable:
+        def wrapper(file_path, *args, **kwargs):
+            # The peak is process-wide, so it is exact only when files run one at a time
+            if tracemalloc.is_tracing():
+                tracemalloc.reset_peak()
+            try:
+                return fn(file_path, *args, **kwargs)
+            finally:
+                if tracemalloc.is_tracing():
+                    self._file_peaks[Path(file_path).name] = tracemalloc.get_traced_memory()[1]
+        return wrapper
+
+    def _snapshot(self):
+        """Take a snapshot that leaves out the profiler's own allocations."""
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ])
+
+    def _record_allocations(self, stage: str, before, after):
+        stats = after.compare_to(before, "lineno")
+        with self._lock:
+            for stat in stats[:25]:
+                frame = stat.traceback[0]
+                self._stage_allocations[stage][f"{frame.filename}:{frame.lineno}"] += stat.size_diff
+
+    def _sample(self):
+        sampler_id = threading.get_ident()
+        main_id = threading.main_thread().ident
+        while not self._stop.wait(self.sample_interval):
+            for thread_id, frame in sys._current_frames().items():
+                stage = self._stage_by_thread.get(thread_id)
+                if thread_id == sampler_id or (stage is None and thread_id != main_id):
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(stage or "other")
+                self._stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        tracemalloc.start(self.traceback_limit)
+        self._started = time.perf_counter()
+        self._sampler = threading.Thread(target=self._sample, name="profile-sampler", daemon=True)
+        self._sampler.start()
+
+    def stop(self) -> Tuple[Path, Path]:
+        """Stop profiling and write the collapsed stacks and JSON report."""
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        elapsed = time.perf_counter() - self._started
+
+        top_allocators = [
+            {"location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+             "size_bytes": stat.size, "count": stat.count}
+            for stat in self._snapshot().statistics("lineno")[:20]
+        ]
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        collapsed_file = self.output_dir / "profile.collapsed"
+        with open(collapsed_file, 'w', encoding='utf-8') as f:
+            for stack, count in self._stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        report: Dict[str, Any] = {
+            "elapsed_s": round(elapsed, 3),
+            "sample_interval_s": self.sample_interval,
+            "samples": sum(self._stacks.values()),
+            "stages": {
+                stage: {
+                    "calls": totals["calls"],
+                    "wall_s": round(totals["wall_s"], 4),
+                    "cpu_s": round(totals["cpu_s"], 4),
+                    "top_allocators": [
+                        {"location": location, "size_diff_bytes": size}
+                        for location, size in self._stage_allocations[stage].most_common(10)
+                    ],
+                }
+                for stage, totals in self._stage_times.items()
+            },
+            "memory": {
+                "current_bytes": current,
+                "peak_bytes": peak,
+                "peak_bytes_per_file": self._file_peaks,
+                "top_allocators": top_allocators,
+            },
+        }
+        json_file = self.output_dir / "profile.json"
+        with open(json_file, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+        return collapsed_file, json_file
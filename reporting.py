@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Summary report aggregation.
+
+`SummaryAccumulator` folds per-file analyses into what the summary report
+needs (fact counts, the first facts and entities, model usage, per-file
+summaries and topics) without keeping the analyses themselves. Two
+accumulators can be merged, so a corpus can be aggregated in chunks.
+
+`rebuild_summary` uses that to rebuild `summary_report.json` from the
+analyses already saved in `demo/`, without calling a model:
+
+- analyses are listed with `os.scandir` and split into chunks of file
+  names, in name order
+- worker processes each read, parse and accumulate one chunk and send back
+  only the merged accumulator, so JSON parsing runs on every core
+- at most two chunks per worker are in flight, which bounds memory however
+  many analyses there are
+- unreadable or malformed analyses are skipped and logged, and listed under
+  `metadata.rebuild.skipped`
+"""
+
+import os
+import json
+import time
+import logging
+from pathlib import Path
+from datetime import datetime
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger("gemini-demo")
+
+ENTITY_KEYS = ("people", "organizations", "locations")
+MAX_FACTS = 20
+MAX_ENTITIES = 10
+CHUNK_SIZE = 1000
+MAX_REPORTED_SKIPS = 100
+
+
+def _list_field(data: Dict[str, Any], key: str) -> List[Any]:
+    """A list field of an analysis (empty if absent); raises TypeError for anything else."""
+    value = data.get(key) or []
+    if not isinstance(value, list):
+        raise TypeError(f"{key} is {type(value).__name__}, not a list")
+    return value
+
+
+class SummaryAccumulator:
+    """Mergeable aggregate of per-file analyses for the summary report."""
+
+    def __init__(self):
+        self.files = 0
+        self.total_facts = 0
+        self.facts: List[str] = []
+        self.entities: Dict[str, Dict[str, None]] = {key: {} for key in ENTITY_KEYS}
+        self.model_usage: Counter = Counter()
+        self.response_formats: Counter = Counter()
+        self.file_summaries: List[Dict[str, Any]] = []
+
+    def add(self, result: Dict[str, Any], default_model: Optional[str] = None):
+        """Fold in one analysis; raises KeyError or TypeError for malformed ones.
+
+        The analysis is validated in full before any state changes, so a
+        malformed one leaves the accumulator untouched.
+        """
+        provenance = result["provenance"]
+        file_name = provenance["source_file"]
+        key_facts = _list_field(result, "key_facts")
+        topics = _list_field(result, "topics")
+        summary = result["summary"]
+        entities = result.get("entities") or {}
+        if not isinstance(entities, dict):
+            raise TypeError(f"entities is {type(entities).__name__}, not an object")
+        entities = {key: _list_field(entities, key) for key in ENTITY_KEYS}
+        model = provenance.get("model_used", default_model)
+        # Entities and model names become dict keys; unhashable ones raise TypeError here
+        for value in (model, provenance.get("response_format"), *sum(entities.values(), [])):
+            hash(value)
+
+        self.files += 1
+        self.total_facts += len(key_facts)
+        self.facts.extend(key_facts[:MAX_FACTS - len(self.facts)])
+        for key in ENTITY_KEYS:
+            seen = self.entities[key]
+            for entity in entities[key]:
+                if len(seen) >= MAX_ENTITIES:
+                    break
+                seen.setdefault(entity)
+        self.model_usage[model] += 1
+        if "response_format" in provenance:
+            self.response_formats[provenance["response_format"]] += 1
+        self.file_summaries.append({
+            "file": file_name,
+            "summary": summary,
+            "fact_count": len(key_facts),
+            "topics": topics,
+        })
+
+    def merge(self, other: "SummaryAccumulator") -> "SummaryAccumulator":
+        """Append another accumulator's files after this one's."""
+        self.files += other.files
+        self.total_facts += other.total_facts
+        self.facts.extend(other.facts[:MAX_FACTS - len(self.facts)])
+        for key in ENTITY_KEYS:
+            seen = self.entities[key]
+            for entity in other.entities[key]:
+                if len(seen) >= MAX_ENTITIES:
+                    break
+                seen.setdefault(entity)
+        self.model_usage.update(other.model_usage)
+        self.response_formats.update(other.response_formats)
+        self.file_summaries.extend(other.file_summaries)
+        return self
+
+    def file_topics(self) -> List[Tuple[str, List[str]]]:
+        return [(entry["file"], entry["topics"]) for entry in self.file_summaries]
+
+
+def build_summary_report(accumulator: SummaryAccumulator, topics: Dict[str, Any], run_id: str,
+                         metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Summary report from an accumulator and its topic clusters (see `TopicClusterer.cluster`).
+
+    `metadata` is added after the aggregate fields.
+    """
+    return {
+        "metadata": {
+            "generated_at": datetime.now().isoformat(),
+            "run_id": run_id,
+            "total_files_processed": accumulator.files,
+            "total_facts_extracted": accumulator.total_facts,
+            "unique_topics": [cluster["topic"] for cluster in topics["canonical_topics"]],
+            "topic_clusters": {key: topics[key] for key in ("distinct_topics", "clusters", "canonical_topics")},
+            "model_usage": dict(accumulator.model_usage),
+            **metadata
+        },
+        "consolidated_facts": accumulator.facts,
+        "consolidated_entities": {key: list(values) for key, values in accumulator.entities.items()},
+        "file_summaries": [
+            {**entry, "canonical_topics": topics["file_topics"].get(entry["file"], [])}
+            for entry in accumulator.file_summaries
+        ]
+    }
+
+
+def analysis_files(demo_dir: Path) -> List[str]:
+    """Paths of the saved per-file analyses, in name order."""
+    with os.scandir(demo_dir) as entries:
+        return sorted(entry.path for entry in entries
+                      if entry.name.endswith("_analysis.json") and entry.is_file())
+
+
+def accumulate_files(paths: List[str]) -> Tuple[SummaryAccumulator, List[Dict[str, str]]]:
+    """Read and accumulate analyses, returning the accumulator and the files skipped."""
+    accumulator = SummaryAccumulator()
+    skipped = []
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                analysis = json.loads(f.read())
+            if not isinstance(analysis, dict):
+                raise TypeError("not a JSON object")
+            accumulator.add(analysis)
+        except (OSError, ValueError) as e:
+            skipped.append({"file": path, "error": f"{type(e).__name__}: {e}"})
+        except (KeyError, TypeError, AttributeError) as e:
+            skipped.append({"file": path, "error": f"malformed analysis ({type(e).__name__}: {e})"})
+    return accumulator, skipped
+
+
+def _chunks(items: List[str], size: int) -> Iterator[List[str]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def accumulate_directory(demo_dir: Path, workers: Optional[int] = None,
+                         chunk_size: int = CHUNK_SIZE) -> Tuple[SummaryAccumulator, List[Dict[str, str]], int]:
+    """Accumulate every saved analysis in `demo_dir` in parallel.
+
+    Returns the accumulator, the skipped files and the number of files seen.
+    """
+    paths = analysis_files(demo_dir)
+    workers = workers or os.cpu_count() or 1
+    accumulator = SummaryAccumulator()
+    skipped: List[Dict[str, str]] = []
+
+    def fold(part: Tuple[SummaryAccumulator, List[Dict[str, str]]]):
+        accumulator.merge(part[0])
+        skipped.extend(part[1])
+
+    if workers == 1 or len(paths) <= chunk_size:
+        fold(accumulate_files(paths))
+        return accumulator, skipped, len(paths)
+
+    # Keep a bounded window of chunks in flight and merge them in order
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight: deque = deque()
+        for chunk in _chunks(paths, chunk_size):
+            if len(in_flight) >= 2 * workers:
+                fold(in_flight.popleft().result())
+            in_flight.append(executor.submit(accumulate_files, chunk))
+        while in_flight:
+            fold(in_flight.popleft().result())
+    return accumulator, skipped, len(paths)
+
+
+def rebuild_summary(demo_dir: Path, topic_clusterer, run_id: str,
+                    workers: Optional[int] = None) -> Dict[str, Any]:
+    """Summary report rebuilt from the analyses saved in `demo_dir`, without model calls."""
+    started = time.perf_counter()
+    accumulator, skipped, seen = accumulate_directory(demo_dir, workers)
+    for entry in skipped[:MAX_REPORTED_SKIPS]:
+        logger.warning(f"Skipping {entry['file']}: {entry['error']}")
+    if len(skipped) > MAX_REPORTED_SKIPS:
+        logger.warning(f"... and {len(skipped) - MAX_REPORTED_SKIPS} more unreadable analyses")
+    loaded = time.perf_counter()
+
+    topics = topic_clusterer.cluster(accumulator.file_topics())
+    topic_clusterer.save()
+
+    return build_summary_report(accumulator, topics, run_id, {
+        "response_formats": dict(accumulator.response_formats),
+        "rebuild": {
+            "analyses": seen,
+            "loaded": accumulator.files,
+            "skipped_count": len(skipped),
+            "skipped": skipped[:MAX_REPORTED_SKIPS],
+            "load_s": round(loaded - started, 2),
+            "total_s": round(time.perf_counter() - started, 2),
+        },
+    })
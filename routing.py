@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Per-document model routing.
+
+`ModelRouter` picks a model for each document from an ordered list of rules
+matching on estimated token count and file type, and escalates to a
+stronger model when the chosen one keeps returning unparseable responses for
+that file type. It also keeps per-model latency, token and spend statistics
+that are recorded in each result's provenance.
+
+Rules are loaded from the JSON file named by `GEMINI_ROUTING_RULES`:
+
+    {
+      "rules": [
+        {"name": "trivial", "max_tokens": 250, "model": "gemini-1.5-flash-8b"},
+        {"name": "structured", "extensions": [".json"], "model": "gemini-1.5-flash-8b"},
+        {"name": "default", "model": "gemini-1.5-flash"}
+      ],
+      "escalation": {"gemini-1.5-flash-8b": "gemini-1.5-flash"},
+      "max_parse_failure_rate": 0.2,
+      "min_samples": 5
+    }
+"""
+
+import os
+import json
+import threading
+from pathlib import Path
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+from stats import LatencyTracker
+
+DEFAULT_MODEL = "gemini-1.5-flash"
+FAST_MODEL = "gemini-1.5-flash-8b"
+
+# Approximate USD per million tokens (input, output), used for spend estimates
+MODEL_PRICES = {
+    "gemini-1.5-flash-8b": (0.0375, 0.15),
+    "gemini-1.5-flash": (0.075, 0.30),
+    "gemini-1.5-pro": (1.25, 5.00),
+    "gemini-2.0-flash": (0.10, 0.40),
+}
+
+
+# Smallest prefix Gemini accepts as explicitly cached content (1.5 models)
+MIN_CACHED_TOKENS = 32_768
+
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Fast local token estimate (about four characters per token)."""
+    return tokens_for_length(len(text))
+
+
+def tokens_for_length(length: int) -> int:
+    """`estimate_tokens` for a text of `length` characters, without the text."""
+    return max(1, length // CHARS_PER_TOKEN)
+
+
+def estimate_cost(model: str, prompt_tokens: int, output_tokens: int) -> float:
+    """Approximate USD cost of a call at standard (non-batch) prices."""
+    input_price, output_price = MODEL_PRICES.get(model, MODEL_PRICES[DEFAULT_MODEL])
+    return (prompt_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+
+def default_rules(default_model: str) -> List[Dict[str, Any]]:
+    return [
+        {"name": "trivial", "max_tokens": 250, "model": FAST_MODEL},
+        {"name": "default", "model": default_model},
+    ]
+
+
+class ModelStats:
+    """Latency, token and parse statistics for one model."""
+
+    def __init__(self, model: str):
+        self.model = model
+        self.latency = LatencyTracker()
+        self.calls = 0
+        self.errors = 0
+        self.parse_failures: Dict[str, int] = defaultdict(int)
+        self.parsed: Dict[str, int] = defaultdict(int)
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+
+    def failure_rate(self, file_type: str) -> Optional[float]:
+        total = self.parse_failures[file_type] + self.parsed[file_type]
+        return self.parse_failures[file_type] / total if total else None
+
+    def estimated_cost(self) -> float:
+        return estimate_cost(self.model, self.prompt_tokens, self.output_tokens)
+
+    def to_dict(self) -> Dict[str, Any]:
+        failures = sum(self.parse_failures.values())
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "parse_failures": failures,
+            "parse_failure_rate": round(failures / self.calls, 3) if self.calls else None,
+            "latency": self.latency.summary(),
+            "prompt_tokens": self.prompt_tokens,
+            "output_tokens": self.output_tokens,
+            "estimated_cost_usd": round(self.estimated_cost(), 6),
+        }
+
+
+class ModelRouter:
+    """Choose a model per document and track how each model performs."""
+
+    def __init__(self, rules: Optional[List[Dict[str, Any]]] = None,
+                 default_model: str = DEFAULT_MODEL,
+                 escalation: Optional[Dict[str, str]] = None,
+                 max_parse_failure_rate: float = 0.2, min_samples: int = 5):
+        self.default_model = default_model
+        self.rules = rules if rules is not None else default_rules(default_model)
+        self.escalation = escalation if escalation is not None else {FAST_MODEL: default_model}
+        self.max_parse_failure_rate = max_parse_failure_rate
+        self.min_samples = min_samples
+        self._stats: Dict[str, ModelStats] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "ModelRouter":
+        """Build a router from `GEMINI_MODEL` and the `GEMINI_ROUTING_RULES` file."""
+        default_model = os.getenv("GEMINI_MODEL") or DEFAULT_MODEL
+        rules_file = os.getenv("GEMINI_ROUTING_RULES")
+        if not rules_file:
+            return cls(default_model=default_model)
+
+        with open(Path(rules_file), 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        return cls(rules=config.get("rules"), default_model=default_model,
+                   escalation=config.get("escalation"),
+                   max_parse_failure_rate=config.get("max_parse_failure_rate", 0.2),
+                   min_samples=config.get("min_samples", 5))
+
+    def _matches(self, rule: Dict[str, Any], tokens: int, file_type: str) -> bool:
+        if "max_tokens" in rule and tokens > rule["max_tokens"]:
+            return False
+        if "min_tokens" in rule and tokens < rule["min_tokens"]:
+            return False
+        if "extensions" in rule and file_type not in [e.lower() for e in rule["extensions"]]:
+            return False
+        return True
+
+    def rule_for(self, tokens: int, file_type: str) -> Optional[Dict[str, Any]]:
+        """First rule matching a document's token count and file type, before escalation."""
+        return next((r for r in self.rules if self._matches(r, tokens, file_type)), None)
+
+    def route(self, content: str, file_name: str) -> Dict[str, Any]:
+        """Return the routing decision for a document."""
+        tokens = estimate_tokens(content)
+        file_type = Path(file_name).suffix.lower()
+
+        rule = self.rule_for(tokens, file_type)
+        model = rule["model"] if rule else self.default_model
+        decision = {
+            "model": model,
+            "rule": rule.get("name", "unnamed") if rule else "default",
+            "estimated_tokens": tokens,
+        }
+
+        # Escalate while the chosen model keeps failing to produce parseable output
+        seen = {model}
+        while model in self.escalation:
+            with self._lock:
+                stats = self._stats.get(model)
+                samples = stats.parse_failures[file_type] + stats.parsed[file_type] if stats else 0
+                rate = stats.failure_rate(file_type) if stats else None
+            if samples < self.min_samples or rate is None or rate <= self.max_parse_failure_rate:
+                break
+            escalated = self.escalation[model]
+            if escalated in seen:
+                break
+            decision["escalated_from"] = model
+            decision["reason"] = f"{model} parse failure rate {rate:.0%} for {file_type or 'files'}"
+            model = escalated
+            seen.add(model)
+        decision["model"] = model
+        return decision
+
+    def _model_stats(self, model: str) -> ModelStats:
+        if model not in self._stats:
+            self._stats[model] = ModelStats(model)
+        return self._stats[model]
+
+    def record(self, model: str, file_name: str, latency_s: float, prompt_tokens: int = 0,
+               output_tokens: int = 0, parsed: Optional[bool] = True):
+        """Record the outcome of a call; `parsed=None` marks a failed request."""
+        file_type = Path(file_name).suffix.lower()
+        with self._lock:
+            stats = self._model_stats(model)
+            stats.calls += 1
+            stats.latency.record(latency_s)
+            stats.prompt_tokens += prompt_tokens
+            stats.output_tokens += output_tokens
+            if parsed is None:
+                stats.errors += 1
+            elif parsed:
+                stats.parsed[file_type] += 1
+            else:
+                stats.parse_failures[file_type] += 1
+
+    def stats(self, model: Optional[str] = None) -> Dict[str, Any]:
+        """Statistics for one model, or for every model used so far."""
+        with self._lock:
+            if model is not None:
+                return self._model_stats(model).to_dict()
+            return {name: stats.to_dict() for name, stats in self._stats.items()}
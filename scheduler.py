@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Size-aware scheduling for `process_files`.
+
+`CostEstimator` predicts how long a file will take from its size with a
+per-extension linear fit that is refined after every run. `schedule` orders
+files before dispatch:
+
+- `lpt` - longest processing time first, minimizes makespan with many workers
+- `spt` - shortest processing time first, minimizes mean latency and time to
+  first result
+- `fifo` - discovery order
+
+Optional hints assign per-file priorities (higher runs first) and deadlines
+(seconds from the start of the run, earliest first) by file name pattern.
+"""
+
+import json
+import fnmatch
+import logging
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger("gemini-demo")
+
+POLICIES = ("lpt", "spt", "fifo")
+
+# Starting point before any run has been observed
+DEFAULT_BASE_SECONDS = 1.0
+DEFAULT_SECONDS_PER_KB = 0.05
+
+
+class CostEstimator:
+    """Predict processing seconds from file size, learning from observed runs."""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path
+        # Running sums for least squares per extension: n, sum x, sum y, sum xx, sum xy
+        self.fits: Dict[str, List[float]] = {}
+        self.errors: List[float] = []
+
+        if path and path.exists():
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.fits = json.load(f).get("fits", {})
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning(f"Ignoring unreadable cost model {path}: {e}")
+
+    def coefficients(self, suffix: str):
+        """`(base seconds, seconds per KB)` used for files with this extension."""
+        return self._coefficients(suffix.lower() if suffix.lower() in self.fits else "*")
+
+    def _coefficients(self, key: str):
+        n, sx, sy, sxx, sxy = self.fits.get(key, [0, 0, 0, 0, 0])
+        if n == 0:
+            return DEFAULT_BASE_SECONDS, DEFAULT_SECONDS_PER_KB
+        mean_x, mean_y = sx / n, sy / n
+        variance = sxx / n - mean_x ** 2
+        if n < 2 or variance <= 1e-9:
+            # Not enough spread to fit a slope, scale the default by the observed mean
+            slope = DEFAULT_SECONDS_PER_KB
+            return max(0.0, mean_y - slope * mean_x), slope
+        slope = max(0.0, (sxy / n - mean_x * mean_y) / variance)
+        return max(0.0, mean_y - slope * mean_x), slope
+
+    def estimate(self, file_path: Path, size_bytes: Optional[int] = None) -> float:
+        """Estimated seconds to process a file."""
+        if size_bytes is None:
+            size_bytes = file_path.stat().st_size
+        base, per_kb = self.coefficients(file_path.suffix)
+        return base + per_kb * size_bytes / 1024
+
+    def observe(self, file_path: Path, size_bytes: int, seconds: float, estimated: float):
+        """Record an actual processing time and log it against the estimate."""
+        x = size_bytes / 1024
+        for key in (file_path.suffix.lower(), "*"):
+            sums = self.fits.setdefault(key, [0, 0, 0, 0, 0])
+            for i, value in enumerate((1, x, seconds, x * x, x * seconds)):
+                sums[i] += value
+
+        error = seconds - estimated
+        self.errors.append(abs(error))
+        logger.info(f"⏱️  {file_path.name}: estimated {estimated:.2f}s, actual {seconds:.2f}s "
+                    f"({error:+.2f}s)")
+
+    def mean_absolute_error(self) -> Optional[float]:
+        return sum(self.errors) / len(self.errors) if self.errors else None
+
+    def save(self):
+        if not self.path:
+            return
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({"fits": self.fits}, f, indent=2)
+
+
+class ScheduledFile:
+    """A file with its estimated cost and scheduling hints."""
+
+    def __init__(self, path: Path, index: int, size_bytes: int, estimated_seconds: float,
+                 priority: int = 0, deadline_seconds: Optional[float] = None):
+        self.path = path
+        self.index = index
+        self.size_bytes = size_bytes
+        self.estimated_seconds = estimated_seconds
+        self.priority = priority
+        self.deadline_seconds = deadline_seconds
+
+
+def load_hints(path: Optional[Path]) -> Dict[str, Dict[str, Any]]:
+    """Load `{"pattern": {"priority": int, "deadline_s": float}}` scheduling hints."""
+    if not path:
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"Ignoring unreadable schedule hints {path}: {e}")
+        return {}
+
+
+def schedule(files: Iterable[Path], estimator: CostEstimator, policy: str = "lpt",
+             hints: Optional[Dict[str, Dict[str, Any]]] = None) -> List[ScheduledFile]:
+    """Return files in dispatch order for the given policy and hints."""
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown schedule policy {policy!r}, expected one of {POLICIES}")
+
+    jobs = []
+    for index, file_path in enumerate(files):
+        size = file_path.stat().st_size
+        job = ScheduledFile(file_path, index, size, estimator.estimate(file_path, size))
+        for pattern, hint in (hints or {}).items():
+            if fnmatch.fnmatch(file_path.name, pattern):
+                job.priority = hint.get("priority", job.priority)
+                job.deadline_seconds = hint.get("deadline_s", job.deadline_seconds)
+        jobs.append(job)
+
+    def cost_key(job: ScheduledFile):
+        if policy == "lpt":
+            return -job.estimated_seconds
+        if policy == "spt":
+            return job.estimated_seconds
+        return job.index
+
+    def sort_key(job: ScheduledFile):
+        deadline = job.deadline_seconds if job.deadline_seconds is not None else float("inf")
+        return (-job.priority, deadline, cost_key(job), job.index)
+
+    return sorted(jobs, key=sort_key)
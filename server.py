@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+"""
+HTTP analysis service for the Gemini File Wrangler.
+
+Exposes `extract_key_facts` over a small asyncio HTTP/1.1 server so other
+services can call the wrangler as an API:
+
+- `POST /v1/extract` with `{"content": ..., "file_name": ...}` returns one analysis
+- `POST /v1/extract/batch` with `{"documents": [...]}` streams NDJSON results
+  as each document finishes
+- `POST /v1/extract/stream` with one document streams NDJSON field events
+  (`summary`, `key_facts`, ...) as the model produces them, then the result
+- `GET /healthz` reports pool, queue and latency statistics
+
+Concurrent identical requests (same content hash) share a single in-flight
+model call, and all model calls go through one bounded pool that rejects
+work with `503` once its queue is full.
+"""
+
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from stats import LatencyTracker, percentile
+
+logger = logging.getLogger("gemini-demo")
+
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+NDJSON_HEADERS = (
+    b"HTTP/1.1 200 OK\r\n"
+    b"Content-Type: application/x-ndjson\r\n"
+    b"Transfer-Encoding: chunked\r\n\r\n"
+)
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class PoolSaturated(Exception):
+    """Raised when the model-call queue is full."""
+
+
+class HTTPError(Exception):
+    """An error that maps directly to an HTTP status code."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one in-flight task."""
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            self.leaders += 1
+            # The call runs as its own task so one caller disconnecting does not
+            # cancel the work other callers are waiting on.
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+
+class ModelCallPool:
+    """Bounded pool of worker threads for blocking model calls with admission control."""
+
+    def __init__(self, max_concurrency: int = 8, max_queue: int = 64):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency,
+                                            thread_name_prefix="model-call")
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.completed = 0
+
+    async def run(self, fn: Callable, *args) -> Any:
+        if self.active >= self.max_concurrency and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise PoolSaturated(f"model-call queue is full ({self.waiting} waiting)")
+
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, fn, *args)
+        finally:
+            self.active -= 1
+            self.completed += 1
+            self._semaphore.release()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+def request_key(content: str, file_name: str) -> str:
+    """Hash identifying identical extraction requests."""
+    digest = hashlib.sha256()
+    digest.update(file_name.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(content.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class AnalysisService:
+    """Async HTTP front end for a shared `GeminiFileWrangler`."""
+
+    def __init__(self, wrangler, max_concurrency: int = 8, max_queue: int = 64):
+        self.wrangler = wrangler
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.single_flight = SingleFlight()
+        self.latency = LatencyTracker()
+        self.pool: Optional[ModelCallPool] = None
+        self.requests = 0
+
+    async def extract(self, content: str, file_name: str) -> Dict[str, Any]:
+        """Run (or join) the extraction for one document."""
+        key = request_key(content, file_name)
+        return await self.single_flight.do(
+            key, lambda: self.pool.run(self.wrangler.extract_key_facts, content, file_name)
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "in_flight_calls": self.single_flight.in_flight,
+            "model_calls": self.single_flight.leaders,
+            "coalesced_requests": self.single_flight.coalesced,
+            "pool": {
+                "max_concurrency": self.pool.max_concurrency,
+                "max_queue": self.pool.max_queue,
+                "active": self.pool.active,
+                "queue_depth": self.pool.waiting,
+                "rejected": self.pool.rejected,
+                "completed": self.pool.completed,
+            },
+            "latency": self.latency.summary(),
+        }
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve HTTP/1.1 requests on one (keep-alive) connection."""
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                self.requests += 1
+                started = time.perf_counter()
+
+                try:
+                    await self.dispatch(method, path, body, writer)
+                except HTTPError as e:
+                    await send_json(writer, e.status, {"error": str(e)})
+                except PoolSaturated as e:
+                    await send_json(writer, 503, {"error": str(e)}, {"Retry-After": "1"})
+                except Exception as e:
+                    logger.exception("Request failed")
+                    await send_json(writer, 500, {"error": str(e)})
+
+                self.latency.record(time.perf_counter() - started)
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except HTTPError as e:
+            await send_json(writer, e.status, {"error": str(e)}, {"Connection": "close"})
+        finally:
+            writer.close()
+
+    async def dispatch(self, method: str, path: str, body: bytes, writer: asyncio.StreamWriter):
+        if path == "/healthz":
+            if method != "GET":
+                raise HTTPError(405, "Use GET")
+            await send_json(writer, 200, {"status": "ok", "stats": self.stats()})
+
+        elif path == "/v1/extract":
+            if method != "POST":
+                raise HTTPError(405, "Use POST")
+            content, file_name = parse_document(parse_json_body(body))
+            await send_json(writer, 200, await self.extract(content, file_name))
+
+        elif path == "/v1/extract/batch":
+            if method != "POST":
+                raise HTTPError(405, "Use POST")
+            payload = parse_json_body(body)
+            documents = payload.get("documents") if isinstance(payload, dict) else None
+            if not isinstance(documents, list):
+                raise HTTPError(400, "Expected {\"documents\": [...]}")
+            await self.stream_batch([parse_document(doc) for doc in documents], writer)
+
+        elif path == "/v1/extract/stream":
+            if method != "POST":
+                raise HTTPError(405, "Use POST")
+            content, file_name = parse_document(parse_json_body(body))
+            await self.stream_fields(content, file_name, writer)
+
+        else:
+            raise HTTPError(404, f"No route for {path}")
+
+    async def stream_batch(self, documents: List[Tuple[str, str]], writer: asyncio.StreamWriter):
+        """Stream one NDJSON line per document in completion order."""
+        writer.write(NDJSON_HEADERS)
+
+        async def run(index: int, content: str, file_name: str) -> Dict[str, Any]:
+            try:
+                return {"index": index, "file_name": file_name,
+                        "result": await self.extract(content, file_name)}
+            except PoolSaturated as e:
+                return {"index": index, "file_name": file_name, "error": str(e), "status": 503}
+            except Exception as e:
+                return {"index": index, "file_name": file_name, "error": str(e), "status": 500}
+
+        tasks = [asyncio.ensure_future(run(i, *doc)) for i, doc in enumerate(documents)]
+        for finished in asyncio.as_completed(tasks):
+            await send_chunk(writer, await finished)
+
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def stream_fields(self, content: str, file_name: str, writer: asyncio.StreamWriter):
+        """Stream one NDJSON line per analysis field as the model produces it, then the result.
+
+        Fields arrive incrementally only when the wrangler streams responses;
+        otherwise the result line is the only one. These requests bypass
+        single-flight because every caller needs its own field events.
+        """
+        loop = asyncio.get_running_loop()
+        events: asyncio.Queue = asyncio.Queue()
+
+        def on_field(name: str, value: Any):
+            loop.call_soon_threadsafe(events.put_nowait, {"field": name, "value": value})
+
+        task = asyncio.ensure_future(
+            self.pool.run(self.wrangler.extract_key_facts, content, file_name, on_field)
+        )
+        task.add_done_callback(lambda _: events.put_nowait(None))
+
+        started = False
+        while True:
+            event = await events.get()
+            if event is None:
+                break
+            if not started:
+                writer.write(NDJSON_HEADERS)
+                started = True
+            await send_chunk(writer, event)
+
+        # Rejections and failures before the first field still get a plain error response;
+        # once the stream has started, a failure ends it with an error line instead
+        try:
+            result = await task
+        except Exception as e:
+            if not started:
+                raise
+            logger.exception("Streamed request failed")
+            await send_chunk(writer, {"error": str(e), "status": 503 if isinstance(e, PoolSaturated) else 500})
+        else:
+            if not started:
+                writer.write(NDJSON_HEADERS)
+            await send_chunk(writer, {"result": result})
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+
+def parse_json_body(body: bytes) -> Any:
+    try:
+        return json.loads(body or b"null")
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        raise HTTPError(400, f"Invalid JSON body: {e}")
+
+
+def parse_document(payload: Any) -> Tuple[str, str]:
+    """Validate an extraction request and return (content, file_name)."""
+    if not isinstance(payload, dict) or not isinstance(payload.get("content"), str):
+        raise HTTPError(400, "Expected {\"content\": \"...\", \"file_name\": \"...\"}")
+    return payload["content"], str(payload.get("file_name") or "document.txt")
+
+
+async def read_request(reader: asyncio.StreamReader):
+    """Read one HTTP request, returning None when the client closed the connection."""
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+
+    try:
+        method, target, _ = request_line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise HTTPError(400, "Malformed request line")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        length = -1
+    if length < 0:
+        raise HTTPError(400, "Invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413, f"Body exceeds {MAX_BODY_BYTES} bytes")
+    body = await reader.readexactly(length) if length else b""
+
+    return method.upper(), target.split("?", 1)[0], headers, body
+
+
+async def send_chunk(writer: asyncio.StreamWriter, payload: Any):
+    """Write one NDJSON line as an HTTP chunk."""
+    line = json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n"
+    writer.write(b"%x\r\n%s\r\n" % (len(line), line))
+    await writer.drain()
+
+
+async def send_json(writer: asyncio.StreamWriter, status: int, payload: Any,
+                    extra_headers: Optional[Dict[str, str]] = None):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    headers = {"Content-Type": "application/json", "Content-Length": str(len(body))}
+    headers.update(extra_headers or {})
+
+    head = f"HTTP/1.1 {status} {REASONS.get(status, 'Unknown')}\r\n"
+    head += "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+    writer.write(head.encode("latin-1") + b"\r\n" + body)
+    await writer.drain()
+
+
+async def serve(wrangler, host: str = "127.0.0.1", port: int = 8080,
+                max_concurrency: int = 8, max_queue: int = 64):
+    """Run the analysis service until cancelled."""
+    service = AnalysisService(wrangler, max_concurrency=max_concurrency, max_queue=max_queue)
+    service.pool = ModelCallPool(max_concurrency=max_concurrency, max_queue=max_queue)
+
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    logger.info(f"🌐 Serving extract_key_facts on http://{host}:{port} "
+                f"(concurrency={max_concurrency}, queue={max_queue})")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.pool.shutdown()
+
+
+async def load_test(host: str = "127.0.0.1", port: int = 8080, total: int = 500,
+                    concurrency: int = 50, duplicate_ratio: float = 0.5,
+                    content_bytes: int = 2000) -> Dict[str, Any]:
+    """Fire `total` extraction requests at a running service and measure throughput.
+
+    A `duplicate_ratio` share of requests reuses a small set of documents so
+    request coalescing can be observed.
+    """
+    filler = "The quarterly review covered 12 projects across Engineering and Sales. "
+    base = (filler * (content_bytes // len(filler) + 1))[:content_bytes]
+    hot_documents = max(1, concurrency // 10)
+
+    def document(i: int) -> bytes:
+        if (i * 7919 % 1000) / 1000 < duplicate_ratio:
+            key = f"hot-{i % hot_documents}"
+        else:
+            key = f"doc-{i}"
+        return json.dumps({"content": f"{key}: {base}", "file_name": f"{key}.txt"}).encode("utf-8")
+
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    counter = iter(range(total))
+
+    async def worker():
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            for i in counter:
+                body = document(i)
+                started = time.perf_counter()
+                writer.write(
+                    f"POST /v1/extract HTTP/1.1\r\nHost: {host}\r\n"
+                    f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+                    .encode("latin-1") + body
+                )
+                await writer.drain()
+
+                status_line = await reader.readline()
+                status = int(status_line.split()[1])
+                length = 0
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b""):
+                        break
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":", 1)[1])
+                await reader.readexactly(length)
+
+                latencies.append(time.perf_counter() - started)
+                statuses[status] = statuses.get(status, 0) + 1
+        finally:
+            writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, total))))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "duplicate_ratio": duplicate_ratio,
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_s": round(total / elapsed, 1) if elapsed else None,
+        "statuses": statuses,
+        **{
+            f"p{pct}_ms": round(percentile(latencies, pct) * 1000, 2)
+            for pct in (50, 95, 99) if latencies
+        },
+    }
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Stand-in model for offline runs.
+
+`StandInModel` mimics the parts of `genai.GenerativeModel` the wrangler
+uses (`generate_content` returning an object with `.text` and
+`.usage_metadata`). It builds a plausible analysis from the document text
+with simple heuristics (in the compact schema when given its instructions)
+and sleeps for a configurable latency that grows with prompt and reply
+size, so servers, schedulers and benchmarks can be exercised locally
+without an API key or network access.
+"""
+
+import re
+import json
+import time
+import random
+import hashlib
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Optional
+
+from routing import estimate_tokens
+from compact import COMPACT_INSTRUCTIONS, compress
+
+
+class StandInUsage:
+    """Token counts in the shape of the SDK's usage metadata."""
+
+    def __init__(self, prompt_tokens: int, output_tokens: int):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+        self.total_token_count = prompt_tokens + output_tokens
+
+
+class StandInCandidate:
+    """Candidate with the finish reason the stream reader checks."""
+
+    def __init__(self, finish_reason: Optional[str]):
+        self.finish_reason = finish_reason
+
+
+class StandInResponse:
+    """Response object with the attributes the wrangler reads."""
+
+    def __init__(self, text: str, usage: StandInUsage, finish_reason: Optional[str] = "STOP"):
+        self.text = text
+        self.usage_metadata = usage
+        # Streamed chunks carry a finish reason only on the last one, as in the SDK
+        self.candidates = [StandInCandidate(finish_reason)]
+
+
+class StandInModel:
+    """Deterministic local replacement for `genai.GenerativeModel`."""
+
+    def __init__(self, model_name: str = "stand-in", base_latency: float = 0.05,
+                 seconds_per_1k_tokens: float = 0.02, jitter: float = 0.1,
+                 seconds_per_1k_output_tokens: float = 0.25, **kwargs):
+        self.model_name = model_name
+        self.base_latency = base_latency
+        self.seconds_per_1k_tokens = seconds_per_1k_tokens
+        self.seconds_per_1k_output_tokens = seconds_per_1k_output_tokens
+        self.jitter = jitter
+        self.calls = 0
+        # Answer in the compact schema when given its instructions
+        self.compact = kwargs.get("system_instruction") == COMPACT_INSTRUCTIONS
+
+    def latency_for(self, prompt: str, output_tokens: int = 0) -> float:
+        """Simulated latency for a prompt and reply, jittered deterministically by content."""
+        seed = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8], 16)
+        noise = random.Random(seed).uniform(-self.jitter, self.jitter)
+        latency = (self.base_latency + estimate_tokens(prompt) / 1000 * self.seconds_per_1k_tokens
+                   + output_tokens / 1000 * self.seconds_per_1k_output_tokens)
+        return max(0.0, latency * (1 + noise))
+
+    def analyze(self, text: str) -> Dict[str, Any]:
+        """Build an analysis dictionary from plain text."""
+        sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+", text) if s.strip()]
+        words = re.findall(r"[A-Za-z][A-Za-z\-]{5,}", text)
+        capitalized = re.findall(r"\b[A-Z][a-z]+(?: [A-Z][a-z]+)+\b", text)
+
+        return {
+            "summary": " ".join(sentences[:2])[:300],
+            "key_facts": [s[:200] for s in sentences if re.search(r"\d", s)][:5] or sentences[:3],
+            "topics": [w.lower() for w, _ in Counter(w.lower() for w in words).most_common(5)],
+            "entities": {
+                "people": _unique(capitalized)[:5],
+                "organizations": [],
+                "locations": []
+            },
+            "sentiment": "neutral"
+        }
+
+    def generate_content(self, prompt, stream: bool = False, **kwargs):
+        """Return a JSON analysis of the prompt after a simulated delay.
+
+        With `stream=True`, return an iterator of chunks spread over that delay.
+        """
+        prompt = prompt if isinstance(prompt, str) else str(prompt)
+        self.calls += 1
+
+        analysis = self.analyze(document_text(prompt))
+        text = json.dumps(compress(analysis) if self.compact else analysis, ensure_ascii=False)
+        usage = StandInUsage(estimate_tokens(prompt), estimate_tokens(text))
+        latency = self.latency_for(prompt, usage.candidates_token_count)
+        if stream:
+            return stream_chunks(text, usage, latency)
+        time.sleep(latency)
+        return StandInResponse(text, usage)
+
+    def count_tokens(self, contents):
+        """Mirror `GenerativeModel.count_tokens` with the local estimate."""
+        class _Count:
+            total_tokens = estimate_tokens(contents if isinstance(contents, str) else str(contents))
+        return _Count()
+
+
+def stream_chunks(text: str, usage: StandInUsage, latency: float,
+                  chunk_size: int = 64) -> Iterator[StandInResponse]:
+    """Yield `text` in chunks, spreading `latency` evenly across them."""
+    pieces = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)] or [""]
+    for i, piece in enumerate(pieces):
+        time.sleep(latency / len(pieces))
+        yield StandInResponse(piece, usage, "STOP" if i == len(pieces) - 1 else None)
+
+
+def document_text(prompt: str) -> str:
+    """Pull the document body out of an extraction prompt."""
+    match = re.search(r"Content:\s*(.*)", prompt, re.DOTALL)
+    return match.group(1) if match else prompt
+
+
+def _unique(items: List[str]) -> List[str]:
+    seen = set()
+    return [item for item in items if not (item in seen or seen.add(item))]
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Small latency statistics helpers shared by the long-running modes.
+"""
+
+import math
+import threading
+from collections import deque
+from typing import Dict, Iterable, Optional
+
+
+def percentile(values: Iterable[float], pct: float) -> Optional[float]:
+    """Return the `pct` percentile (0-100) of `values` using nearest rank."""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class LatencyTracker:
+    """Thread-safe rolling window of latency samples."""
+
+    def __init__(self, window: int = 1000):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+
+    def percentile(self, pct: float) -> Optional[float]:
+        with self._lock:
+            samples = list(self._samples)
+        return percentile(samples, pct)
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        """Sample count plus p50/p95/p99 in milliseconds."""
+        with self._lock:
+            samples = list(self._samples)
+        return {
+            "count": self.count,
+            **{
+                f"p{pct}_ms": round(value * 1000, 2) if value is not None else None
+                for pct in (50, 95, 99)
+                for value in [percentile(samples, pct)]
+            }
+        }
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Streaming consumption of extraction responses.
+
+`IncrementalJSONParser` is fed response text chunk by chunk and reports each
+top-level field of the analysis object (`summary`, `key_facts`, ...) as soon
+as its value is complete, so callers can act on the summary while the model
+is still generating the entities. `consume_stream` drives a
+`generate_content(stream=True)` response through the parser and stops
+reading once the expected schema has arrived, so trailing chatter (closing
+fences, explanations) is never generated into the output token count.
+"""
+
+import json
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+EXPECTED_FIELDS = ("summary", "key_facts", "topics", "entities", "sentiment")
+
+
+class IncrementalJSONParser:
+    """Emit the top-level fields of a JSON object as each one completes.
+
+    Text before the opening brace (such as a ```json fence) is skipped.
+    """
+
+    def __init__(self):
+        self.fields: Dict[str, Any] = {}
+        self.complete = False
+        self._buffer = ""
+        self._pos = 0
+        self._start: Optional[int] = None
+        self._end: Optional[int] = None
+        self._field_start = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Add a chunk of text and return the fields completed by it."""
+        if self.complete or not chunk:
+            return []
+        self._buffer += chunk
+        completed = []
+        buffer = self._buffer
+
+        for i in range(self._pos, len(buffer)):
+            char = buffer[i]
+            if self._start is None:
+                if char == "{":
+                    self._start, self._depth, self._field_start = i, 1, i + 1
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    completed.extend(self._field(buffer[self._field_start:i]))
+                    self.complete = True
+                    self._end = i + 1
+                    break
+            elif char == "," and self._depth == 1:
+                completed.extend(self._field(buffer[self._field_start:i]))
+                self._field_start = i + 1
+
+        self._pos = len(buffer)
+        return completed
+
+    def _field(self, segment: str) -> List[Tuple[str, Any]]:
+        if not segment.strip():
+            return []
+        try:
+            field = json.loads("{" + segment + "}")
+        except json.JSONDecodeError:
+            return []
+        self.fields.update(field)
+        return list(field.items())
+
+    @property
+    def object_text(self) -> Optional[str]:
+        """The complete JSON object, without any surrounding text."""
+        if not self.complete:
+            return None
+        return self._buffer[self._start:self._end]
+
+
+class StreamedResponse:
+    """Collected text and usage of a streamed response, shaped like an SDK response."""
+
+    def __init__(self, text: str, usage_metadata: Any, first_field_s: Optional[float],
+                 stopped_early: bool):
+        self.text = text
+        self.usage_metadata = usage_metadata
+        self.first_field_s = first_field_s
+        self.stopped_early = stopped_early
+
+
+def chunk_text(chunk) -> str:
+    """Text of one streamed chunk; chunks without parts (e.g. the final one) have none."""
+    try:
+        return chunk.text or ""
+    except ValueError:
+        return ""
+
+
+def chunk_finished(chunk) -> bool:
+    """Whether a chunk is the last of its stream (a candidate carries a finish reason)."""
+    return any(getattr(candidate, "finish_reason", None)
+               for candidate in getattr(chunk, "candidates", None) or [])
+
+
+def consume_stream(chunks: Iterable, on_field: Optional[Callable[[str, Any], None]] = None,
+                   expected_fields: Tuple[str, ...] = EXPECTED_FIELDS) -> StreamedResponse:
+    """Read a streamed response, reporting fields as they complete.
+
+    Reading stops as soon as the JSON object closes or every expected field
+    has arrived. The returned text is then just the analysis object.
+    `stopped_early` is set only when that happens before the final chunk.
+    """
+    started = time.perf_counter()
+    parser = IncrementalJSONParser()
+    received = []
+    usage = None
+    first_field_s = None
+    stopped = stopped_early = False
+
+    iterator = iter(chunks)
+    try:
+        for chunk in iterator:
+            usage = getattr(chunk, "usage_metadata", None) or usage
+            text = chunk_text(chunk)
+            received.append(text)
+
+            for key, value in parser.feed(text):
+                if first_field_s is None:
+                    first_field_s = time.perf_counter() - started
+                if on_field is not None:
+                    on_field(key, value)
+
+            if parser.complete or all(field in parser.fields for field in expected_fields):
+                stopped = True
+                stopped_early = not chunk_finished(chunk)
+                break
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            close()
+
+    if parser.complete:
+        text = parser.object_text
+    elif stopped:
+        text = json.dumps(parser.fields, ensure_ascii=False)
+    else:
+        text = "".join(received)
+    return StreamedResponse(text, usage, first_field_s, stopped_early)
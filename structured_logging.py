@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Structured logging for high-throughput runs.
+
+Rich console output stays the default for interactive use. With
+`WRANGLER_LOG_FORMAT=json` (or `--log-format json`), `configure_logging`
+replaces it with JSON lines:
+
+- worker threads only put records on a queue (`QueueHandler`); a
+  `QueueListener` thread formats them and writes them to stderr or
+  `WRANGLER_LOG_FILE`, so formatting and I/O stay off the model-call path
+- every record carries correlation fields: the run ID, the file being
+  processed and the attempt number, bound with `log_context`
+- with `WRANGLER_LOG_SAMPLE` below 1, routine (INFO and DEBUG) messages are
+  kept for that share of files. A file is either kept or dropped as a whole,
+  so its log lines stay together. Warnings, errors and messages outside a
+  file are always kept.
+"""
+
+import os
+import sys
+import json
+import uuid
+import queue
+import atexit
+import hashlib
+import logging
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Iterator, Optional
+
+LOG_FORMATS = ("rich", "json")
+CORRELATION_FIELDS = ("run_id", "file", "attempt")
+
+RUN_ID = uuid.uuid4().hex[:12]
+
+_context: contextvars.ContextVar[Dict[str, Any]] = contextvars.ContextVar("log_context", default={})
+
+
+@contextmanager
+def log_context(**fields) -> Iterator[None]:
+    """Attach correlation fields to every record logged inside the block (on this thread)."""
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """Copy the correlation fields onto each record, on the thread that logged it."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.run_id = RUN_ID
+        record.__dict__.update(_context.get())
+        return True
+
+
+class FileSampler(logging.Filter):
+    """Keep routine messages for a stable `rate` share of files."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+        self.dropped = 0
+        self._decisions: Dict[str, bool] = {}
+
+    def keep_file(self, file_name: str) -> bool:
+        keep = self._decisions.get(file_name)
+        if keep is None:
+            if len(self._decisions) > 10_000:
+                self._decisions.clear()
+            digest = hashlib.blake2b(f"{RUN_ID}:{file_name}".encode("utf-8"), digest_size=8).digest()
+            keep = self._decisions[file_name] = int.from_bytes(digest, "big") / 2 ** 64 < self.rate
+        return keep
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        file_name = getattr(record, "file", None)
+        if record.levelno >= logging.WARNING or file_name is None or self.keep_file(file_name):
+            return True
+        self.dropped += 1
+        return False
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        for key in CORRELATION_FIELDS:
+            value = getattr(record, key, None)
+            if value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _QueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the message and traceback text here; the listener only serializes
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        return record
+
+
+def configure_logging(log_format: Optional[str] = None, sample_rate: Optional[float] = None,
+                      level: int = logging.INFO) -> Optional[QueueListener]:
+    """Switch the root logger to queued JSON lines when requested.
+
+    Returns the running listener, or None when rich console output is kept.
+    The listener is stopped (and the queue drained) at exit.
+    """
+    log_format = log_format or os.getenv("WRANGLER_LOG_FORMAT", "rich")
+    if log_format not in LOG_FORMATS:
+        raise ValueError(f"Unknown log format {log_format!r}, expected one of {LOG_FORMATS}")
+    if log_format == "rich":
+        return None
+
+    if sample_rate is None:
+        sample_rate = float(os.getenv("WRANGLER_LOG_SAMPLE", "1"))
+    log_file = os.getenv("WRANGLER_LOG_FILE")
+    output = logging.FileHandler(log_file, encoding="utf-8") if log_file else logging.StreamHandler(sys.stderr)
+    output.setFormatter(JSONFormatter())
+
+    records: queue.Queue = queue.Queue(-1)
+    handler = _QueueHandler(records)
+    handler.addFilter(ContextFilter())
+    if sample_rate < 1:
+        handler.addFilter(FileSampler(sample_rate))
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    listener = QueueListener(records, output, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
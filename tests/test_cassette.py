@@ -0,0 +1,46 @@
+"""Tests for cassette request hashing and record/replay."""
+
+import pytest
+
+from cassette import Cassette, CassetteMiss, recording_factory, replay_factory, request_hash
+from stand_in import StandInModel
+
+
+def test_request_hash_is_stable_and_order_independent():
+    first = request_hash("m", "instructions", "prompt", {"temperature": 0, "max_output_tokens": 10})
+    second = request_hash("m", "instructions", "prompt", {"max_output_tokens": 10, "temperature": 0})
+    assert first == second
+    assert len(first) == 64
+
+
+@pytest.mark.parametrize("changed", [
+    ("other-model", "instructions", "prompt", None),
+    ("m", "other instructions", "prompt", None),
+    ("m", None, "prompt", None),
+    ("m", "instructions", "prompt!", None),
+    ("m", "instructions", "prompt", {"max_output_tokens": 10}),
+])
+def test_request_hash_covers_everything_that_shapes_a_reply(changed):
+    assert request_hash(*changed) != request_hash("m", "instructions", "prompt", None)
+
+
+def test_recorded_replies_replay_offline(tmp_path):
+    path = tmp_path / "cassette.jsonl"
+    record = recording_factory(StandInModel, Cassette(path))("stand-in", system_instruction="Summarize")
+    recorded = record.generate_content("Document: a.md\nContent:\nHello there.").text
+
+    replay = replay_factory(Cassette(path))("stand-in", system_instruction="Summarize")
+    assert replay.generate_content("Document: a.md\nContent:\nHello there.").text == recorded
+    streamed = "".join(chunk.text for chunk in
+                       replay.generate_content("Document: a.md\nContent:\nHello there.", stream=True))
+    assert streamed == recorded
+
+    with pytest.raises(CassetteMiss):
+        replay.generate_content("Document: b.md\nContent:\nSomething else.")
+
+
+def test_repeated_recordings_replay_in_turn(tmp_path):
+    cassette = Cassette(tmp_path / "cassette.jsonl")
+    for text in ("first", "second"):
+        cassette.append({"hash": "k", "response": {"text": text}})
+    assert [cassette.lookup("k")["response"]["text"] for _ in range(3)] == ["first", "second", "first"]
@@ -0,0 +1,64 @@
+"""Tests for the compact response schema."""
+
+import pytest
+
+import compact
+
+FULL = {
+    "summary": "Quarterly results improved.",
+    "key_facts": ["Revenue rose 12%", "Costs fell", "Hiring paused"],
+    "topics": ["finance", "hiring"],
+    "entities": {"people": ["Ada Lovelace"], "organizations": ["Acme"], "locations": []},
+    "sentiment": "positive",
+}
+
+
+def test_compress_then_expand_round_trips():
+    packed = compact.compress(FULL)
+    assert set(packed) == {"s", "f", "t", "e", "m"}
+    assert packed["e"] == {"p": ["Ada Lovelace"], "o": ["Acme"]}
+    assert compact.expand(packed) == FULL
+
+
+def test_compress_applies_the_item_caps():
+    long = {**FULL, "key_facts": [f"fact {i}" for i in range(20)], "topics": [f"t{i}" for i in range(20)]}
+    packed = compact.compress(long)
+    assert len(packed["f"]) == compact.LIMITS["key_facts"]
+    assert len(packed["t"]) == compact.LIMITS["topics"]
+
+
+def test_expand_fills_missing_fields():
+    assert compact.expand({"s": "only a summary"}) == {
+        "summary": "only a summary",
+        "key_facts": [],
+        "topics": [],
+        "entities": {"people": [], "organizations": [], "locations": []},
+        "sentiment": "neutral",
+    }
+
+
+@pytest.mark.parametrize("reply", [FULL, {"key_facts": ["a"], "topics": ["b"]}])
+def test_full_schema_replies_pass_through(reply):
+    assert compact.expand(reply) is reply
+
+
+@pytest.mark.parametrize("reply, expected", [
+    ({"s": "x", "f": []}, True),
+    ({"key_facts": ["a"]}, False),
+    ({"s": "x", "summary": "x"}, False),
+    ({}, False),
+])
+def test_is_compact(reply, expected):
+    assert compact.is_compact(reply) is expected
+
+
+def test_expand_field_maps_short_keys_and_sentiment():
+    assert compact.expand_field("m", "-") == ("sentiment", "negative")
+    assert compact.expand_field("e", {"l": ["Paris"]}) == (
+        "entities", {"people": [], "organizations": [], "locations": ["Paris"]})
+    assert compact.expand_field("unknown", 1) == ("unknown", 1)
+
+
+def test_output_budget_covers_a_full_compact_reply():
+    assert compact.generation_config()["max_output_tokens"] == compact.output_token_budget()
+    assert compact.output_token_budget() > compact._SUMMARY_TOKENS
@@ -0,0 +1,125 @@
+"""Tests for rate limiting, 429 detection and cooldowns in the credential pool."""
+
+import time
+
+import pytest
+
+import credentials
+from credentials import (Credential, CredentialPool, NoUsableCredentials, RateLimiter,
+                         is_rate_limited, retry_after)
+
+
+class ResourceExhausted(Exception):
+    pass
+
+
+class HTTPStatusError(Exception):
+    def __init__(self, message, code=None, headers=None):
+        super().__init__(message)
+        self.code = code
+        self.response = type("Response", (), {"headers": headers or {}})()
+
+
+def test_token_bucket_allows_a_burst_then_refills():
+    limiter = RateLimiter(rpm=2)
+    now = limiter._updated
+    for _ in range(2):
+        assert limiter.wait_time(now) == 0
+        limiter.take(now)
+    assert limiter.wait_time(now) == pytest.approx(30)
+    assert limiter.wait_time(now + 30) == pytest.approx(0)
+
+
+def test_unlimited_bucket_never_waits():
+    limiter = RateLimiter()
+    limiter.take(time.monotonic())
+    assert limiter.wait_time(time.monotonic()) == 0
+
+
+@pytest.mark.parametrize("error, limited", [
+    (HTTPStatusError("Too many requests", code=429), True),
+    (ResourceExhausted("quota"), True),
+    (ValueError("429 Quota exceeded for requests per minute"), True),
+    (ValueError("Resource has been exhausted: 429 rate limit"), True),
+    (ValueError("could not read data/report_429.txt"), False),
+    (ValueError("document 4290 has no rate table"), False),
+    (HTTPStatusError("Bad request", code=400), False),
+])
+def test_is_rate_limited(error, limited):
+    assert is_rate_limited(error) is limited
+
+
+def test_retry_after_reads_the_header():
+    assert retry_after(HTTPStatusError("429", headers={"Retry-After": "7"})) == 7.0
+    assert retry_after(HTTPStatusError("429", headers={"Retry-After": "soon"})) is None
+    assert retry_after(ValueError("429")) is None
+
+
+def test_keys_in_one_project_share_a_limiter():
+    a, b, c = Credential("a", project="p", rpm=5), Credential("b", project="p"), Credential("c", rpm=5)
+    CredentialPool([a, b, c])
+    assert a.limiter is b.limiter
+    assert a.limiter is not c.limiter
+
+
+def test_least_loaded_key_is_leased():
+    pool = CredentialPool([Credential("a"), Credential("b")])
+    first = pool.acquire()
+    second = pool.acquire()
+    assert {first.name, second.name} == {pool.credentials[0].name, pool.credentials[1].name}
+    pool.release(first)
+    pool.release(second)
+    assert [credential.in_flight for credential in pool.credentials] == [0, 0]
+
+
+def test_rate_limited_key_cools_down_with_backoff():
+    pool = CredentialPool([Credential("a")])
+    key = pool.credentials[0]
+    for attempt in range(1, 6):
+        pool.release(pool.acquire(), ResourceExhausted("quota"))
+        expected = min(credentials.MAX_COOLDOWN_S, credentials.BASE_COOLDOWN_S * 2 ** (attempt - 1))
+        assert key.cooldown_until - time.monotonic() == pytest.approx(expected, abs=0.5)
+        assert key.state(time.monotonic()) == "cooling_down"
+        key.cooldown_until = 0.0
+    assert key.rate_limited == 5
+
+
+def test_retry_after_overrides_the_backoff():
+    pool = CredentialPool([Credential("a")])
+    with pytest.raises(HTTPStatusError):
+        with pool.lease():
+            raise HTTPStatusError("slow down", code=429, headers={"Retry-After": "42"})
+    remaining = pool.credentials[0].cooldown_until - time.monotonic()
+    assert remaining == pytest.approx(42, abs=0.5)
+
+
+def test_success_resets_the_backoff():
+    pool = CredentialPool([Credential("a")])
+    key = pool.credentials[0]
+    key.consecutive_rate_limits = 4
+    with pool.lease():
+        pass
+    assert key.consecutive_rate_limits == 0
+
+
+def test_cooling_key_is_skipped():
+    pool = CredentialPool([Credential("a"), Credential("b")])
+    pool.credentials[0].cooldown_until = time.monotonic() + 60
+    assert pool.acquire() is pool.credentials[1]
+
+
+def test_invalid_key_is_removed_from_rotation():
+    pool = CredentialPool([Credential("a"), Credential("b")])
+    bad = pool.credentials[0]
+    credential = pool.acquire()
+    assert credential is bad
+    pool.release(credential, ValueError("API key not valid. Please pass a valid API key."))
+    assert bad.disabled
+    assert pool.acquire() is pool.credentials[1]
+
+
+def test_pool_without_usable_keys_raises():
+    pool = CredentialPool([Credential("a")])
+    pool.credentials[0].disabled = True
+    with pytest.raises(NoUsableCredentials):
+        pool.acquire()
@@ -0,0 +1,56 @@
+"""Tests for evaluation scoring and Pareto-front selection."""
+
+import xml.dom.minidom
+
+import pytest
+
+from evaluation import (config_name, entity_counts, expand_matrix, fact_coverage, pareto_front,
+                        scatter_svg, topic_overlap)
+
+
+def row(name, quality, latency_ms, cost_usd, errors=0, tokens=100):
+    return {"name": name, "quality": quality, "latency_ms": latency_ms, "cost_usd": cost_usd,
+            "errors": errors, "tokens": tokens}
+
+
+def test_pareto_front_keeps_only_undominated_configs():
+    rows = [
+        row("best-quality", 0.9, 900, 0.010),
+        row("fastest", 0.6, 100, 0.002),
+        row("dominated", 0.6, 200, 0.003),
+        row("tie-on-all", 0.6, 100, 0.002),
+        row("failed", 1.0, 1, 0.0, errors=1),
+    ]
+    assert pareto_front(rows) == ["best-quality", "fastest", "tie-on-all"]
+
+
+def test_pareto_front_of_nothing_is_empty():
+    assert pareto_front([]) == []
+
+
+def test_expand_matrix_takes_the_product_and_names_configs():
+    configs = expand_matrix({"model": ["gemini-1.5-flash", "gemini-1.5-pro"], "stream": [False, True]})
+    assert [config["name"] for config in configs] == [
+        "1.5-flash", "1.5-flash+stream", "1.5-pro", "1.5-pro+stream"]
+    assert expand_matrix([{"name": "mine", "model": "x"}]) == [{"name": "mine", "model": "x"}]
+    assert config_name({"compact": True, "max_chars": 500}) == "default+compact+500c"
+
+
+def test_entity_counts_normalise_before_matching():
+    predicted = {"people": ["Ada Lovelace", "Charles"], "organizations": ["ACME."]}
+    gold = {"people": ["ada lovelace"], "organizations": ["Acme"], "locations": ["Paris"]}
+    assert entity_counts(predicted, gold) == (2, 3, 3)
+
+
+def test_topic_overlap_and_fact_coverage():
+    assert topic_overlap([], []) == 1.0
+    assert topic_overlap(["machine learning"], ["Machine Learning", "finance"]) == pytest.approx(0.5)
+    assert fact_coverage(["Revenue rose 12% in Q3"], ["Revenue rose 12%", "Costs fell"]) == 0.5
+    assert fact_coverage([], []) == 1.0
+
+
+def test_scatter_svg_escapes_config_names():
+    svg = scatter_svg([row('a<b & "c"', 0.5, 10, 0.1), row("plain", 0.7, 20, 0.2)])
+    document = xml.dom.minidom.parseString(svg)
+    labels = [node.firstChild.data for node in document.getElementsByTagName("text")]
+    assert 'a<b & "c"' in labels
@@ -0,0 +1,81 @@
+"""Tests for stratified sampling and the finite-population estimates."""
+
+import math
+from pathlib import Path
+
+import pytest
+
+from preview import Stratum, Z_95, _stratified_total, allocate, estimate, stratified_sample
+
+
+def stratum(n_files, sampled, prefix="f"):
+    s = Stratum((prefix,), ("type",))
+    s.files = [Path(f"{prefix}{i}") for i in range(n_files)]
+    s.sample = s.files[:sampled]
+    return s
+
+
+@pytest.mark.parametrize("counts, size", [
+    ({"a": 50, "b": 30, "c": 20}, 10),
+    ({"a": 97, "b": 2, "c": 1}, 5),
+    ({"a": 1, "b": 1, "c": 1}, 3),
+])
+def test_allocation_is_proportional_with_one_per_stratum(counts, size):
+    allocation = allocate(counts, size)
+    assert sum(allocation.values()) == size
+    assert all(1 <= allocation[key] <= counts[key] for key in counts)
+
+
+def test_allocation_takes_everything_when_the_sample_covers_the_corpus():
+    assert allocate({"a": 2, "b": 3}, 10) == {"a": 2, "b": 3}
+
+
+def test_total_includes_the_finite_population_correction():
+    s = stratum(10, 2)
+    result = _stratified_total([s], {s.files[0]: 1.0, s.files[1]: 3.0})
+    # N * mean = 20; variance N^2 (1 - n/N) s^2 / n = 100 * 0.8 * 2 / 2
+    margin = Z_95 * math.sqrt(80)
+    assert result["estimate"] == 20
+    assert result["ci"] == [round(20 - margin, 2), round(20 + margin, 2)]
+
+
+def test_a_census_has_no_sampling_error():
+    s = stratum(3, 3)
+    result = _stratified_total([s], {path: float(i) for i, path in enumerate(s.files)})
+    assert result == {"estimate": 3.0, "ci": [3.0, 3.0]}
+
+
+def test_single_draws_borrow_the_pooled_variance():
+    a, b = stratum(5, 1), stratum(5, 1, prefix="g")
+    result = _stratified_total([a, b], {a.sample[0]: 0.0, b.sample[0]: 2.0})
+    assert result["estimate"] == 10
+    assert result["ci"][0] < 10 < result["ci"][1]
+
+
+def test_sample_is_stratified_and_repeatable(tmp_path):
+    files = []
+    for i in range(12):
+        path = tmp_path / f"doc{i}{'.md' if i % 3 else '.json'}"
+        path.write_bytes(b"x" * (100 if i % 2 else 10_000))
+        files.append(path)
+    strata = stratified_sample(files, size=6, seed=1)
+    assert sum(len(s.sample) for s in strata) == 6
+    assert all(s.sample for s in strata)
+    assert strata[0].fields == ("type", "size")
+    again = stratified_sample(files, size=6, seed=1)
+    assert [s.sample for s in strata] == [s.sample for s in again]
+
+
+def test_estimate_projects_frequencies_and_totals():
+    s = stratum(4, 2)
+    results = {
+        s.sample[0]: {"key_facts": ["a", "b"], "entities": {"people": ["Ada"]},
+                      "provenance": {"model_used": "local"}},
+        s.sample[1]: {"key_facts": [], "entities": {}, "provenance": {"model_used": "local"}},
+    }
+    report = estimate([s], results, {"f0": ["finance"]})
+    assert report["population_files"] == 4 and report["sampled_files"] == 2
+    assert report["projected_totals"]["facts"]["estimate"] == 4
+    [finance] = report["topic_frequencies"]
+    assert (finance["name"], finance["share"], finance["projected_files"]) == ("finance", 0.5, 2)
+    assert report["entity_frequencies"]["people"][0]["name"] == "Ada"
@@ -0,0 +1,56 @@
+"""Tests for summary aggregation and offline report rebuilds."""
+
+import json
+
+import pytest
+
+from reporting import MAX_FACTS, SummaryAccumulator, accumulate_directory
+
+
+def analysis(name, facts=("fact",), **overrides):
+    return {"provenance": {"source_file": name, "model_used": "m"}, "summary": f"about {name}",
+            "key_facts": list(facts), "topics": ["t"], "entities": {"people": [name]}, **overrides}
+
+
+@pytest.mark.parametrize("bad", [
+    analysis("x", entities="oops"),
+    analysis("x", entities={"people": [{"name": "Ada"}]}),
+    analysis("x", key_facts="not a list"),
+    {"summary": "no provenance"},
+])
+def test_malformed_analysis_leaves_the_accumulator_untouched(bad):
+    accumulator = SummaryAccumulator()
+    with pytest.raises((KeyError, TypeError)):
+        accumulator.add(bad)
+    assert (accumulator.files, accumulator.total_facts, accumulator.facts) == (0, 0, [])
+    assert accumulator.file_summaries == [] and not accumulator.model_usage
+
+
+def test_merge_matches_adding_in_order():
+    analyses = [analysis(f"f{i}", facts=[f"fact {i}.{j}" for j in range(7)]) for i in range(6)]
+    whole = SummaryAccumulator()
+    for item in analyses:
+        whole.add(item)
+    left, right = SummaryAccumulator(), SummaryAccumulator()
+    for item in analyses[:2]:
+        left.add(item)
+    for item in analyses[2:]:
+        right.add(item)
+    merged = left.merge(right)
+    assert merged.facts == whole.facts and len(merged.facts) == MAX_FACTS
+    assert merged.entities == whole.entities
+    assert merged.file_summaries == whole.file_summaries
+    assert merged.total_facts == 42 and merged.model_usage == {"m": 6}
+
+
+def test_rebuild_skips_unreadable_analyses(tmp_path):
+    for i in range(5):
+        (tmp_path / f"f{i}_analysis.json").write_text(json.dumps(analysis(f"f{i}")))
+    (tmp_path / "broken_analysis.json").write_text("{not json")
+    (tmp_path / "odd_analysis.json").write_text(json.dumps(analysis("odd", entities=["Ada"])))
+    (tmp_path / "summary_report.json").write_text("{}")
+
+    accumulator, skipped, seen = accumulate_directory(tmp_path, workers=2, chunk_size=2)
+    assert seen == 7 and accumulator.files == 5 and accumulator.total_facts == 5
+    assert sorted(entry["file"].rsplit("/", 1)[-1] for entry in skipped) == [
+        "broken_analysis.json", "odd_analysis.json"]
@@ -0,0 +1,60 @@
+"""Tests for size-aware scheduling and the learned cost model."""
+
+import pytest
+
+from scheduler import DEFAULT_BASE_SECONDS, DEFAULT_SECONDS_PER_KB, CostEstimator, schedule
+
+
+@pytest.fixture
+def files(tmp_path):
+    paths = []
+    for name, kb in (("small.md", 1), ("large.md", 64), ("medium.txt", 8), ("tiny.json", 0)):
+        path = tmp_path / name
+        path.write_bytes(b"x" * kb * 1024)
+        paths.append(path)
+    return paths
+
+
+def names(jobs):
+    return [job.path.name for job in jobs]
+
+
+def test_lpt_dispatches_the_longest_first(files):
+    assert names(schedule(files, CostEstimator(), "lpt")) == ["large.md", "medium.txt", "small.md", "tiny.json"]
+
+
+def test_spt_dispatches_the_shortest_first(files):
+    assert names(schedule(files, CostEstimator(), "spt")) == ["tiny.json", "small.md", "medium.txt", "large.md"]
+
+
+def test_fifo_keeps_discovery_order(files):
+    assert names(schedule(files, CostEstimator(), "fifo")) == [path.name for path in files]
+
+
+def test_priority_then_deadline_come_before_cost(files):
+    hints = {"tiny.*": {"priority": 1}, "small.md": {"deadline_s": 5}}
+    assert names(schedule(files, CostEstimator(), "lpt", hints))[:3] == ["tiny.json", "small.md", "large.md"]
+
+
+def test_unknown_policy_is_rejected(files):
+    with pytest.raises(ValueError):
+        schedule(files, CostEstimator(), "random")
+
+
+def test_estimator_starts_from_the_defaults(tmp_path):
+    estimator = CostEstimator()
+    assert estimator.coefficients(".md") == (DEFAULT_BASE_SECONDS, DEFAULT_SECONDS_PER_KB)
+    assert estimator.mean_absolute_error() is None
+
+
+def test_estimator_fits_observed_times_per_extension(tmp_path):
+    estimator = CostEstimator(tmp_path / "cost_model.json")
+    path = tmp_path / "doc.md"
+    for kb in (1, 2, 4, 8):
+        estimator.observe(path, kb * 1024, 0.5 + 0.25 * kb, estimated=1.0)
+    base, per_kb = estimator.coefficients(".MD")
+    assert (base, per_kb) == (pytest.approx(0.5), pytest.approx(0.25))
+    assert estimator.estimate(path, 16 * 1024) == pytest.approx(4.5)
+
+    estimator.save()
+    assert CostEstimator(tmp_path / "cost_model.json").coefficients(".md") == (base, per_kb)
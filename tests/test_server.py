@@ -0,0 +1,40 @@
+"""Tests for HTTP request parsing in the analysis service."""
+
+import asyncio
+
+import pytest
+
+from server import HTTPError, read_request
+
+
+def parse(raw: bytes):
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(raw)
+        reader.feed_eof()
+        return await read_request(reader)
+    return asyncio.run(run())
+
+
+def test_reads_method_path_headers_and_body():
+    method, path, headers, body = parse(
+        b"post /v1/extract?x=1 HTTP/1.1\r\nContent-Length: 2\r\nHost: a\r\n\r\n{}")
+    assert (method, path, body) == ("POST", "/v1/extract", b"{}")
+    assert headers["host"] == "a"
+
+
+def test_closed_connection_is_none():
+    assert parse(b"") is None
+
+
+@pytest.mark.parametrize("length", [b"abc", b"-5"])
+def test_invalid_content_length_is_a_400(length):
+    with pytest.raises(HTTPError) as raised:
+        parse(b"POST /v1/extract HTTP/1.1\r\nContent-Length: " + length + b"\r\n\r\n")
+    assert raised.value.status == 400
+
+
+def test_oversized_body_is_a_413():
+    with pytest.raises(HTTPError) as raised:
+        parse(b"POST /v1/extract HTTP/1.1\r\nContent-Length: 999999999\r\n\r\n")
+    assert raised.value.status == 413
@@ -0,0 +1,32 @@
+"""Tests for the latency statistics helpers."""
+
+import pytest
+
+from stats import LatencyTracker, percentile
+
+
+def test_percentile_uses_nearest_rank():
+    values = [5, 1, 4, 2, 3]
+    assert percentile(values, 50) == 3
+    assert percentile(values, 95) == 5
+    assert percentile(values, 0) == 1
+    assert percentile(values, 100) == 5
+
+
+def test_percentile_of_nothing_is_none():
+    assert percentile([], 50) is None
+
+
+def test_tracker_keeps_a_rolling_window_but_counts_everything():
+    tracker = LatencyTracker(window=3)
+    for seconds in (10.0, 0.1, 0.2, 0.3):
+        tracker.record(seconds)
+    assert tracker.count == 4
+    assert tracker.percentile(100) == pytest.approx(0.3)
+
+
+def test_summary_reports_milliseconds():
+    tracker = LatencyTracker()
+    assert tracker.summary() == {"count": 0, "p50_ms": None, "p95_ms": None, "p99_ms": None}
+    tracker.record(0.25)
+    assert tracker.summary()["p50_ms"] == 250.0
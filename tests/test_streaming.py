@@ -0,0 +1,74 @@
+"""Tests for incremental JSON parsing and stream consumption."""
+
+import json
+
+import pytest
+
+from stand_in import StandInUsage, stream_chunks
+from streaming import EXPECTED_FIELDS, IncrementalJSONParser, consume_stream
+
+ANALYSIS = {
+    "summary": "A {braced}, \"quoted\" summary, with commas",
+    "key_facts": ["one, two", "three]"],
+    "topics": ["a"],
+    "entities": {"people": ["Ada"], "organizations": [], "locations": []},
+    "sentiment": "neutral",
+}
+TEXT = json.dumps(ANALYSIS)
+
+
+def feed_in_pieces(parser, text, size):
+    completed = []
+    for start in range(0, len(text), size):
+        completed.extend(parser.feed(text[start:start + size]))
+    return completed
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, len(TEXT)])
+def test_fields_complete_in_order_whatever_the_chunking(size):
+    parser = IncrementalJSONParser()
+    completed = feed_in_pieces(parser, "```json\n" + TEXT + "\n```", size)
+    assert completed == list(ANALYSIS.items())
+    assert parser.complete
+    assert json.loads(parser.object_text) == ANALYSIS
+
+
+def test_field_is_reported_when_the_next_one_starts():
+    parser = IncrementalJSONParser()
+    assert parser.feed('{"summary": "s"') == []
+    assert parser.feed(', "topics": [') == [("summary", "s")]
+    assert not parser.complete
+    assert parser.object_text is None
+
+
+def test_nothing_is_parsed_after_the_object_closes():
+    parser = IncrementalJSONParser()
+    parser.feed('{"summary": "s"} {"summary": "other"}')
+    assert parser.fields == {"summary": "s"}
+    assert parser.feed('{"topics": []}') == []
+
+
+def stream(text, chunk_size=16):
+    return stream_chunks(text, StandInUsage(1, 1), 0, chunk_size=chunk_size)
+
+
+def test_stream_ending_with_the_object_is_not_an_early_stop():
+    seen = []
+    response = consume_stream(stream(TEXT), lambda key, value: seen.append(key))
+    assert not response.stopped_early
+    assert seen == list(EXPECTED_FIELDS)
+    assert json.loads(response.text) == ANALYSIS
+    assert response.first_field_s is not None
+
+
+def test_trailing_commentary_is_not_read():
+    response = consume_stream(stream(TEXT + "\n```\n" + "Commentary. " * 20))
+    assert response.stopped_early
+    assert json.loads(response.text) == ANALYSIS
+
+
+def test_reading_stops_once_the_expected_fields_arrive():
+    text = TEXT[:-1] + ', "extra": [' + '"x", ' * 50
+    response = consume_stream(stream(text), expected_fields=("summary", "sentiment"))
+    assert response.stopped_early
+    assert json.loads(response.text)["summary"] == ANALYSIS["summary"]
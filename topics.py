@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Corpus-level topic clustering.
+
+Per-file topics are free-form, so a large corpus collects many spellings of
+the same idea ("AI", "A.I.", "artificial intelligence", "Neural networks",
+"neural network"). `TopicClusterer` groups them into canonical topics
+locally:
+
+- topics are normalized (case, punctuation) and counted, so repeated
+  strings are embedded once. A short topic spelling out the initials of a
+  longer one ("ai", "llm") is folded into that longer topic.
+- each distinct topic is embedded as a TF-IDF vector of hashed character
+  trigrams. The trigrams are computed with NumPy over one byte buffer and
+  stored in a SciPy sparse matrix, so there is no Python loop per n-gram.
+- topics are clustered by thresholded leader clustering, most frequent
+  first. A topic joins the canonical topic it is most similar to (cosine at
+  least `threshold`); otherwise it starts a new canonical topic. Batches
+  are compared with sparse matrix products.
+
+The canonical topics and IDF weights are saved to
+`demo/topic_clusters.npz`. Later runs assign new topics to the existing
+canonical topics and only add new ones when nothing is close, so labels
+stay stable as the corpus grows.
+"""
+
+import re
+import logging
+from pathlib import Path
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+
+logger = logging.getLogger("gemini-demo")
+
+HASH_DIM = 2 ** 18
+DEFAULT_THRESHOLD = 0.65
+BATCH_SIZE = 2048
+# Trigrams in more than this share of topics (e.g. " th") only add noise to large corpora
+MAX_DF = 0.05
+MIN_TOPICS_FOR_MAX_DF = 1000
+MAX_REPORTED_CLUSTERS = 50
+MAX_REPORTED_MEMBERS = 5
+
+
+_WORD = re.compile(r"[a-z0-9+#]+")
+
+
+def normalize_topic(topic: str) -> str:
+    return " ".join(_WORD.findall(str(topic).lower().replace(".", "")))
+
+
+def acronym(topic: str) -> Optional[str]:
+    words = topic.split()
+    return "".join(word[0] for word in words) if 2 <= len(words) <= 5 else None
+
+
+def trigram_counts(texts: List[str]) -> sp.csr_matrix:
+    """Hashed character-trigram counts, one row per text (padded with spaces)."""
+    encoded = [f" {text} ".encode("utf-8") for text in texts]
+    lengths = np.fromiter((len(e) for e in encoded), dtype=np.int64, count=len(encoded))
+    buffer = np.frombuffer(b"\0".join(encoded) + b"\0", dtype=np.uint8).astype(np.uint64)
+    rows = np.repeat(np.arange(len(texts), dtype=np.int64), lengths + 1)
+
+    codes = (buffer[:-2] << np.uint64(16)) | (buffer[1:-1] << np.uint64(8)) | buffer[2:]
+    valid = (rows[:-2] == rows[2:]) & (buffer[2:] != 0) & (buffer[:-2] != 0)
+    columns = ((codes[valid] * np.uint64(2654435761)) >> np.uint64(7)) % np.uint64(HASH_DIM)
+
+    matrix = sp.csr_matrix(
+        (np.ones(int(valid.sum()), dtype=np.float32), (rows[:-2][valid], columns.astype(np.int64))),
+        shape=(len(texts), HASH_DIM)
+    )
+    matrix.sum_duplicates()
+    return matrix
+
+
+def _normalize_rows(matrix: sp.csr_matrix) -> sp.csr_matrix:
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sp.csr_matrix(sp.diags(1 / norms) @ matrix)
+
+
+class TopicClusterer:
+    """Cluster topic strings into canonical topics, incrementally across runs."""
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, state_path: Optional[Path] = None):
+        self.threshold = threshold
+        self.state_path = state_path
+        self.idf: Optional[np.ndarray] = None
+        self.canonical: List[str] = []
+        self.vectors: Optional[sp.csr_matrix] = None
+
+        if state_path is not None and state_path.exists():
+            try:
+                with np.load(state_path, allow_pickle=False) as state:
+                    self.idf = state["idf"]
+                    self.canonical = [str(name) for name in state["canonical"]]
+                    self.vectors = sp.csr_matrix(
+                        (state["data"], state["indices"], state["indptr"]), shape=(len(self.canonical), HASH_DIM)
+                    )
+            except (OSError, KeyError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable topic clusters {state_path}: {e}")
+                self.idf, self.canonical, self.vectors = None, [], None
+
+    def save(self):
+        if self.state_path is None or self.vectors is None:
+            return
+        tmp_path = self.state_path.with_suffix(".tmp.npz")
+        np.savez(tmp_path, idf=self.idf, canonical=np.array(self.canonical, dtype=str),
+                 data=self.vectors.data, indices=self.vectors.indices, indptr=self.vectors.indptr)
+        tmp_path.replace(self.state_path)
+
+    def _fit_idf(self, counts: sp.csr_matrix):
+        n = counts.shape[0]
+        df = np.bincount(counts.indices, minlength=HASH_DIM)
+        self.idf = (np.log((1 + n) / (1 + df)) + 1).astype(np.float32)
+        if n >= MIN_TOPICS_FOR_MAX_DF:
+            self.idf[df > MAX_DF * n] = 0
+
+    def embed(self, topics: List[str]) -> sp.csr_matrix:
+        """L2-normalized TF-IDF trigram vectors for normalized topics."""
+        counts = trigram_counts(topics)
+        if self.idf is None:
+            self._fit_idf(counts)
+        counts.data = 1 + np.log(counts.data)
+        weighted = sp.csr_matrix(counts @ sp.diags(self.idf))
+        weighted.eliminate_zeros()
+        return _normalize_rows(weighted)
+
+    def _assign_batch(self, batch: sp.csr_matrix, names: List[str]) -> np.ndarray:
+        """Canonical index for each row, creating canonical topics for rows matching none."""
+        assigned = np.full(batch.shape[0], -1, dtype=np.int64)
+        if self.vectors is not None and self.vectors.shape[0]:
+            similarity = sp.csr_matrix(batch @ self.vectors.T)
+            best = np.asarray(similarity.max(axis=1).todense()).ravel()
+            nearest = np.asarray(similarity.argmax(axis=1)).ravel()
+            hits = best >= self.threshold
+            assigned[hits] = nearest[hits]
+
+        rest = np.flatnonzero(assigned < 0)
+        if not len(rest):
+            return assigned
+
+        # Leader clustering within the unmatched rows, which are already in frequency order
+        candidates = batch[rest]
+        similarity = sp.csr_matrix(candidates @ candidates.T)
+        local = np.full(len(rest), -1, dtype=np.int64)
+        leaders = []
+        for i in range(len(rest)):
+            if local[i] >= 0:
+                continue
+            start, end = similarity.indptr[i], similarity.indptr[i + 1]
+            members = similarity.indices[start:end][similarity.data[start:end] >= self.threshold]
+            members = members[local[members] < 0]
+            local[members] = len(self.canonical) + len(leaders)
+            local[i] = len(self.canonical) + len(leaders)
+            leaders.append(i)
+
+        self.canonical.extend(names[rest[i]] for i in leaders)
+        new_vectors = candidates[leaders]
+        self.vectors = new_vectors if self.vectors is None else sp.csr_matrix(sp.vstack([self.vectors, new_vectors]))
+        assigned[rest] = local
+        return assigned
+
+    def assign(self, topics: List[str]) -> Dict[str, str]:
+        """Map each normalized topic to its canonical topic, adding canonical topics as needed."""
+        known = set(self.canonical)
+        expansions: Dict[str, str] = {}
+        # Earlier (more frequent) topics win when two spell out the same initials
+        for topic in list(topics) + self.canonical:
+            short = acronym(topic)
+            if short and short not in expansions:
+                expansions[short] = topic
+        keys = [expansions.get(topic, topic) if len(topic) <= 5 else topic for topic in topics]
+
+        unique = list(dict.fromkeys(key for key in keys if key not in known))
+        mapping = {key: key for key in keys if key in known}
+        for start in range(0, len(unique), BATCH_SIZE):
+            names = unique[start:start + BATCH_SIZE]
+            assigned = self._assign_batch(self.embed(names), names)
+            mapping.update((name, self.canonical[index]) for name, index in zip(names, assigned))
+        return {topic: mapping[key] for topic, key in zip(topics, keys)}
+
+    def cluster(self, file_topics: List[Tuple[str, List[str]]]) -> Dict[str, Any]:
+        """Canonical topics with member counts, and each file's canonical topics.
+
+        `file_topics` holds `(file name, topics)` pairs.
+        """
+        # Count exact strings first so each distinct spelling is normalized once
+        raw_counts = Counter(str(topic).strip() for _, topics in file_topics for topic in topics)
+        keys = {raw: normalize_topic(raw) for raw in raw_counts}
+        counts: Counter = Counter()
+        spellings: Dict[str, Counter] = {}
+        for raw, count in raw_counts.items():
+            key = keys[raw]
+            if key:
+                counts[key] += count
+                spellings.setdefault(key, Counter())[raw] = count
+
+        # Most frequent first, so the common spelling becomes the canonical one
+        ordered = [topic for topic, _ in counts.most_common()]
+        mapping = self.assign(ordered)
+
+        clusters: Dict[str, Dict[str, Any]] = {}
+        for topic in ordered:
+            cluster = clusters.setdefault(mapping[topic], {"count": 0, "members": Counter()})
+            cluster["count"] += counts[topic]
+            cluster["members"].update(spellings[topic])
+
+        def label(canonical: str) -> str:
+            members = clusters[canonical]["members"]
+            return members.most_common(1)[0][0] if members else canonical
+
+        ranked = sorted(clusters, key=lambda canonical: -clusters[canonical]["count"])
+        labels = {canonical: label(canonical) for canonical in ranked}
+        raw_labels = {raw: labels[mapping[key]] for raw, key in keys.items() if key}
+        return {
+            "distinct_topics": len(counts),
+            "clusters": len(clusters),
+            "canonical_topics": [
+                {
+                    "topic": labels[canonical],
+                    "count": clusters[canonical]["count"],
+                    "members": [member for member, _ in
+                                clusters[canonical]["members"].most_common(MAX_REPORTED_MEMBERS)],
+                }
+                for canonical in ranked[:MAX_REPORTED_CLUSTERS]
+            ],
+            "file_topics": {
+                file_name: sorted({raw_labels[raw] for raw in (str(t).strip() for t in topics) if raw in raw_labels})
+                for file_name, topics in file_topics
+            },
+        }
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Directory watching for the long-running `watch` mode.
+
+Uses Linux inotify (through ctypes, no extra dependencies) when available
+and falls back to polling file stats everywhere else. Watchers report the
+set of paths that changed; `debounced_changes` groups bursts of writes into
+a single batch once the directory has been quiet for a short while.
+"""
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Set, Tuple
+
+logger = logging.getLogger("gemini-demo")
+
+# inotify event masks (see inotify(7))
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class PollingWatcher:
+    """Detect changes by comparing file stats between polls."""
+
+    def __init__(self, directory: Path, suffixes: Iterable[str], interval: float = 1.0):
+        self.directory = directory
+        self.suffixes = {s.lower() for s in suffixes}
+        self.interval = interval
+        self._snapshot = self._scan()
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        snapshot = {}
+        try:
+            entries = os.scandir(self.directory)
+        except FileNotFoundError:
+            return snapshot
+        with entries:
+            for entry in entries:
+                if not entry.is_file() or Path(entry.name).suffix.lower() not in self.suffixes:
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                snapshot[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def poll(self, timeout: Optional[float] = None) -> Set[Path]:
+        """Wait up to `timeout` seconds and return paths that changed."""
+        time.sleep(self.interval if timeout is None else min(timeout, self.interval))
+        current = self._scan()
+        changed = {
+            name for name in current.keys() | self._snapshot.keys()
+            if current.get(name) != self._snapshot.get(name)
+        }
+        self._snapshot = current
+        return {self.directory / name for name in changed}
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Receive change events from the kernel via inotify."""
+
+    def __init__(self, directory: Path, suffixes: Iterable[str]):
+        self.directory = directory
+        self.suffixes = {s.lower() for s in suffixes}
+
+        libc_name = ctypes.util.find_library("c")
+        if not sys.platform.startswith("linux") or not libc_name:
+            raise OSError(errno.ENOSYS, "inotify is only available on Linux")
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        wd = libc.inotify_add_watch(self._fd, os.fsencode(str(directory)), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(err, f"inotify_add_watch failed for {directory}")
+
+    def poll(self, timeout: Optional[float] = None) -> Set[Path]:
+        """Block until events arrive (or `timeout` expires) and return changed paths."""
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        changed = set()
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            _, _, _, name_len = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + name_len].rstrip(b"\0").decode(errors="surrogateescape")
+            offset += name_len
+            if name and Path(name).suffix.lower() in self.suffixes:
+                changed.add(self.directory / name)
+        return changed
+
+    def close(self):
+        os.close(self._fd)
+
+
+def create_watcher(directory: Path, suffixes: Iterable[str], poll_interval: float = 1.0,
+                   force_polling: bool = False):
+    """Return an inotify watcher, or a polling watcher if inotify is unavailable."""
+    if not force_polling:
+        try:
+            watcher = InotifyWatcher(directory, suffixes)
+            logger.info(f"👀 Watching {directory} with inotify")
+            return watcher
+        except (OSError, AttributeError) as e:
+            logger.warning(f"inotify unavailable ({e}), falling back to polling")
+
+    logger.info(f"👀 Watching {directory} by polling every {poll_interval}s")
+    return PollingWatcher(directory, suffixes, interval=poll_interval)
+
+
+def debounced_changes(watcher, debounce: float = 0.5) -> Iterator[Set[Path]]:
+    """Yield batches of changed paths once writes have been quiet for `debounce` seconds."""
+    while True:
+        pending = watcher.poll()
+        if not pending:
+            continue
+
+        while True:
+            more = watcher.poll(timeout=debounce)
+            if not more:
+                break
+            pending |= more
+
+        yield pending